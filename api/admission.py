@@ -0,0 +1,244 @@
+"""
+Control de admisión de la ingesta
+---------------------------------
+Protege /collect y /collect/batch de los picos de la flota (por ejemplo, todos los agentes
+reportando a la vez al terminar una ventana de mantenimiento). Se decide antes de leer y
+decodificar el cuerpo y sin tocar la base de datos:
+- Token bucket por agente (IP de origen o clave API): rate_per_minute solicitudes por
+  minuto con ráfagas de hasta burst; las que exceden reciben 429
+- Límite de solicitudes de ingesta en curso; las que no consiguen lugar reciben 503 sin
+  esperar, en lugar de acumularse en el pool de conexiones
+- Retry-After con dispersión aleatoria en una ventana del tamaño de la demanda pendiente
+  (rechazos de los últimos retry_after segundos / capacidad, estimada como el límite de
+  concurrencia sobre la duración media de las solicitudes admitidas), para que los
+  rechazados no vuelvan todos juntos y se repartan en el tiempo que la API tarda en atenderlos
+- Intervalo de reporte sugerido, solo mientras hubo rechazos en la última ventana: de
+  report_interval a report_interval_max en proporción a las solicitudes rechazadas; sin
+  rechazos no se sugiere nada y los agentes usan su propio intervalo
+
+El estado es local a cada proceso: con varios workers, cada uno aplica sus propios límites.
+Como las solicitudes de un agente llegan a workers al azar, la cuota efectiva por agente
+llega a WEB_WORKERS veces RATE_LIMIT_PER_MINUTE (y la ráfaga, a WEB_WORKERS veces
+RATE_LIMIT_BURST); repartirla entre los workers rechazaría a agentes dentro de su cuota.
+"""
+
+import math
+import time
+import random
+import threading
+from collections import OrderedDict, deque
+from typing import Dict, Any, Optional, Tuple
+
+
+class Rejection:
+    """Solicitud rechazada por el control de admisión."""
+
+    __slots__ = ("status_code", "reason", "message", "retry_after")
+
+    def __init__(self, status_code: int, reason: str, message: str, retry_after: int):
+        self.status_code = status_code
+        self.reason = reason
+        self.message = message
+        self.retry_after = retry_after
+
+
+class RateLimiter:
+    """Token buckets por clave, con un máximo de claves (se descartan las menos recientes)."""
+
+    def __init__(self, rate_per_minute: float, burst: int, max_keys: int = 100000):
+        """
+        Inicializar el limitador.
+
+        Args:
+            rate_per_minute: Solicitudes por minuto sostenidas por clave (0 lo desactiva)
+            burst: Solicitudes admitidas de una vez (capacidad del bucket)
+            max_keys: Máximo de claves en memoria; una clave descartada vuelve con el bucket lleno
+        """
+        self.rate = rate_per_minute / 60
+        self.burst = max(burst, 1)
+        self.max_keys = max_keys
+        # Clave -> (tokens disponibles, instante de la última actualización)
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        """Indica si el limitador está activo."""
+        return self.rate > 0
+
+    def acquire(self, key: str) -> float:
+        """
+        Consume un token de la clave.
+
+        Returns:
+            0 si se admite la solicitud; si no, segundos hasta que haya un token
+        """
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                tokens = float(self.burst)
+            else:
+                tokens = min(float(self.burst), bucket[0] + (now - bucket[1]) * self.rate)
+                self._buckets.move_to_end(key)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / self.rate
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class AdmissionController:
+    """Token bucket por agente, límite de concurrencia e intervalo de reporte sugerido."""
+
+    def __init__(self, rate_limiter: RateLimiter, max_concurrency: int, retry_after: float,
+                 report_interval: int, report_interval_max: int, window: float = 60.0):
+        """
+        Inicializar el control de admisión.
+
+        Args:
+            rate_limiter: Token buckets por agente
+            max_concurrency: Máximo de solicitudes de ingesta en curso (0 sin límite)
+            retry_after: Segundos base del Retry-After de las respuestas 503
+            report_interval: Intervalo de reporte sugerido con pocos rechazos (0 no sugiere)
+            report_interval_max: Intervalo sugerido cuando se rechaza casi todo
+            window: Segundos de la ventana con la que se mide la proporción de rechazos
+        """
+        self.rate_limiter = rate_limiter
+        self.max_concurrency = max_concurrency
+        self.retry_after = retry_after
+        self.report_interval_base = report_interval
+        self.report_interval_max = max(report_interval_max, report_interval)
+        self.window = window
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        # [segundo, admitidas, rechazadas] de cada segundo de la ventana con solicitudes
+        self._seconds: "deque[list]" = deque()
+        self._totals = {"admitted": 0, "rate_limited": 0, "overloaded": 0}
+        # Duración media (EWMA) de las solicitudes admitidas; None hasta que termine la primera
+        self._service_seconds: Optional[float] = None
+
+    def _recent(self, seconds: float) -> Tuple[int, int, float]:
+        """Admitidas, rechazadas y segundos abarcados en los últimos `seconds` segundos."""
+        now = time.monotonic()
+        since = now - seconds
+        admitted = rejected = 0
+        first = now
+        with self._lock:
+            for second, second_admitted, second_rejected in reversed(self._seconds):
+                if second + 1 <= since:
+                    break
+                admitted += second_admitted
+                rejected += second_rejected
+                first = second
+        return admitted, rejected, max(min(seconds, now - first), 1.0)
+
+    def rejected_ratio(self) -> float:
+        """Proporción de solicitudes rechazadas en la última ventana (0 a 1)."""
+        admitted, rejected, _ = self._recent(self.window)
+        return rejected / (admitted + rejected) if rejected else 0.0
+
+    def report_interval(self) -> int:
+        """
+        Segundos sugeridos hasta el próximo reporte de un agente (0 si no se sugiere).
+
+        Es una espera temporal mientras la API rechaza solicitudes, no un mínimo para la
+        flota: sin rechazos en la última ventana no se sugiere nada.
+        """
+        if self.report_interval_base <= 0:
+            return 0
+        ratio = self.rejected_ratio()
+        if ratio <= 0:
+            return 0
+        return round(self.report_interval_base + (self.report_interval_max - self.report_interval_base) * ratio)
+
+    def _spread(self, seconds: float) -> int:
+        """
+        Retry-After disperso: entre seconds y seconds más el tiempo estimado para atender a
+        los agentes rechazados en los últimos seconds segundos con la capacidad estimada
+        (como máximo report_interval_max; 4 x seconds hasta que termine una solicitud).
+        """
+        # Con Retry-After >= seconds, cada agente pendiente se rechaza a lo sumo una vez en ese lapso
+        _, rejected, _ = self._recent(seconds)
+        service_seconds = self._service_seconds
+        if service_seconds is not None and self.max_concurrency > 0:
+            capacity = self.max_concurrency / max(service_seconds, 1e-3)
+            backlog = min(rejected / capacity, max(self.report_interval_max, seconds))
+        else:
+            backlog = 4 * seconds
+        return max(1, math.ceil(random.uniform(seconds, seconds + backlog)))
+
+    def admit(self, key: str) -> Optional[Rejection]:
+        """
+        Decide si se atiende una solicitud de ingesta. Si se admite, ocupa un lugar que
+        debe liberarse con release() al terminar.
+
+        Args:
+            key: Clave del agente (IP de origen o clave API)
+
+        Returns:
+            None si se admite, o el rechazo a responder
+        """
+        if self.rate_limiter.enabled:
+            wait = self.rate_limiter.acquire(key)
+            if wait > 0:
+                self._count("rate_limited")
+                # Un solo agente: basta con esperar al próximo token
+                return Rejection(429, "rate_limit", "Demasiadas solicitudes de este agente, reintente más tarde",
+                                 max(1, math.ceil(wait)))
+        with self._lock:
+            if self.max_concurrency > 0 and self._in_flight >= self.max_concurrency:
+                overloaded = True
+            else:
+                overloaded = False
+                self._in_flight += 1
+        if overloaded:
+            self._count("overloaded")
+            return Rejection(503, "overload", "API saturada, reintente más tarde", self._spread(self.retry_after))
+        self._count("admitted")
+        return None
+
+    def release(self, elapsed: float) -> None:
+        """
+        Libera el lugar de una solicitud admitida.
+
+        Args:
+            elapsed: Segundos que tardó la solicitud (para estimar la capacidad)
+        """
+        with self._lock:
+            self._in_flight -= 1
+            previous = self._service_seconds
+            self._service_seconds = elapsed if previous is None else previous + 0.1 * (elapsed - previous)
+
+    def _count(self, outcome: str) -> None:
+        now = time.monotonic()
+        second = math.floor(now)
+        with self._lock:
+            if not self._seconds or self._seconds[-1][0] != second:
+                self._seconds.append([second, 0, 0])
+                while self._seconds[0][0] + 1 <= now - self.window:
+                    self._seconds.popleft()
+            self._seconds[-1][1 if outcome == "admitted" else 2] += 1
+            self._totals[outcome] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Estado y contadores para /health."""
+        with self._lock:
+            in_flight = self._in_flight
+            totals = dict(self._totals)
+        return dict(
+            totals,
+            in_flight=in_flight,
+            max_concurrency=self.max_concurrency,
+            rate_limited_agents=len(self.rate_limiter),
+            rejected_ratio=round(self.rejected_ratio(), 3),
+            report_interval=self.report_interval(),
+            service_ms=round(self._service_seconds * 1000, 1) if self._service_seconds is not None else None
+        )
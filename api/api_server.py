@@ -7,13 +7,18 @@ Servidor API que recibe información de sistema desde agentes y almacena en una
 - Proporciona capacidades avanzadas de consulta
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g
 import os
+import sys
 import json
+import atexit
+import signal
+import itertools
+import time
 import datetime
 from datetime import timezone
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Iterator, Tuple, Mapping
 import logging
 from functools import wraps
 from dotenv import load_dotenv
@@ -22,7 +27,25 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # Importar modelos ORM
-from models import db, Server, OSInfo, ProcessorInfo, Process, LoggedUser
+from models import db, Server, Snapshot, SnapshotSummary, Process, LoggedUser
+from bulk_insert import bulk_insert
+from backup_store import BackupStore
+from ingest_queue import IngestQueue, QueueFullError
+from process_intervals import update_process_intervals, processes_at
+from process_index import update_process_index, search_processes
+from static_sections import update_static_sections, users_by_snapshot
+from payload_codec import parse_body, parse_batch_body, PayloadError, CONTENT_ENCODINGS, PROCESS_ENCODINGS
+from validation import validate_snapshot, apply_defaults
+from query_cache import QueryCache
+from server_ids import ServerIdCache, touch_server
+from server_listing import servers_page_query, encode_cursor
+from maintenance import run_maintenance, start_maintenance_thread
+from cpu_rollups import update_cpu_rollups, cpu_series, default_step
+from metrics import (registry, TimedQueuePool, TimedAsyncQueuePool, INGEST_STAGE_SECONDS, INGEST_ERRORS,
+                     INGEST_PAYLOAD_BYTES, INGEST_PROCESSES, HTTP_REQUEST_SECONDS, HTTP_REQUESTS)
+from request_profiler import SlowRequestProfiler
+from admission import AdmissionController, RateLimiter
+from export import export_chunks, EXPORT_FORMATS
 
 # Configurar logging
 logging.basicConfig(
@@ -37,24 +60,76 @@ app = Flask(__name__)
 app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'postgresql://postgres:postgres@db:5432/sysinfo')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+
+def engine_options(database_url: str) -> Dict[str, Any]:
+    """
+    Opciones del pool de conexiones de SQLAlchemy según las variables de entorno.
+    
+    Cada proceso de la API tiene su propio pool: con varios workers, el máximo de
+    conexiones a PostgreSQL es workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW).
+    
+    Args:
+        database_url: URL de la base de datos (postgresql+asyncpg para el engine de asgi_server.py)
+        
+    Returns:
+        Diccionario para SQLALCHEMY_ENGINE_OPTIONS
+    """
+    if not database_url.startswith('postgresql'):
+        # SQLite (desarrollo y pruebas) usa el pool por defecto
+        return {}
+    asyncpg = database_url.startswith('postgresql+asyncpg')
+    options = {
+        # QueuePool que registra la espera de cada checkout en /metrics
+        "poolclass": TimedAsyncQueuePool if asyncpg else TimedQueuePool,
+        "pool_size": int(os.getenv('DB_POOL_SIZE', '5')),
+        "max_overflow": int(os.getenv('DB_MAX_OVERFLOW', '10')),
+        "pool_timeout": float(os.getenv('DB_POOL_TIMEOUT', '30')),
+        "pool_recycle": int(os.getenv('DB_POOL_RECYCLE', '1800')),
+        "pool_pre_ping": os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+    }
+    # Límite de duración de cada sentencia en el servidor (0 lo desactiva)
+    statement_timeout = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', '30000'))
+    if statement_timeout > 0 and asyncpg:
+        options["connect_args"] = {"server_settings": {"statement_timeout": str(statement_timeout)}}
+    elif statement_timeout > 0:
+        options["connect_args"] = {"options": f"-c statement_timeout={statement_timeout}"}
+    return options
+
+
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+
 # Configuración de seguridad
 API_SECRET = os.getenv('API_SECRET', 'default-insecure-key')
 if API_SECRET == 'default-insecure-key':
     logger.warning("Estás usando una clave API predeterminada e insegura. Define API_SECRET en el archivo .env.")
 
-# Función de verificación de API Key
-def verify_api_key():
+AUTH_ERROR_MESSAGE = "No autorizado. Se requiere una clave API válida."
+
+
+def api_key_valid(api_key: Optional[str]) -> bool:
     """
-    Verificar si la solicitud contiene una API Key válida.
+    Verificar el valor de un encabezado Authorization.
     
+    Args:
+        api_key: Valor del encabezado ("ApiKey <clave>")
+        
     Returns:
         bool: True si la API Key es válida, False en caso contrario
     """
-    api_key = request.headers.get('Authorization')
     if not api_key or not api_key.startswith('ApiKey ') or api_key.replace('ApiKey ', '') != API_SECRET:
         return False
     return True
 
+# Función de verificación de API Key
+def verify_api_key():
+    """
+    Verificar si la solicitud contiene una API Key válida.
+    
+    Returns:
+        bool: True si la API Key es válida, False en caso contrario
+    """
+    return api_key_valid(request.headers.get('Authorization'))
+
 # Función para generar respuesta de error de autenticación
 def auth_error_response():
     """
@@ -64,7 +139,7 @@ def auth_error_response():
         tuple: Respuesta JSON con error 401
     """
     logger.warning(f"Intento de acceso no autorizado al endpoint {request.endpoint} desde {request.remote_addr}")
-    return jsonify({"error": "No autorizado. Se requiere una clave API válida."}), 401
+    return jsonify({"error": AUTH_ERROR_MESSAGE}), 401
 
 # Inicializar la base de datos con la aplicación
 db.init_app(app)
@@ -72,15 +147,165 @@ db.init_app(app)
 # Directorio para almacenamiento de archivos JSON
 DATA_DIR = Path("./data")
 
+# Respaldo en archivos JSONL: política de fsync 'always', 'interval' o 'never'
+backup_store = BackupStore(
+    DATA_DIR,
+    fsync_policy=os.getenv('BACKUP_FSYNC', 'interval'),
+    fsync_interval=float(os.getenv('BACKUP_FSYNC_INTERVAL', '1.0'))
+)
+
+# Almacenamiento de procesos: 'snapshot' (lista completa por instantánea) o 'interval' (tiempo de vida)
+PROCESS_STORAGE = os.getenv('PROCESS_STORAGE', 'snapshot')
+
+# Máximo de resultados de /search/processes
+SEARCH_MAX_RESULTS = int(os.getenv('SEARCH_MAX_RESULTS', '10000'))
+
+# Máximo de puntos por respuesta de /metrics/<ip_address>/cpu
+METRICS_MAX_POINTS = int(os.getenv('METRICS_MAX_POINTS', '1000'))
+
+# Segundos entre ejecuciones del mantenimiento de particiones (0 lo desactiva)
+MAINTENANCE_INTERVAL = int(os.getenv('MAINTENANCE_INTERVAL', '3600'))
+
+# Tamaño de página de /servers (por defecto y máximo)
+SERVERS_PAGE_SIZE = int(os.getenv('SERVERS_PAGE_SIZE', '100'))
+SERVERS_PAGE_MAX = int(os.getenv('SERVERS_PAGE_MAX', '1000'))
+
+# Caché de respuestas de /query/<ip_address> (QUERY_CACHE_SIZE=0 la desactiva)
+query_cache = QueryCache(
+    max_entries=int(os.getenv('QUERY_CACHE_SIZE', '1024')),
+    ttl=float(os.getenv('QUERY_CACHE_TTL', '60'))
+)
+
+# Caché ip -> server_id de la ingesta (SERVER_ID_CACHE_SIZE=0 la desactiva)
+server_id_cache = ServerIdCache(max_entries=int(os.getenv('SERVER_ID_CACHE_SIZE', '100000')))
+
+# Modo de ingesta: 'sync' escribe dentro de la solicitud, 'async' encola y responde 202
+INGEST_MODE = os.getenv('INGEST_MODE', 'sync')
+INGEST_RETRY_AFTER = int(os.getenv('INGEST_RETRY_AFTER', '5'))
+
+# Máximo de instantáneas por solicitud en /collect/batch
+MAX_BATCH_ITEMS = int(os.getenv('MAX_BATCH_ITEMS', '1000'))
+
+# Control de admisión de /collect y /collect/batch (por proceso): token bucket por agente
+# (RATE_LIMIT_PER_MINUTE=0 lo desactiva), clave del agente ('ip' o 'api_key'), máximo de
+# solicitudes de ingesta en curso (0 sin límite) e intervalo de reporte sugerido a los agentes
+ADMISSION_KEY = os.getenv('ADMISSION_KEY', 'ip')
+admission = AdmissionController(
+    RateLimiter(
+        rate_per_minute=float(os.getenv('RATE_LIMIT_PER_MINUTE', '0')),
+        burst=int(os.getenv('RATE_LIMIT_BURST', '30'))
+    ),
+    max_concurrency=int(os.getenv('INGEST_MAX_CONCURRENCY', '8')),
+    retry_after=INGEST_RETRY_AFTER,
+    report_interval=int(os.getenv('REPORT_INTERVAL', '300')),
+    report_interval_max=int(os.getenv('REPORT_INTERVAL_MAX', '900'))
+)
+
+# Máximo de instantáneas completas por consulta en /query/<ip_address>?snapshots=N
+MAX_QUERY_SNAPSHOTS = int(os.getenv('MAX_QUERY_SNAPSHOTS', '50'))
+# Máximo de resúmenes horarios por consulta con ?from=
+MAX_QUERY_SUMMARIES = 1000
+ingest_queue = None
+
+# Directorio donde los procesos de la API comparten sus métricas (vacío: cada proceso las suyas)
+METRICS_DIR = os.getenv('METRICS_DIR', '')
+METRICS_FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', '5'))
 
-def setup_app():
-    """Configuración inicial de la aplicación."""
+# Perfilador de solicitudes lentas (SLOW_REQUEST_MS=0 lo desactiva)
+SLOW_REQUEST_MS = float(os.getenv('SLOW_REQUEST_MS', '0'))
+request_profiler = SlowRequestProfiler(
+    SLOW_REQUEST_MS,
+    sample_ms=float(os.getenv('PROFILE_SAMPLE_MS', '10')),
+    keep=int(os.getenv('PROFILE_KEEP', '20'))
+) if SLOW_REQUEST_MS > 0 else None
+
+
+def write_snapshot_batch(batch: List[Dict[str, Any]]) -> List[bool]:
+    """
+    Persiste un micro-lote de la cola de ingesta (base de datos y respaldo en archivo).
+    
+    Args:
+        batch: Lista de datos de información del sistema
+        
+    Returns:
+        Lista con True/False por instantánea
+    """
+    with app.app_context():
+        db_results = store_batch_in_db(batch)
+    file_results = [store_data_in_file(data) for data in batch]
+    return [db_ok or file_ok for db_ok, file_ok in zip(db_results, file_results)]
+
+
+def start_ingest_queue():
+    """Inicia la cola de ingesta asíncrona y registra su vaciado al salir."""
+    global ingest_queue
+    ingest_queue = IngestQueue(
+        write_snapshot_batch,
+        maxsize=int(os.getenv('INGEST_QUEUE_SIZE', '1000')),
+        batch_size=int(os.getenv('INGEST_BATCH_SIZE', '50')),
+        flush_interval=int(os.getenv('INGEST_FLUSH_MS', '200')) / 1000,
+        workers=int(os.getenv('INGEST_WORKERS', '1'))
+    )
+    ingest_queue.start()
+    drain_timeout = float(os.getenv('INGEST_DRAIN_TIMEOUT', '30'))
+    atexit.register(ingest_queue.stop, drain_timeout)
+
+
+def setup_app(start_background: bool = True):
+    """
+    Configuración inicial de la aplicación.
+    
+    Args:
+        start_background: Iniciar también los hilos en segundo plano en este proceso. Con
+            gunicorn es False: el proceso principal prepara la base de datos y cada worker
+            inicia sus hilos después del fork (ver gunicorn.conf.py)
+    """
     DATA_DIR.mkdir(exist_ok=True)
     
     # Crear tablas si no existen
     with app.app_context():
         db.create_all()
         logger.info("Tablas de base de datos creadas o verificadas")
+        
+        # Particiones de las tablas de telemetría (solo PostgreSQL con schema.sql); con
+        # RETENTION_DAYS > 0 y tablas sin particionar falla (python maintenance.py --migrate)
+        run_maintenance(db.engine)
+    
+    if start_background:
+        start_background_tasks()
+
+
+def start_background_tasks():
+    """
+    Inicia los hilos en segundo plano de este proceso: mantenimiento periódico, cola de
+    ingesta (modo async), escritura de métricas compartidas y perfilador de solicitudes lentas.
+    """
+    with app.app_context():
+        # Con varios procesos, el advisory lock deja a uno solo ejecutando cada pasada
+        if MAINTENANCE_INTERVAL > 0 and db.engine.dialect.name == 'postgresql':
+            start_maintenance_thread(db.engine, MAINTENANCE_INTERVAL)
+    
+    if INGEST_MODE == 'async':
+        start_ingest_queue()
+    
+    if METRICS_DIR:
+        registry.start_sharing(METRICS_DIR, METRICS_FLUSH_SECONDS)
+    if request_profiler is not None:
+        request_profiler.start()
+
+
+def reset_after_fork():
+    """
+    Descarta las conexiones heredadas del proceso principal en un worker recién creado.
+    
+    Las conexiones abiertas antes del fork comparten el socket con el proceso principal;
+    close=False las abandona sin cerrarlas para no cortar las del padre, y el worker abre
+    las suyas a medida que las necesita.
+    """
+    with app.app_context():
+        db.engine.dispose(close=False)
+    # Cada worker cuenta solo lo propio
+    registry.reset()
 
 
 def get_filename_for_ip(ip_address: str) -> str:
@@ -91,15 +316,14 @@ def get_filename_for_ip(ip_address: str) -> str:
         ip_address: Dirección IP del agente
         
     Returns:
-        Nombre de archivo en formato <IP>_<YYYY-MM-DD>.json
+        Nombre de archivo en formato <IP>_<YYYY-MM-DD>.jsonl
     """
-    today = datetime.datetime.now().strftime("%Y-%m-%d")
-    return f"{ip_address}_{today}.json"
+    return backup_store.filename_for(ip_address).name
 
 
 def store_data_in_file(data: Dict[str, Any]) -> bool:
     """
-    Almacena datos en un archivo JSON
+    Agrega los datos como una línea al archivo JSONL del día
     
     Args:
         data: Datos de información del sistema
@@ -108,39 +332,89 @@ def store_data_in_file(data: Dict[str, Any]) -> bool:
         True si tiene éxito, False en caso contrario
     """
     try:
-        ip_address = data.get("ip_address", "unknown")
-        filename = DATA_DIR / get_filename_for_ip(ip_address)
-        
-        # Si el archivo existe, lo lee y agrega nuevos datos
-        if filename.exists():
-            with open(filename, 'r') as f:
-                try:
-                    existing_data = json.load(f)
-                    if isinstance(existing_data, dict):
-                        # Convertir un registro en una lista
-                        existing_data = [existing_data]
-                    elif not isinstance(existing_data, list):
-                        existing_data = []
-                except json.JSONDecodeError:
-                    existing_data = []
-            
-            # Agrega nuevos datos
-            existing_data.append(data)
-            file_data = existing_data
-        else:
-            # Nuevo archivo, almacena como un solo registro
-            file_data = [data]
-            
-        # Escribe datos en archivo
-        with open(filename, 'w') as f:
-            json.dump(file_data, f, indent=2)
-            
+        with INGEST_STAGE_SECONDS.time(stage="store_file"):
+            backup_store.append(data)
+        # Las consultas de la IP pueden responderse desde los archivos
+        query_cache.invalidate_ip(data.get("ip_address", "unknown"))
         return True
     except Exception as e:
+        INGEST_ERRORS.inc(stage="store_file")
         logger.error(f"Error al almacenar datos en archivo: {e}")
         return False
 
 
+# Clave de pending_rows con las muestras de CPU de un lote (se agregan en update_cpu_rollups)
+CPU_SAMPLES = "cpu_samples"
+
+
+def stage_snapshot_in_db(data: Dict[str, Any], pending_rows: Dict[Any, List[Dict[str, Any]]] = None) -> None:
+    """
+    Agrega una instantánea a la transacción actual sin hacer commit.
+    
+    Args:
+        data: Datos de información del sistema
+        pending_rows: Si se indica, las filas de procesos (modelo -> filas) y las
+            muestras de CPU (CPU_SAMPLES) se acumulan aquí en lugar de escribirse, para
+            cargar un lote entero de una vez
+    """
+    insert_rows = bulk_insert if pending_rows is None else \
+        (lambda model, rows: pending_rows.setdefault(model, []).extend(rows))
+    
+    ip_address = data.get("ip_address", "unknown")
+    timestamp = datetime.datetime.fromisoformat(data.get("timestamp", datetime.datetime.now().isoformat()))
+    if timestamp.tzinfo is not None:
+        # Las columnas son TIMESTAMP sin zona horaria: se guarda UTC
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    
+    # Crear el servidor o actualizar su last_seen con una sola sentencia
+    server_id, previous_seen, static_state = touch_server(server_id_cache, ip_address, timestamp)
+    
+    # Registrar la instantánea; todas sus filas la referencian
+    processes = data.get("processes") if isinstance(data.get("processes"), list) else []
+    users = data.get("logged_in_users") if isinstance(data.get("logged_in_users"), list) else []
+    processor = data.get("processor") if isinstance(data.get("processor"), dict) else {}
+    cpu_percent = processor.get("cpu_percent", 0.0) if processor else None
+    if not isinstance(cpu_percent, (int, float)):
+        cpu_percent = None
+    INGEST_PROCESSES.observe(len(processes))
+    snapshot = Snapshot(server_id=server_id, timestamp=timestamp, process_count=len(processes),
+                        user_count=len(users), cpu_percent=cpu_percent)
+    db.session.add(snapshot)
+    # Obtener el id de la instantánea para las inserciones masivas
+    db.session.flush()
+    
+    # S.O., procesador y usuarios: solo se guarda una versión nueva si el contenido cambió
+    update_static_sections(server_id, snapshot.id, timestamp, data, static_state)
+    
+    # Agregados de CPU de 1 minuto, 1 hora y 1 día
+    if cpu_percent is not None:
+        cpu_sample = {"server_id": server_id, "timestamp": timestamp, "cpu_percent": cpu_percent}
+        if pending_rows is None:
+            update_cpu_rollups([cpu_sample])
+        else:
+            pending_rows.setdefault(CPU_SAMPLES, []).append(cpu_sample)
+    
+    # Guardar procesos: intervalos de vida o lista completa (inserción masiva, sin un objeto ORM por fila)
+    if "processes" in data and isinstance(data["processes"], list) and PROCESS_STORAGE == 'interval':
+        update_process_intervals(server_id, previous_seen, timestamp, data["processes"])
+    elif "processes" in data and isinstance(data["processes"], list):
+        insert_rows(Process, [
+            {
+                "server_id": server_id,
+                "snapshot_id": snapshot.id,
+                "timestamp": timestamp,
+                "pid": proc_data.get("pid", 0),
+                "name": proc_data.get("name", "unknown"),
+                "username": proc_data.get("username")
+            }
+            for proc_data in data["processes"]
+        ])
+    
+    # Estado actual de procesos para /search/processes
+    if "processes" in data and isinstance(data["processes"], list):
+        update_process_index(server_id, previous_seen, timestamp, data["processes"])
+
+
 def store_data_in_db(data: Dict[str, Any]) -> bool:
     """
     Almacena la información del sistema en la base de datos.
@@ -151,81 +425,124 @@ def store_data_in_db(data: Dict[str, Any]) -> bool:
     Returns:
         True si tiene éxito, False en caso contrario
     """
+    stage = "store_db"
     try:
-        ip_address = data.get("ip_address", "unknown")
-        timestamp = datetime.datetime.fromisoformat(data.get("timestamp", datetime.datetime.now().isoformat()))
-        
-        # Buscar o crear el servidor
-        server = Server.query.filter_by(ip_address=ip_address).first()
-        if not server:
-            server = Server(ip_address=ip_address, first_seen=timestamp, last_seen=timestamp)
-            db.session.add(server)
-        else:
-            server.last_seen = timestamp
-        
-        # Guardar información del S.O.
-        if "os_info" in data and data["os_info"]:
-            os_info = OSInfo(
-                server=server,
-                timestamp=timestamp,
-                system=data["os_info"].get("system"),
-                release=data["os_info"].get("release"),
-                version=data["os_info"].get("version"),
-                platform=data["os_info"].get("platform")
-            )
-            db.session.add(os_info)
-        
-        # Guardar información del procesador
-        if "processor" in data and data["processor"]:
-            processor_info = ProcessorInfo(
-                server=server,
-                timestamp=timestamp,
-                cpu_count=data["processor"].get("cpu_count"),
-                model=data["processor"].get("model"),
-                cpu_percent=data["processor"].get("cpu_percent", 0.0)
-            )
-            db.session.add(processor_info)
-        
-        # Guardar procesos
-        if "processes" in data and isinstance(data["processes"], list):
-            for proc_data in data["processes"]:
-                process = Process(
-                    server=server,
-                    timestamp=timestamp,
-                    pid=proc_data.get("pid", 0),
-                    name=proc_data.get("name", "unknown"),
-                    username=proc_data.get("username")
-                )
-                db.session.add(process)
-        
-        # Guardar usuarios conectados
-        if "logged_in_users" in data and isinstance(data["logged_in_users"], list):
-            for user_data in data["logged_in_users"]:
-                logged_user = LoggedUser(
-                    server=server,
-                    timestamp=timestamp,
-                    username=user_data.get("username", "unknown"),
-                    terminal=user_data.get("terminal"),
-                    host=user_data.get("host")
-                )
-                db.session.add(logged_user)
+        with INGEST_STAGE_SECONDS.time(stage=stage):
+            stage_snapshot_in_db(data)
         
         # Commit a la base de datos
-        db.session.commit()
+        stage = "commit"
+        with INGEST_STAGE_SECONDS.time(stage=stage):
+            db.session.commit()
+        query_cache.invalidate_ip(data.get("ip_address", "unknown"))
         return True
     
     except Exception as e:
+        INGEST_ERRORS.inc(stage=stage)
         db.session.rollback()
         logger.error(f"Error al almacenar datos en base de datos: {e}")
         return False
 
 
-def find_data_for_ip_in_db(ip_address: str) -> Dict[str, Any]:
+def store_batch_in_db(batch: List[Dict[str, Any]]) -> List[bool]:
+    """
+    Almacena varias instantáneas en una sola transacción.
+    
+    Si la transacción del lote falla, cada instantánea se reintenta por separado
+    para que un registro inválido no descarte al resto.
+    
+    Args:
+        batch: Lista de datos de información del sistema
+        
+    Returns:
+        Lista con True/False por instantánea, en el mismo orden
+    """
+    stage = "store_db"
+    try:
+        with INGEST_STAGE_SECONDS.time(stage=stage):
+            # Las filas de procesos de todo el lote se cargan con una operación por tabla
+            pending_rows = {}
+            for data in batch:
+                stage_snapshot_in_db(data, pending_rows)
+            update_cpu_rollups(pending_rows.pop(CPU_SAMPLES, []))
+            for model, rows in pending_rows.items():
+                bulk_insert(model, rows)
+        stage = "commit"
+        with INGEST_STAGE_SECONDS.time(stage=stage):
+            db.session.commit()
+        for ip_address in {data.get("ip_address", "unknown") for data in batch}:
+            query_cache.invalidate_ip(ip_address)
+        return [True] * len(batch)
+    except Exception as e:
+        INGEST_ERRORS.inc(stage=stage)
+        db.session.rollback()
+        logger.warning(f"Falló el lote de {len(batch)} instantáneas, reintentando una a una: {e}")
+        return [store_data_in_db(data) for data in batch]
+
+
+def find_snapshots(server_id: int, limit: int, start: datetime.datetime = None,
+                   end: datetime.datetime = None) -> List[Any]:
+    """
+    Lista las instantáneas más recientes de un servidor dentro de un rango.
+    
+    Solo lee columnas incluidas en idx_snapshots_server_time, de modo que en
+    PostgreSQL se resuelve con un recorrido solo del índice.
+    
+    Args:
+        server_id: Id del servidor
+        limit: Máximo de instantáneas
+        start: Marca de tiempo mínima (inclusive)
+        end: Marca de tiempo máxima (inclusive)
+        
+    Returns:
+        Filas (id, timestamp, process_count, user_count, cpu_percent), de la más reciente a la más antigua
+    """
+    query = db.session.query(
+        Snapshot.id, Snapshot.timestamp, Snapshot.process_count, Snapshot.user_count, Snapshot.cpu_percent
+    ).filter(Snapshot.server_id == server_id)
+    if start is not None:
+        query = query.filter(Snapshot.timestamp >= start)
+    if end is not None:
+        query = query.filter(Snapshot.timestamp <= end)
+    return query.order_by(Snapshot.timestamp.desc()).limit(limit).all()
+
+
+def rows_by_snapshot(model, snapshots: List[Any]) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Obtiene las filas de una tabla hija para varias instantáneas con una sola consulta por clave.
+    
+    Args:
+        model: Modelo con columna snapshot_id (Process)
+        snapshots: Instantáneas devueltas por find_snapshots
+        
+    Returns:
+        Diccionario marca de tiempo ISO -> filas como diccionarios
+    """
+    timestamps = {snap.id: snap.timestamp.isoformat() for snap in snapshots}
+    # El rango de marcas de tiempo limita la búsqueda a las particiones de esas instantáneas
+    first = min(snap.timestamp for snap in snapshots)
+    last = max(snap.timestamp for snap in snapshots)
+    grouped = {}
+    for row in model.query.filter(
+        model.snapshot_id.in_(list(timestamps)),
+        model.timestamp.between(first, last)
+    ).order_by(model.id):
+        grouped.setdefault(timestamps[row.snapshot_id], []).append(row.to_dict())
+    return grouped
+
+
+def find_data_for_ip_in_db(ip_address: str, at: datetime.datetime = None, snapshot_count: int = 1,
+                           start: datetime.datetime = None, end: datetime.datetime = None) -> Dict[str, Any]:
     """
     Busca datos para una dirección IP específica en la base de datos.
     
     Args:
         ip_address: Dirección IP para consultar
+        at: Instante a consultar; equivale a end con una sola instantánea
+            (por defecto, la última instantánea)
+        snapshot_count: Cantidad de instantáneas completas a devolver
+        start: Devolver solo instantáneas desde esta marca de tiempo
+        end: Devolver solo instantáneas hasta esta marca de tiempo
         
     Returns:
         Diccionario con información del servidor y datos históricos
@@ -238,10 +555,77 @@ def find_data_for_ip_in_db(ip_address: str) -> Dict[str, Any]:
         # Construir respuesta con toda la información
         result = server.to_dict(include_relations=True)
         
-        # Últimos 20 procesos
-        latest_processes = Process.query.filter_by(server_id=server.id).order_by(
-            Process.timestamp.desc()
-        ).limit(100).all()
+        if at is not None:
+            end = at
+        snapshots = find_snapshots(server.id, snapshot_count, start, end)
+        
+        if snapshots:
+            result['snapshots'] = [
+                {
+                    "id": snap.id,
+                    "timestamp": snap.timestamp.isoformat(),
+                    "process_count": snap.process_count,
+                    "user_count": snap.user_count,
+                    "cpu_percent": snap.cpu_percent
+                }
+                for snap in snapshots
+            ]
+            if PROCESS_STORAGE == 'interval':
+                # Los procesos de cada instantánea se reconstruyen desde los intervalos
+                processes_by_time = {}
+                for snap in snapshots:
+                    running = processes_at(server.id, snap.timestamp)
+                    if running:
+                        processes_by_time[snap.timestamp.isoformat()] = [interval.to_dict(server.last_seen) for interval in running]
+            else:
+                processes_by_time = rows_by_snapshot(Process, snapshots)
+            if processes_by_time:
+                result['latest_processes'] = processes_by_time
+            # Los usuarios se guardan como versiones: se toma la vigente en cada instantánea
+            users_by_time = users_by_snapshot(server.id, snapshots)
+            if users_by_time:
+                result['latest_users'] = users_by_time
+        
+        if start is not None:
+            # Resúmenes horarios del rango (incluye períodos cuyas instantáneas ya se eliminaron)
+            summaries = SnapshotSummary.query.filter(
+                SnapshotSummary.server_id == server.id,
+                SnapshotSummary.bucket >= start.replace(minute=0, second=0, microsecond=0)
+            )
+            if end is not None:
+                summaries = summaries.filter(SnapshotSummary.bucket <= end)
+            summaries = summaries.order_by(SnapshotSummary.bucket).limit(MAX_QUERY_SUMMARIES).all()
+            if summaries:
+                result['summaries'] = [summary.to_dict() for summary in summaries]
+        
+        if snapshots:
+            return result
+        
+        if db.session.query(Snapshot.id).filter(Snapshot.server_id == server.id).first() is not None:
+            # El servidor tiene instantáneas, pero ninguna en el rango pedido: sin procesos ni usuarios
+            return result
+        
+        # Datos anteriores a la tabla snapshots: se agrupan las últimas filas del rango por timestamp
+        if PROCESS_STORAGE == 'interval':
+            point_in_time = end or server.last_seen
+            if start is not None and point_in_time < start:
+                point_in_time = None
+            running = processes_at(server.id, point_in_time) if point_in_time else []
+            if running:
+                result['latest_processes'] = {
+                    point_in_time.isoformat(): [interval.to_dict(server.last_seen) for interval in running]
+                }
+            latest_processes = []
+        else:
+            # Últimos 20 procesos
+            process_query = Process.query.filter_by(server_id=server.id)
+            if start is not None:
+                process_query = process_query.filter(Process.timestamp >= start)
+            if end is not None:
+                process_query = process_query.filter(Process.timestamp <= end)
+            latest_processes = process_query.order_by(
+                Process.timestamp.desc()
+            ).limit(100).all()
         
         if latest_processes:
             # Agrupamos por timestamp para mostrar los procesos en cada punto de tiempo
@@ -255,7 +639,12 @@ def find_data_for_ip_in_db(ip_address: str) -> Dict[str, Any]:
             result['latest_processes'] = processes_by_time
         
         # Últimos usuarios conectados
-        latest_users = LoggedUser.query.filter_by(server_id=server.id).order_by(
+        user_query = LoggedUser.query.filter_by(server_id=server.id)
+        if start is not None:
+            user_query = user_query.filter(LoggedUser.timestamp >= start)
+        if end is not None:
+            user_query = user_query.filter(LoggedUser.timestamp <= end)
+        latest_users = user_query.order_by(
             LoggedUser.timestamp.desc()
         ).limit(100).all()
         
@@ -277,60 +666,121 @@ def find_data_for_ip_in_db(ip_address: str) -> Dict[str, Any]:
         return None
 
 
-def find_data_for_ip_in_files(ip_address: str) -> List[Dict[str, Any]]:
+def find_data_for_ip_in_files(ip_address: str, start: datetime.datetime = None,
+                              end: datetime.datetime = None) -> Iterator[Dict[str, Any]]:
     """
-    Busca todos los datos para una dirección IP dada en archivos JSON
+    Busca los datos para una dirección IP dada en los archivos de respaldo
+    (formato JSONL actual y arreglos JSON antiguos), de a un registro.
     
     Args:
         ip_address: Dirección IP a buscar
+        start: Solo registros desde esta marca de tiempo (los archivos de días anteriores no se abren)
+        end: Solo registros hasta esta marca de tiempo (los archivos de días posteriores no se abren)
         
     Returns:
-        Lista de registros de datos para la IP
+        Generador de registros de datos para la IP
     """
-    results = []
-    
     try:
-        # Busca todos los archivos que puedan contener datos para esta IP
-        file_pattern = f"{ip_address}_*.json"
-        for file_path in DATA_DIR.glob(file_pattern):
-            try:
-                with open(file_path, 'r') as f:
-                    data = json.load(f)
-                    if isinstance(data, list):
-                        results.extend(data)
-                    elif isinstance(data, dict):
-                        results.append(data)
-            except json.JSONDecodeError:
-                logger.warning(f"No se pudo analizar el archivo JSON: {file_path}")
-            except Exception as e:
-                logger.error(f"Error al leer el archivo {file_path}: {e}")
+        yield from backup_store.iter_records(ip_address, start, end)
     except Exception as e:
         logger.error(f"Error al buscar archivos: {e}")
+
+
+def payload_encoding_label(content_encoding: Optional[str]) -> str:
+    """Content-Encoding normalizado para las métricas (valores acotados)."""
+    encoding = (content_encoding or "identity").strip().lower()
+    if encoding == "x-gzip":
+        return "gzip"
+    return encoding if encoding in CONTENT_ENCODINGS else "other"
+
+
+def decode_snapshot(body: bytes, content_encoding: Optional[str]) -> Tuple[Optional[Dict[str, Any]], Optional[tuple]]:
+    """
+    Decodifica y valida el cuerpo de /collect (compartido con asgi_server.py).
+    
+    Args:
+        body: Cuerpo de la solicitud (gzip/zstd y procesos en formato de columnas)
+        content_encoding: Valor del encabezado Content-Encoding
+        
+    Returns:
+        Tupla (instantánea, None) si es válida, o (None, (cuerpo del error, código HTTP))
+    """
+    INGEST_PAYLOAD_BYTES.observe(len(body), endpoint="collect", encoding=payload_encoding_label(content_encoding))
+    try:
+        with INGEST_STAGE_SECONDS.time(stage="parse"):
+            data = parse_body(body, content_encoding)
+    except PayloadError as e:
+        INGEST_ERRORS.inc(stage="parse")
+        return None, ({"status": "error", "message": str(e)}, e.status_code)
+    
+    # Validar campos requeridos
+    with INGEST_STAGE_SECONDS.time(stage="validate"):
+        error = validate_snapshot(data)
+        if not error:
+            # Agrega timestamp si no está presente
+            apply_defaults(data)
+    if error:
+        INGEST_ERRORS.inc(stage="validate")
+        return None, ({"status": "error", "message": error}, 400)
+    return data, None
+
+
+def admission_controlled(view):
+    """
+    Autentica y aplica el control de admisión a un endpoint de ingesta.
     
-    return results
+    Una clave inválida se rechaza con 401 sin consumir cupo ni concurrencia. El rechazo
+    de admisión (429 por agente, 503 por saturación) se responde con Retry-After antes de
+    leer el cuerpo; mientras hubo rechazos recientes, las respuestas llevan en
+    X-Report-Interval los segundos sugeridos hasta el próximo reporte del agente.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        # Antes de admitir: con ADMISSION_KEY=api_key, claves falsas crearían buckets propios
+        if not verify_api_key():
+            return auth_error_response()
+        key = request.headers.get('Authorization', '') if ADMISSION_KEY == 'api_key' else request.remote_addr
+        rejection = admission.admit(key or 'unknown')
+        if rejection is not None:
+            INGEST_ERRORS.inc(stage=rejection.reason)
+            response = jsonify({"status": "error", "message": rejection.message,
+                                "retry_after": rejection.retry_after})
+            response.status_code = rejection.status_code
+            response.headers['Retry-After'] = str(rejection.retry_after)
+        else:
+            started = time.perf_counter()
+            try:
+                response = app.make_response(view(*args, **kwargs))
+            finally:
+                admission.release(time.perf_counter() - started)
+        report_interval = admission.report_interval()
+        if report_interval:
+            response.headers['X-Report-Interval'] = str(report_interval)
+        return response
+    return wrapper
 
 
 @app.route('/collect', methods=['POST'])
+@admission_controlled
 def collect_data():
-    """Endpoint para recolectar información del sistema desde los agentes."""
-    # Verificar autenticación
-    if not verify_api_key():
-        return auth_error_response()
-        
+    """Endpoint para recolectar información del sistema desde los agentes (autenticado por admission_controlled)."""
     if not request.is_json:
         return jsonify({"status": "error", "message": "La solicitud debe ser JSON"}), 400
     
-    data = request.get_json()
-    
-    # Validar campos requeridos
-    required_fields = ["ip_address", "processor", "processes", "logged_in_users", "os_info"]
-    for field in required_fields:
-        if field not in data:
-            return jsonify({"status": "error", "message": f"Campo requerido faltante: {field}"}), 400
+    data, error = decode_snapshot(request.get_data(cache=False), request.headers.get('Content-Encoding'))
+    if error:
+        return jsonify(error[0]), error[1]
     
-    # Agrega timestamp si no está presente
-    if "timestamp" not in data:
-        data["timestamp"] = datetime.datetime.now(timezone.utc).isoformat()
+    # Modo asíncrono: encolar y responder sin esperar a la base de datos ni al disco
+    if ingest_queue is not None:
+        try:
+            ingest_queue.submit(data)
+        except QueueFullError:
+            INGEST_ERRORS.inc(stage="enqueue")
+            response = jsonify({"status": "error", "message": "Cola de ingesta llena, reintente más tarde"})
+            response.headers['Retry-After'] = str(INGEST_RETRY_AFTER)
+            return response, 503
+        return jsonify({"status": "accepted", "message": "Datos encolados para su almacenamiento"}), 202
     
     # Almacena en base de datos
     db_result = store_data_in_db(data)
@@ -344,40 +794,502 @@ def collect_data():
         return jsonify({"status": "error", "message": "Error al almacenar datos"}), 500
 
 
-@app.route('/query/<ip_address>', methods=['GET'])
-def query_data(ip_address):
+@app.route('/collect/batch', methods=['POST'])
+@admission_controlled
+def collect_batch():
     """
-    Endpoint para consultar datos para una dirección IP específica.
+    Endpoint para recibir varias instantáneas (de una o muchas IPs) en una sola solicitud.
+    
+    Acepta un arreglo JSON (application/json) o NDJSON (application/x-ndjson). Cada
+    instantánea se valida con las mismas reglas que /collect y se devuelve un estado
+    por elemento, de modo que un registro inválido no rechaza el lote completo. Los
+    elementos con "retryable": true fallaron por un error transitorio y pueden reenviarse;
+    si fallaron todos por esa causa se responde 503 con Retry-After.
+    La autenticación la hace admission_controlled.
+    """
+    ndjson = request.mimetype == 'application/x-ndjson'
+    if not (ndjson or request.is_json):
+        return jsonify({"status": "error", "message": "La solicitud debe ser JSON o NDJSON"}), 400
+    
+    body = request.get_data(cache=False)
+    content_encoding = request.headers.get('Content-Encoding')
+    INGEST_PAYLOAD_BYTES.observe(len(body), endpoint="collect_batch",
+                                 encoding=payload_encoding_label(content_encoding))
+    try:
+        with INGEST_STAGE_SECONDS.time(stage="parse"):
+            items = parse_batch_body(body, content_encoding, ndjson)
+    except PayloadError as e:
+        INGEST_ERRORS.inc(stage="parse")
+        return jsonify({"status": "error", "message": str(e)}), e.status_code
+    
+    if not items:
+        return jsonify({"status": "error", "message": "El lote no contiene instantáneas"}), 400
+    if len(items) > MAX_BATCH_ITEMS:
+        return jsonify({"status": "error", "message": f"El lote supera el máximo de {MAX_BATCH_ITEMS} instantáneas"}), 413
+    
+    # Validar cada elemento; los válidos se escriben juntos
+    results = [None] * len(items)
+    valid_indexes = []
+    with INGEST_STAGE_SECONDS.time(stage="validate"):
+        for i, item in enumerate(items):
+            error = str(item) if isinstance(item, PayloadError) else validate_snapshot(item)
+            if error:
+                INGEST_ERRORS.inc(stage="parse" if isinstance(item, PayloadError) else "validate")
+                results[i] = {"index": i, "status": "error", "message": error}
+            else:
+                apply_defaults(item)
+                valid_indexes.append(i)
+    
+    if ingest_queue is not None:
+        # Modo asíncrono: cada instantánea se encola por separado
+        for i in valid_indexes:
+            try:
+                ingest_queue.submit(items[i])
+                results[i] = {"index": i, "status": "accepted"}
+            except QueueFullError:
+                INGEST_ERRORS.inc(stage="enqueue")
+                results[i] = {"index": i, "status": "error", "retryable": True,
+                              "message": "Cola de ingesta llena, reintente más tarde"}
+    elif valid_indexes:
+        # Una sola transacción para todo el lote
+        stored = write_snapshot_batch([items[i] for i in valid_indexes])
+        for i, ok in zip(valid_indexes, stored):
+            results[i] = {"index": i, "status": "stored"} if ok else \
+                {"index": i, "status": "error", "retryable": True, "message": "Error al almacenar datos"}
+    
+    ok_count = sum(1 for r in results if r["status"] != "error")
+    retryable_count = sum(1 for r in results if r.get("retryable"))
+    if ok_count == len(results):
+        status_code = 202 if ingest_queue is not None else 201
+    elif ok_count:
+        status_code = 207
+    elif retryable_count == len(results):
+        # Todo el lote falló por errores transitorios: el cliente puede reenviarlo completo
+        status_code = 503
+    else:
+        status_code = 400
+    
+    response = jsonify({
+        "status": "success" if ok_count == len(results) else "partial" if ok_count else "error",
+        "total": len(results),
+        "stored": ok_count,
+        "failed": len(results) - ok_count,
+        "items": results
+    })
+    if retryable_count:
+        response.headers['Retry-After'] = str(INGEST_RETRY_AFTER)
+    return response, status_code
+
+
+def parse_time_param(name: str, args: Mapping[str, str] = None) -> Optional[datetime.datetime]:
+    """
+    Lee un parámetro de consulta con una marca de tiempo ISO 8601 y la normaliza a UTC sin zona.
+    
+    Args:
+        name: Nombre del parámetro
+        args: Parámetros de consulta (por defecto, los de la solicitud de Flask en curso)
+        
+    Returns:
+        Marca de tiempo, o None si el parámetro no está presente
+        
+    Raises:
+        ValueError: Si el valor no es una fecha ISO 8601
+    """
+    value = (request.args if args is None else args).get(name)
+    if not value:
+        return None
+    try:
+        parsed = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Parámetro '{name}' inválido, use formato ISO 8601")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def parse_query_filters(args: Mapping[str, str]) -> Dict[str, Any]:
+    """
+    Lee los filtros de /query/<ip_address> (compartido con asgi_server.py).
+    
+    Args:
+        args: Parámetros de consulta
+        
+    Returns:
+        Filtros de find_data_for_ip_in_db (at, snapshot_count, start, end)
+        
+    Raises:
+        ValueError: Si algún parámetro es inválido
+    """
+    at = parse_time_param('at', args)
+    start = parse_time_param('from', args)
+    end = parse_time_param('to', args)
+    snapshot_count = args.get('snapshots', '1')
+    if not snapshot_count.isdigit() or not 1 <= int(snapshot_count) <= MAX_QUERY_SNAPSHOTS:
+        raise ValueError(f"Parámetro 'snapshots' debe ser un entero entre 1 y {MAX_QUERY_SNAPSHOTS}")
+    return {"at": at, "snapshot_count": int(snapshot_count), "start": start, "end": end}
+
+
+def server_data_version(ip_address: str) -> Optional[int]:
+    """
+    Versión de los datos de una IP (servers.data_version), con la que se valida la caché
+    de /query: cambia con cada instantánea, la reciba el proceso que la reciba.
+    
+    Returns:
+        Versión, o None si el servidor no existe o la base de datos no responde
+    """
+    try:
+        return db.session.query(Server.data_version).filter(Server.ip_address == ip_address).scalar()
+    except Exception as e:
+        db.session.rollback()
+        logger.warning(f"No se pudo leer la versión de los datos de {ip_address}: {e}")
+        return None
+
+
+def build_query_response(ip_address: str, **filters) -> tuple:
+    """
+    Construye la respuesta de /query/<ip_address>.
     
     Args:
         ip_address: Dirección IP para consultar
+        filters: Filtros de find_data_for_ip_in_db (at, snapshot_count, start, end)
+        
+    Returns:
+        Tupla (cuerpo, código HTTP). El cuerpo es un diccionario, o un iterador con los
+        registros de los archivos de respaldo para enviarlos en streaming
     """
     # Intentar obtener datos de la base de datos (forma preferida)
-    db_results = find_data_for_ip_in_db(ip_address)
+    db_results = find_data_for_ip_in_db(ip_address, **filters)
     
     if db_results:
-        return jsonify({"status": "success", "data": db_results}), 200
+        return {"status": "success", "data": db_results}, 200
     
-    # Fallback a los archivos JSON si no hay datos en la base de datos
-    file_results = find_data_for_ip_in_files(ip_address)
+    # Fallback a los archivos de respaldo si no hay datos en la base de datos
+    file_results = find_data_for_ip_in_files(ip_address, filters.get("start"), filters.get("end") or filters.get("at"))
+    first = next(file_results, None)
     
-    if file_results:
-        return jsonify({"status": "success", "data": file_results}), 200
+    if first is not None:
+        return itertools.chain([first], file_results), 200
     
     # No hay datos en ninguna fuente
-    return jsonify({"status": "error", "message": f"No se encontraron datos para la IP: {ip_address}"}), 404
+    return {"status": "error", "message": f"No se encontraron datos para la IP: {ip_address}"}, 404
+
+
+@app.route('/query/<ip_address>', methods=['GET'])
+def query_data(ip_address):
+    """
+    Endpoint para consultar datos para una dirección IP específica.
+    
+    Parámetros opcionales (marcas de tiempo ISO 8601, UTC):
+    - snapshots: cantidad de instantáneas completas a devolver (1 por defecto, hasta MAX_QUERY_SNAPSHOTS)
+    - from / to: rango de marcas de tiempo de las instantáneas
+    - at: instante a consultar (equivale a to con una instantánea)
+    
+    - format: 'json' (por defecto) o 'ndjson' (también con Accept: application/x-ndjson)
+    
+    Las respuestas se guardan serializadas en la caché hasta que llega una nueva
+    instantánea de la IP a cualquier proceso (servers.data_version); los clientes que
+    envían If-None-Match con el ETag vigente reciben 304 leyendo solo esa versión. Si la IP solo tiene datos en los archivos
+    de respaldo, los registros del rango se leen y envían en streaming, sin caché, como
+    arreglo JSON o, con format=ndjson, un registro por línea.
+    
+    Args:
+        ip_address: Dirección IP para consultar
+    """
+    output_format = request.args.get('format') or (
+        'ndjson' if request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson'])
+        == 'application/x-ndjson' else 'json')
+    if output_format not in ('json', 'ndjson'):
+        return jsonify({"status": "error", "message": "Parámetro 'format' debe ser 'json' o 'ndjson'"}), 400
+    
+    cache_key = (ip_address, tuple(sorted(request.args.items(multi=True))))
+    version = server_data_version(ip_address) if query_cache.enabled else None
+    cached = query_cache.get(cache_key, version)
+    
+    if cached is None:
+        try:
+            filters = parse_query_filters(request.args)
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+        
+        result, status_code = build_query_response(ip_address, **filters)
+        if not isinstance(result, dict):
+            # Registros de los archivos de respaldo: pueden ser muchos, no se guardan en la caché
+            return stream_records(result, ndjson=output_format == 'ndjson')
+        cached = query_cache.put(cache_key, jsonify(result).get_data(), status_code, version)
+    
+    if request.if_none_match.contains(cached.etag):
+        response = app.response_class(status=304)
+    else:
+        response = app.response_class(cached.body, status=cached.status, mimetype='application/json')
+    response.set_etag(cached.etag)
+    # Los clientes pueden guardar la respuesta pero deben revalidarla con el ETag
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+# Bytes acumulados antes de enviar cada fragmento de una respuesta en streaming
+STREAM_CHUNK_BYTES = 65536
+
+
+def record_chunks(records: Iterator[Dict[str, Any]], ndjson: bool) -> Iterator[str]:
+    """
+    Serializa registros de los archivos de respaldo de a uno, en fragmentos de hasta
+    STREAM_CHUNK_BYTES (compartido con asgi_server.py).
+    
+    Args:
+        records: Iterador de registros
+        ndjson: Un registro por línea (application/x-ndjson) en lugar de
+            {"status": "success", "data": [...]}
+    """
+    chunk, size = ['' if ndjson else '{"status":"success","data":['], 0
+    for i, record in enumerate(records):
+        line = json.dumps(record, default=str)
+        line = line + '\n' if ndjson else (',' if i else '') + line
+        chunk.append(line)
+        size += len(line)
+        if size >= STREAM_CHUNK_BYTES:
+            yield ''.join(chunk)
+            chunk, size = [], 0
+    if not ndjson:
+        chunk.append(']}')
+    yield ''.join(chunk)
+
+
+def stream_records(records: Iterator[Dict[str, Any]], ndjson: bool):
+    """
+    Respuesta en streaming con registros de los archivos de respaldo.
+    
+    La memoria usada no depende de la cantidad de registros (ver record_chunks).
+    
+    Args:
+        records: Iterador de registros
+        ndjson: Un registro por línea (application/x-ndjson) en lugar de
+            {"status": "success", "data": [...]}
+    """
+    return app.response_class(record_chunks(records, ndjson),
+                              mimetype='application/x-ndjson' if ndjson else 'application/json')
+
+
+def parse_step_param() -> Optional[int]:
+    """
+    Lee el parámetro step: segundos, o un número con sufijo s, m, h o d ("5m", "1h").
+    
+    Returns:
+        Segundos, o None si el parámetro no está presente
+        
+    Raises:
+        ValueError: Si el valor no es válido
+    """
+    value = request.args.get('step')
+    if not value:
+        return None
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    number, unit = (value[:-1], units[value[-1]]) if value[-1] in units else (value, 1)
+    if not number.isdigit() or int(number) == 0:
+        raise ValueError("Parámetro 'step' inválido, use segundos o un sufijo s, m, h o d (por ejemplo 5m)")
+    return int(number) * unit
+
+
+@app.route('/metrics/<ip_address>/cpu', methods=['GET'])
+def cpu_metrics(ip_address):
+    """
+    Endpoint con la serie de uso de CPU de un servidor.
+    
+    Parámetros opcionales:
+    - from / to: rango (ISO 8601, UTC); por defecto, las últimas 24 horas
+    - step: separación entre puntos; por defecto, la resolución más fina que entrega
+      como máximo METRICS_MAX_POINTS puntos
+    
+    Se lee la resolución pre-agregada más gruesa (1m, 1h o 1d) que no supera step, y
+    cada punto incluye samples, min, avg, max y p95.
+    """
+    try:
+        end = parse_time_param('to') or datetime.datetime.now(timezone.utc).replace(tzinfo=None)
+        start = parse_time_param('from') or end - datetime.timedelta(days=1)
+        step = parse_step_param()
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    if start >= end:
+        return jsonify({"status": "error", "message": "El parámetro 'from' debe ser anterior a 'to'"}), 400
+    if step is None:
+        step = default_step(start, end, METRICS_MAX_POINTS)
+    if (end - start).total_seconds() / step > METRICS_MAX_POINTS:
+        return jsonify({"status": "error",
+                        "message": f"El rango pedido supera los {METRICS_MAX_POINTS} puntos, aumente 'step'"}), 400
+    
+    server = Server.query.filter_by(ip_address=ip_address).first()
+    if not server:
+        return jsonify({"status": "error", "message": f"No se encontraron datos para la IP: {ip_address}"}), 404
+    
+    resolution, points = cpu_series(server.id, start, end, step)
+    return jsonify({
+        "status": "success",
+        "ip_address": ip_address,
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "step": step,
+        "resolution": resolution,
+        "points": points
+    }), 200
+
+
+@app.route('/search/processes', methods=['GET'])
+def search_processes_endpoint():
+    """
+    Endpoint para buscar qué servidores están ejecutando un proceso o tienen procesos de un usuario.
+    
+    Consulta el estado actual (última instantánea de cada servidor), no el historial.
+    
+    Parámetros (al menos uno de name, user o prefix):
+    - name: nombre exacto del proceso ("xmrig")
+    - prefix: prefijo del nombre del proceso ("xmr")
+    - user: usuario exacto ("deploy")
+    - seen_since: solo servidores vistos desde esta marca de tiempo (ISO 8601, UTC)
+    - limit: máximo de resultados (hasta SEARCH_MAX_RESULTS)
+    """
+    name = request.args.get('name')
+    prefix = request.args.get('prefix')
+    username = request.args.get('user')
+    if not (name or prefix or username):
+        return jsonify({"status": "error", "message": "Indique al menos uno de los parámetros name, prefix o user"}), 400
+    
+    limit = request.args.get('limit', str(SEARCH_MAX_RESULTS))
+    if not limit.isdigit() or not 1 <= int(limit) <= SEARCH_MAX_RESULTS:
+        return jsonify({"status": "error",
+                        "message": f"Parámetro 'limit' debe ser un entero entre 1 y {SEARCH_MAX_RESULTS}"}), 400
+    try:
+        seen_since = parse_time_param('seen_since')
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    
+    matches = search_processes(name, username, prefix, seen_since, int(limit))
+    return jsonify({
+        "status": "success",
+        "count": len(matches),
+        "servers": sorted({match["ip_address"] for match in matches}),
+        "matches": matches
+    }), 200
 
 
 @app.route('/servers', methods=['GET'])
 def list_servers():
-    """Endpoint para listar todos los servidores monitoreados."""
+    """
+    Endpoint para listar los servidores monitoreados, del más reciente al más antiguo.
+    
+    Parámetros opcionales:
+    - limit: servidores por página (SERVERS_PAGE_SIZE por defecto, hasta SERVERS_PAGE_MAX)
+    - cursor: valor de next_cursor de la página anterior
+    - seen_since: solo servidores vistos desde esta marca de tiempo (ISO 8601, UTC)
+    - ip: prefijo de IP ("10.0.") o red CIDR IPv4 ("10.0.0.0/16")
+    - os: familia de S.O. ("Linux", "Windows")
+    
+    Cada página es una búsqueda por índice sin OFFSET y la respuesta se serializa en
+    streaming, de modo que el costo no depende del tamaño de la flota; next_cursor
+    es null en la última página.
+    """
     try:
-        servers = Server.query.all()
-        result = [server.to_dict() for server in servers]
-        return jsonify({"status": "success", "servers": result}), 200
+        servers, next_cursor = load_servers_page(request.args)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
     except Exception as e:
         logger.error(f"Error al listar servidores: {e}")
         return jsonify({"status": "error", "message": "Error al listar servidores"}), 500
+    
+    return app.response_class(servers_page_chunks(servers, next_cursor), mimetype='application/json')
+
+
+def load_servers_page(args: Mapping[str, str]) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Lee una página de /servers (compartido con asgi_server.py).
+    
+    Args:
+        args: Parámetros de consulta (limit, cursor, seen_since, ip, os)
+        
+    Returns:
+        Tupla (servidores como diccionarios, next_cursor o None en la última página)
+        
+    Raises:
+        ValueError: Si algún parámetro es inválido
+    """
+    limit = args.get('limit', str(SERVERS_PAGE_SIZE))
+    if not limit.isdigit() or not 1 <= int(limit) <= SERVERS_PAGE_MAX:
+        raise ValueError(f"Parámetro 'limit' debe ser un entero entre 1 y {SERVERS_PAGE_MAX}")
+    limit = int(limit)
+    
+    query = servers_page_query(
+        limit,
+        cursor=args.get('cursor'),
+        seen_since=parse_time_param('seen_since', args),
+        ip_filter=args.get('ip'),
+        os_family=args.get('os')
+    )
+    # La página está acotada por limit: se lee completa y solo se serializa en streaming
+    servers = [server.to_dict() for server in db.session.execute(query).scalars()]
+    
+    next_cursor = None
+    if len(servers) > limit:
+        # Fila extra: hay una página siguiente a partir del último servidor devuelto
+        servers.pop()
+        next_cursor = encode_cursor(servers[-1])
+    return servers, next_cursor
+
+
+def servers_page_chunks(servers: List[Dict[str, Any]], next_cursor: Optional[str]) -> Iterator[str]:
+    """Serializa una página de /servers de a un servidor."""
+    yield '{"status":"success","servers":['
+    for i, server in enumerate(servers):
+        yield (',' if i else '') + json.dumps(server)
+    yield f'],"next_cursor":{json.dumps(next_cursor)}}}'
+
+
+@app.route('/export', methods=['GET'])
+def export_data():
+    """
+    Endpoint para exportar la telemetría de la flota como CSV o NDJSON (requiere API Key).
+    
+    Parámetros:
+    - table: processes, process_intervals (con PROCESS_STORAGE=interval), processor_info,
+      logged_users u os_info
+    - from / to: rango de marcas de tiempo (ISO 8601, UTC); por defecto, las últimas 24 horas
+    - servers: IPs separadas por comas (también puede repetirse); ip: prefijo o red CIDR IPv4
+    - format: 'csv' (por defecto, con encabezado) u 'ndjson'
+    
+    Las filas se envían en streaming sin pasar por el ORM (COPY TO STDOUT en PostgreSQL),
+    comprimidas con gzip si el cliente envía Accept-Encoding: gzip.
+    """
+    if not verify_api_key():
+        return auth_error_response()
+    
+    table_name = request.args.get('table', '')
+    output_format = request.args.get('format', 'csv')
+    servers = [ip.strip() for value in request.args.getlist('servers') for ip in value.split(',') if ip.strip()]
+    compress = request.accept_encodings['gzip'] > 0
+    try:
+        end = parse_time_param('to') or datetime.datetime.now(timezone.utc).replace(tzinfo=None)
+        start = parse_time_param('from') or end - datetime.timedelta(days=1)
+        chunks = export_chunks(db.engine, table_name, output_format, start, end,
+                               servers=servers or None, ip_filter=request.args.get('ip'), compress=compress,
+                               process_storage=PROCESS_STORAGE)
+        # El primer fragmento ejecuta la consulta: sus errores todavía pueden responderse con un código
+        first = next(chunks, b'')
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error al exportar {table_name}: {e}")
+        return jsonify({"status": "error", "message": "Error al exportar datos"}), 500
+    
+    def generate():
+        # yield from propaga el cierre (cliente desconectado) a la exportación en curso
+        yield first
+        yield from chunks
+    
+    response = app.response_class(generate(), mimetype=EXPORT_FORMATS[output_format])
+    if compress:
+        response.headers['Content-Encoding'] = 'gzip'
+    response.headers['Vary'] = 'Accept-Encoding'
+    filename = f"{table_name}_{start:%Y%m%dT%H%M%S}_{end:%Y%m%dT%H%M%S}.{output_format}"
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
 
 
 @app.route('/health', methods=['GET'])
@@ -393,14 +1305,84 @@ def health_check():
     except Exception as e:
         db_status = f"error: {str(e)}"
     
-    return jsonify({
+    return jsonify(health_status(db_status)), 200
+
+
+def health_status(db_status: str) -> Dict[str, Any]:
+    """
+    Cuerpo de /health (compartido con asgi_server.py).
+    
+    Args:
+        db_status: "ok" o el error de la verificación de la base de datos
+    """
+    result = {
         "status": "ok", 
         "message": "API en ejecución",
         "database": db_status,
         "timestamp": datetime.datetime.now(timezone.utc).isoformat()
+    }
+    if ingest_queue is not None:
+        result["ingest_queue"] = ingest_queue.stats()
+    if query_cache.enabled:
+        result["query_cache"] = query_cache.stats()
+    if server_id_cache.max_entries > 0:
+        result["server_id_cache"] = server_id_cache.stats()
+    result["admission"] = admission.stats()
+    return result
+
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """
+    Métricas de la API en formato de texto de Prometheus (tiempos por etapa de la ingesta,
+    tamaños de cuerpo, procesos por instantánea, espera del pool, errores y solicitudes HTTP).
+    """
+    return app.response_class(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@app.route('/debug/slow-requests', methods=['GET'])
+def slow_requests():
+    """Últimas solicitudes lentas con sus pilas muestreadas (requiere SLOW_REQUEST_MS > 0)."""
+    if not verify_api_key():
+        return auth_error_response()
+    if request_profiler is None:
+        return jsonify({"status": "error", "message": "El perfilador está desactivado (SLOW_REQUEST_MS=0)"}), 404
+    return jsonify({
+        "status": "success",
+        "threshold_ms": SLOW_REQUEST_MS,
+        "requests": request_profiler.reports()
     }), 200
 
 
+@app.before_request
+def start_request_timer():
+    """Marcar el inicio de la solicitud para las métricas y el perfilador."""
+    g.request_started = time.perf_counter()
+    if request_profiler is not None:
+        request_profiler.begin()
+
+
+@app.after_request
+def record_request_metrics(response):
+    """Registrar la duración y el código de la solicitud por endpoint."""
+    started = g.pop('request_started', None)
+    if started is not None:
+        endpoint = request.endpoint or "unmatched"
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint)
+        HTTP_REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+    if request_profiler is not None:
+        request_profiler.end(f"{request.method} {request.full_path.rstrip('?')}")
+    return response
+
+
+@app.after_request
+def advertise_encodings(response):
+    """Anunciar en las respuestas de /collect las codificaciones de cuerpo aceptadas."""
+    if request.endpoint in ('collect_data', 'collect_batch'):
+        response.headers['Accept-Encoding'] = ', '.join(CONTENT_ENCODINGS)
+    return response
+
+
 @app.route('/', methods=['GET'])
 def root():
     """Endpoint raíz con información de la API."""
@@ -408,16 +1390,28 @@ def root():
         "name": "API de Recolección de Información de Sistemas",
         "version": "2.0.0",
         "database_support": True,
+        "ingest": {
+            "content_encodings": CONTENT_ENCODINGS,
+            "process_encodings": PROCESS_ENCODINGS
+        },
         "endpoints": {
             "/collect": "POST - Enviar datos de información del sistema",
+            "/collect/batch": "POST - Enviar varias instantáneas (arreglo JSON o NDJSON)",
             "/query/<ip_address>": "GET - Consultar datos para una dirección IP específica",
-            "/servers": "GET - Listar todos los servidores monitoreados",
+            "/metrics/<ip_address>/cpu": "GET - Serie de uso de CPU (min/avg/max/p95) de un servidor",
+            "/search/processes": "GET - Servidores que ejecutan ahora un proceso o usuario (?name=&user=&prefix=)",
+            "/export": "GET - Exportar processes, processor_info, logged_users u os_info como CSV o NDJSON",
+            "/servers": "GET - Listar los servidores monitoreados (paginado por cursor, con filtros)",
+            "/metrics": "GET - Métricas de la API en formato Prometheus",
+            "/debug/slow-requests": "GET - Pilas muestreadas de las últimas solicitudes lentas (SLOW_REQUEST_MS)",
             "/health": "GET - Verificar estado del sistema"
         }
     }), 200
 
 
 if __name__ == "__main__":
+    # SIGTERM (docker stop) debe pasar por atexit para vaciar la cola de ingesta
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
     setup_app()
     # En producción, FLASK_ENV debe ser 'production' y DEBUG debe ser False
     debug_mode = os.getenv('FLASK_ENV') == 'development'
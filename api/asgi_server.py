@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+API de Recolección de Información de Sistemas (modo ASGI)
+---------------------------------------------------------
+Modo de servicio asíncrono alternativo a api_server.py, con los mismos contratos de
+/collect, /query/<ip_address>, /servers, /health y /metrics:
+- Un bucle de eventos por proceso atiende todas las solicitudes en curso: mientras una
+  espera a PostgreSQL o al disco, el proceso atiende a las demás, sin un hilo por solicitud
+- La base de datos se usa con asyncpg y un pool de conexiones asíncrono (DB_POOL_*), a
+  través de la extensión asyncio de SQLAlchemy. El código de escritura y consulta de
+  api_server.py (touch_server, secciones estáticas, agregados de CPU, COPY de procesos,
+  consultas del ORM) se reutiliza con AsyncSession.run_sync: se ejecuta en un greenlet y
+  cada sentencia cede el bucle mientras espera a asyncpg
+- El respaldo en archivos se agrega en el pool de hilos del bucle, en paralelo con la
+  escritura en la base de datos; el fallback de /query lee los archivos del mismo modo
+- Decodificación y validación del cuerpo, control de admisión, cachés, cola de ingesta
+  (INGEST_MODE=async) y métricas son los de api_server.py
+
+Requiere PostgreSQL (asyncpg); DATABASE_URL se usa con el driver postgresql+asyncpg.
+
+Uso:
+  WEB_SERVER=asgi gunicorn -c gunicorn.conf.py
+  python asgi_server.py
+"""
+
+import time
+import asyncio
+import itertools
+import contextlib
+import logging
+from functools import wraps
+from typing import Dict, Any
+
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header, parse_etags, parse_options_header, quote_etag
+
+import api_server
+from api_server import (app as flask_app, db, engine_options, api_key_valid, decode_snapshot, parse_query_filters,
+                        find_data_for_ip_in_db, find_data_for_ip_in_files, server_data_version, record_chunks,
+                        load_servers_page, servers_page_chunks, health_status, stage_snapshot_in_db, store_data_in_file,
+                        admission, query_cache, ADMISSION_KEY, AUTH_ERROR_MESSAGE, INGEST_RETRY_AFTER)
+from ingest_queue import QueueFullError
+from payload_codec import CONTENT_ENCODINGS
+from metrics import registry, INGEST_STAGE_SECONDS, INGEST_ERRORS, HTTP_REQUEST_SECONDS, HTTP_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+# La misma base de datos que api_server.py, con el driver asíncrono
+database_url = make_url(flask_app.config['SQLALCHEMY_DATABASE_URI'])
+if database_url.get_backend_name() != 'postgresql':
+    raise RuntimeError("asgi_server.py requiere PostgreSQL (DATABASE_URL=postgresql://...)")
+ASYNC_DATABASE_URL = database_url.set(drivername='postgresql+asyncpg').render_as_string(hide_password=False)
+
+# Engine asíncrono de este proceso; se crea al iniciar el bucle de eventos (lifespan)
+engine = None
+
+
+def json_body(payload: Dict[str, Any]) -> bytes:
+    """Serializa como jsonify de api_server.py: mismos bytes y, en la caché, mismos ETag."""
+    return (flask_app.json.dumps(payload, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def json_response(payload: Dict[str, Any], status_code: int = 200, headers: Dict[str, str] = None) -> Response:
+    """Respuesta JSON con el formato de api_server.py."""
+    return Response(json_body(payload), status_code=status_code, headers=headers, media_type='application/json')
+
+
+def auth_error_response(request: Request) -> Response:
+    """Respuesta 401 de autenticación fallida."""
+    logger.warning(f"Intento de acceso no autorizado al endpoint {request.url.path} "
+                   f"desde {request.client.host if request.client else 'unknown'}")
+    return json_response({"error": AUTH_ERROR_MESSAGE}, 401)
+
+
+def _with_db_session(session, fn, *args, **kwargs):
+    """
+    Ejecuta fn (código síncrono de api_server.py que usa db.session) sobre la sesión de
+    AsyncSession.run_sync. Corre dentro del greenlet de run_sync.
+    """
+    with flask_app.app_context():
+        db.session.registry.set(session)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            # Sin sesión registrada, el cierre del contexto de Flask no la toca: la cierra AsyncSession
+            db.session.registry.clear()
+
+
+async def run_in_session(fn, *args, **kwargs) -> Any:
+    """
+    Ejecuta una consulta de api_server.py en una sesión asíncrona (sin commit).
+
+    Args:
+        fn: Función que usa db.session (find_data_for_ip_in_db, load_servers_page)
+
+    Returns:
+        El resultado de fn
+    """
+    async with AsyncSession(engine) as session:
+        return await session.run_sync(_with_db_session, fn, *args, **kwargs)
+
+
+async def store_data_in_db(data: Dict[str, Any]) -> bool:
+    """
+    Almacena la información del sistema en la base de datos (como store_data_in_db de api_server.py).
+
+    Args:
+        data: Datos de información del sistema
+
+    Returns:
+        True si tiene éxito, False en caso contrario
+    """
+    stage = "store_db"
+    async with AsyncSession(engine) as session:
+        try:
+            with INGEST_STAGE_SECONDS.time(stage=stage):
+                await session.run_sync(_with_db_session, stage_snapshot_in_db, data)
+            stage = "commit"
+            with INGEST_STAGE_SECONDS.time(stage=stage):
+                await session.commit()
+        except Exception as e:
+            INGEST_ERRORS.inc(stage=stage)
+            await session.rollback()
+            logger.error(f"Error al almacenar datos en base de datos: {e}")
+            return False
+    query_cache.invalidate_ip(data.get("ip_address", "unknown"))
+    return True
+
+
+def instrumented(view):
+    """Registra la duración y el código de cada solicitud del endpoint (como en api_server.py)."""
+    @wraps(view)
+    async def wrapper(request: Request) -> Response:
+        started = time.perf_counter()
+        response = await view(request)
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=view.__name__)
+        HTTP_REQUESTS.inc(endpoint=view.__name__, status=response.status_code)
+        return response
+    return wrapper
+
+
+def admission_controlled(view):
+    """
+    Autentica y aplica el control de admisión de api_server.py a un endpoint de ingesta:
+    401 sin consumir cupo, rechazo con Retry-After antes de leer el cuerpo,
+    X-Report-Interval y codificaciones aceptadas.
+    """
+    @wraps(view)
+    async def wrapper(request: Request) -> Response:
+        if not api_key_valid(request.headers.get('Authorization')):
+            return auth_error_response(request)
+        if ADMISSION_KEY == 'api_key':
+            key = request.headers.get('Authorization', '')
+        else:
+            key = request.client.host if request.client else ''
+        rejection = admission.admit(key or 'unknown')
+        if rejection is not None:
+            INGEST_ERRORS.inc(stage=rejection.reason)
+            response = json_response({"status": "error", "message": rejection.message,
+                                      "retry_after": rejection.retry_after},
+                                     rejection.status_code, {'Retry-After': str(rejection.retry_after)})
+        else:
+            started = time.perf_counter()
+            try:
+                response = await view(request)
+            finally:
+                admission.release(time.perf_counter() - started)
+        report_interval = admission.report_interval()
+        if report_interval:
+            response.headers['X-Report-Interval'] = str(report_interval)
+        response.headers['Accept-Encoding'] = ', '.join(CONTENT_ENCODINGS)
+        return response
+    return wrapper
+
+
+def is_json(request: Request) -> bool:
+    """Content-Type JSON, con el mismo criterio que request.is_json de Flask."""
+    mimetype = parse_options_header(request.headers.get('Content-Type'))[0].lower()
+    return mimetype == 'application/json' or (mimetype.startswith('application/') and mimetype.endswith('+json'))
+
+
+@instrumented
+@admission_controlled
+async def collect_data(request: Request) -> Response:
+    """Endpoint para recolectar información del sistema desde los agentes (autenticado por admission_controlled)."""
+    if not is_json(request):
+        return json_response({"status": "error", "message": "La solicitud debe ser JSON"}, 400)
+
+    data, error = decode_snapshot(await request.body(), request.headers.get('Content-Encoding'))
+    if error:
+        return json_response(*error)
+
+    # Modo asíncrono: encolar y responder sin esperar a la base de datos ni al disco
+    if api_server.ingest_queue is not None:
+        try:
+            api_server.ingest_queue.submit(data)
+        except QueueFullError:
+            INGEST_ERRORS.inc(stage="enqueue")
+            return json_response({"status": "error", "message": "Cola de ingesta llena, reintente más tarde"},
+                                 503, {'Retry-After': str(INGEST_RETRY_AFTER)})
+        return json_response({"status": "accepted", "message": "Datos encolados para su almacenamiento"}, 202)
+
+    # Base de datos (asyncpg) y archivo (pool de hilos) a la vez
+    db_result, file_result = await asyncio.gather(store_data_in_db(data),
+                                                  asyncio.to_thread(store_data_in_file, data))
+
+    if db_result or file_result:
+        return json_response({"status": "success", "message": "Datos almacenados correctamente"}, 201)
+    else:
+        return json_response({"status": "error", "message": "Error al almacenar datos"}, 500)
+
+
+@instrumented
+async def query_data(request: Request) -> Response:
+    """
+    Endpoint para consultar datos para una dirección IP específica (mismos parámetros,
+    caché y ETag que /query/<ip_address> en api_server.py).
+    """
+    ip_address = request.path_params['ip_address']
+    args = request.query_params
+    accept = parse_accept_header(request.headers.get('Accept'), MIMEAccept)
+    output_format = args.get('format') or (
+        'ndjson' if accept.best_match(['application/json', 'application/x-ndjson'])
+        == 'application/x-ndjson' else 'json')
+    if output_format not in ('json', 'ndjson'):
+        return json_response({"status": "error", "message": "Parámetro 'format' debe ser 'json' o 'ndjson'"}, 400)
+
+    cache_key = (ip_address, tuple(sorted(args.multi_items())))
+    version = await run_in_session(server_data_version, ip_address) if query_cache.enabled else None
+    cached = query_cache.get(cache_key, version)
+
+    if cached is None:
+        try:
+            filters = parse_query_filters(args)
+        except ValueError as e:
+            return json_response({"status": "error", "message": str(e)}, 400)
+
+        db_results = await run_in_session(find_data_for_ip_in_db, ip_address, **filters)
+        if db_results:
+            result, status_code = {"status": "success", "data": db_results}, 200
+        else:
+            # Fallback a los archivos de respaldo, leídos en el pool de hilos y sin caché
+            records = find_data_for_ip_in_files(ip_address, filters["start"], filters["end"] or filters["at"])
+            first = await asyncio.to_thread(next, records, None)
+            if first is not None:
+                ndjson = output_format == 'ndjson'
+                return StreamingResponse(record_chunks(itertools.chain([first], records), ndjson),
+                                         media_type='application/x-ndjson' if ndjson else 'application/json')
+            result = {"status": "error", "message": f"No se encontraron datos para la IP: {ip_address}"}
+            status_code = 404
+        cached = query_cache.put(cache_key, json_body(result), status_code, version)
+
+    headers = {'ETag': quote_etag(cached.etag), 'Cache-Control': 'no-cache'}
+    if parse_etags(request.headers.get('If-None-Match')).contains(cached.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(cached.body, status_code=cached.status, headers=headers, media_type='application/json')
+
+
+@instrumented
+async def list_servers(request: Request) -> Response:
+    """Endpoint para listar los servidores monitoreados (mismos parámetros que en api_server.py)."""
+    try:
+        servers, next_cursor = await run_in_session(load_servers_page, request.query_params)
+    except ValueError as e:
+        return json_response({"status": "error", "message": str(e)}, 400)
+    except Exception as e:
+        logger.error(f"Error al listar servidores: {e}")
+        return json_response({"status": "error", "message": "Error al listar servidores"}, 500)
+    # La página está acotada por limit: se serializa completa
+    return Response(''.join(servers_page_chunks(servers, next_cursor)), media_type='application/json')
+
+
+@instrumented
+async def health_check(request: Request) -> Response:
+    """Endpoint de verificación del sistema"""
+    db_status = "ok"
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    except Exception as e:
+        db_status = f"error: {str(e)}"
+    return json_response(health_status(db_status), 200)
+
+
+async def prometheus_metrics(request: Request) -> Response:
+    """Métricas de la API en formato de texto de Prometheus."""
+    return Response(registry.render(), media_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@contextlib.asynccontextmanager
+async def lifespan(_app):
+    """Crea el engine asíncrono (y su pool) en el bucle de eventos del proceso y lo cierra al salir."""
+    global engine
+    engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL))
+    try:
+        yield
+    finally:
+        await engine.dispose()
+
+
+app = Starlette(
+    routes=[
+        Route('/collect', collect_data, methods=['POST']),
+        Route('/query/{ip_address}', query_data, methods=['GET']),
+        Route('/servers', list_servers, methods=['GET']),
+        Route('/health', health_check, methods=['GET']),
+        Route('/metrics', prometheus_metrics, methods=['GET']),
+    ],
+    lifespan=lifespan
+)
+
+
+if __name__ == "__main__":
+    import uvicorn
+    api_server.setup_app()
+    # uvicorn atiende SIGTERM y termina normalmente: atexit vacía la cola de ingesta
+    uvicorn.run(app, host="0.0.0.0", port=5000)
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Importación del historial de los archivos de respaldo a la base de datos
+-------------------------------------------------------------------------
+Reconstruye la base de datos (o la completa tras un cambio de esquema) a partir de los
+archivos <IP>_<YYYY-MM-DD>.jsonl y .json que escribe store_data_in_file:
+- Un pool de procesos lee y valida los archivos; el proceso principal los carga en orden
+  cronológico con store_batch_in_db, en lotes de --batch-size instantáneas por transacción
+  (en PostgreSQL las filas de procesos de cada lote se cargan con COPY; las instantáneas,
+  las secciones versionadas y el índice de procesos se escriben por instantánea, igual que
+  en la ingesta, porque cada una depende del id y del estado que deja la anterior)
+- Idempotente: se omiten las instantáneas cuyo servidor y marca de tiempo ya existen
+- Con PROCESS_STORAGE=interval los procesos de una instantánea anterior a la última del
+  servidor no se pueden guardar (los intervalos solo avanzan): esas instantáneas se omiten
+  y sus archivos quedan fuera del checkpoint, salvo con --allow-out-of-order, que las
+  importa sin procesos
+- Reanudable: los archivos completamente importados se registran en --checkpoint y no se
+  vuelven a leer mientras no cambien (tamaño y fecha de modificación); un archivo con alguna
+  instantánea que no se pudo guardar u omitida no se registra y se vuelve a leer en la próxima ejecución
+- Informa el avance en instantáneas por segundo cada --progress-seconds segundos
+- En PostgreSQL crea antes las particiones de los días a importar
+
+Uso (desde el directorio de la API, con las mismas variables de entorno):
+  python backfill.py
+  python backfill.py --data-dir /ruta/data --workers 4 --batch-size 500
+"""
+
+import os
+import json
+import time
+import logging
+import argparse
+import datetime
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, List, Iterator, Optional, Set, Tuple, Callable
+
+from dotenv import load_dotenv
+
+from backup_store import BackupStore, record_timestamp, FILE_DAY_SLACK
+from validation import validate_snapshot
+from models import db, Server, Snapshot
+
+# Cargar variables de entorno (.env) antes de leer DATABASE_URL
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Archivos leídos por adelantado por cada proceso del pool
+PREFETCH_PER_WORKER = 4
+
+
+def parse_file(file_path: str) -> Tuple[str, List[Tuple[datetime.datetime, Dict[str, Any]]], int]:
+    """
+    Lee y valida un archivo de respaldo (se ejecuta en el pool de procesos).
+
+    Args:
+        file_path: Ruta del archivo
+
+    Returns:
+        Tupla (ruta, [(marca de tiempo, instantánea)] en orden cronológico, cantidad de inválidas)
+    """
+    path = Path(file_path)
+    records, invalid = [], 0
+    try:
+        for record in BackupStore(path.parent, fsync_policy="never").iter_file(path):
+            timestamp = record_timestamp(record) if isinstance(record, dict) else None
+            # Sin marca de tiempo no se puede ubicar la instantánea ni detectar duplicados
+            if validate_snapshot(record) is not None or timestamp is None:
+                invalid += 1
+                continue
+            records.append((timestamp, record))
+    except (OSError, ValueError) as e:
+        logger.error(f"No se pudo leer {path}: {e}")
+    records.sort(key=lambda entry: entry[0])
+    return file_path, records, invalid
+
+
+def parse_in_order(files: List[Path], workers: int) -> Iterator[Tuple[str, list, int]]:
+    """
+    Resultados de parse_file en el orden de `files`, con una ventana acotada de archivos
+    leídos por adelantado para no acumular el historial en memoria.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        window = deque()
+        remaining = iter(files)
+        for file_path in remaining:
+            window.append(pool.submit(parse_file, str(file_path)))
+            if len(window) >= workers * PREFETCH_PER_WORKER:
+                break
+        while window:
+            result = window.popleft().result()
+            next_file = next(remaining, None)
+            if next_file is not None:
+                window.append(pool.submit(parse_file, str(next_file)))
+            yield result
+
+
+class Checkpoint:
+    """Archivos ya importados, con su tamaño y fecha de modificación."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.files: Dict[str, List[int]] = {}
+        if path.exists():
+            self.files = json.loads(path.read_text(encoding="utf-8")).get("files", {})
+
+    @staticmethod
+    def _signature(file_path: Path) -> List[int]:
+        stat = file_path.stat()
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def is_done(self, file_path: Path) -> bool:
+        """Indica si el archivo se importó completo y no cambió desde entonces."""
+        return self.files.get(file_path.name) == self._signature(file_path)
+
+    def mark(self, file_paths: List[str]) -> None:
+        """Registra archivos importados y guarda el checkpoint (reemplazo atómico)."""
+        for file_path in file_paths:
+            self.files[Path(file_path).name] = self._signature(Path(file_path))
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps({"files": self.files}), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+
+class Importer:
+    """Acumula instantáneas nuevas en lotes y las carga con store_batch_in_db."""
+
+    def __init__(self, store_batch: Callable[[List[Dict[str, Any]]], List[bool]], checkpoint: Checkpoint,
+                 batch_size: int, progress_seconds: float, total_files: int, skip_out_of_order: bool = False):
+        """
+        Inicializar el importador (se usa dentro del app_context de la API).
+
+        Args:
+            store_batch: api_server.store_batch_in_db
+            checkpoint: Checkpoint donde registrar los archivos importados
+            batch_size: Instantáneas por transacción
+            progress_seconds: Segundos entre reportes de avance
+            total_files: Archivos a importar (para el reporte de avance)
+            skip_out_of_order: Omitir las instantáneas anteriores a la última del servidor
+                (PROCESS_STORAGE=interval descartaría sus procesos)
+        """
+        self.store_batch = store_batch
+        self.checkpoint = checkpoint
+        self.batch_size = batch_size
+        self.progress_seconds = progress_seconds
+        self.total_files = total_files
+        self.skip_out_of_order = skip_out_of_order
+        # Última marca de tiempo guardada o en lote de cada IP (solo con skip_out_of_order)
+        self.latest: Dict[str, Optional[datetime.datetime]] = {}
+        self.batch: List[Dict[str, Any]] = []
+        # Archivo de origen de cada instantánea del lote
+        self.batch_files: List[str] = []
+        # Servidor y marca de tiempo de las instantáneas del lote, para omitir duplicados entre archivos
+        self.batch_keys: Set[Tuple[str, datetime.datetime]] = set()
+        self.parsed_files: List[str] = []
+        # Archivos con alguna instantánea que falló u omitida: no se registran en el checkpoint
+        self.incomplete_files: Set[str] = set()
+        self.counters = {"files": 0, "imported": 0, "present": 0, "invalid": 0, "failed": 0, "out_of_order": 0}
+        self.started = time.perf_counter()
+        self.last_report = self.started
+
+    def existing_timestamps(self, ip_address: str, first: datetime.datetime,
+                            last: datetime.datetime) -> Set[datetime.datetime]:
+        """Marcas de tiempo de las instantáneas de la IP ya guardadas en [first, last]."""
+        return {row.timestamp for row in db.session.query(Snapshot.timestamp).join(
+            Server, Server.id == Snapshot.server_id
+        ).filter(
+            Server.ip_address == ip_address,
+            Snapshot.timestamp.between(first, last)
+        )}
+
+    def is_out_of_order(self, ip_address: str, timestamp: datetime.datetime) -> bool:
+        """Indica si la instantánea es anterior o igual a la última de la IP, y si no, la registra como última."""
+        if ip_address not in self.latest:
+            self.latest[ip_address] = db.session.query(Server.last_seen).filter(
+                Server.ip_address == ip_address
+            ).scalar()
+        latest = self.latest[ip_address]
+        if latest is not None and timestamp <= latest:
+            return True
+        self.latest[ip_address] = timestamp
+        return False
+
+    def add_file(self, file_path: str, records: List[Tuple[datetime.datetime, Dict[str, Any]]],
+                 invalid: int) -> None:
+        """Agrega las instantáneas nuevas de un archivo leído por parse_file."""
+        self.counters["invalid"] += invalid
+        present: Dict[str, Set[datetime.datetime]] = {}
+        if records:
+            first, last = records[0][0], records[-1][0]
+            for ip_address in {record.get("ip_address", "unknown") for _, record in records}:
+                present[ip_address] = self.existing_timestamps(ip_address, first, last)
+
+        for timestamp, record in records:
+            ip_address = record.get("ip_address", "unknown")
+            if timestamp in present[ip_address] or (ip_address, timestamp) in self.batch_keys:
+                self.counters["present"] += 1
+                continue
+            if self.skip_out_of_order and self.is_out_of_order(ip_address, timestamp):
+                self.counters["out_of_order"] += 1
+                self.incomplete_files.add(file_path)
+                continue
+            self.batch.append(record)
+            self.batch_files.append(file_path)
+            self.batch_keys.add((ip_address, timestamp))
+            if len(self.batch) >= self.batch_size:
+                self.flush()
+        # El archivo queda registrado en el checkpoint cuando se confirma el lote con su última
+        # instantánea, si todas las suyas se guardaron
+        self.parsed_files.append(file_path)
+        self.counters["files"] += 1
+        if time.perf_counter() - self.last_report >= self.progress_seconds:
+            self.report()
+
+    def flush(self) -> None:
+        """Carga el lote actual en una transacción y registra los archivos importados sin errores."""
+        if self.batch:
+            results = self.store_batch(self.batch)
+            imported = sum(results)
+            self.counters["imported"] += imported
+            self.counters["failed"] += len(results) - imported
+            self.incomplete_files.update(file_path for file_path, ok in zip(self.batch_files, results) if not ok)
+            self.batch, self.batch_files, self.batch_keys = [], [], set()
+        if self.parsed_files:
+            incomplete = [file_path for file_path in self.parsed_files if file_path in self.incomplete_files]
+            for file_path in incomplete:
+                logger.warning(f"{file_path} tiene instantáneas sin importar: no se registra en el checkpoint "
+                               f"y se reintentará en la próxima ejecución")
+                self.incomplete_files.discard(file_path)
+            self.checkpoint.mark([file_path for file_path in self.parsed_files if file_path not in incomplete])
+            self.parsed_files = []
+
+    def rate(self) -> float:
+        """Instantáneas importadas por segundo desde el inicio."""
+        return self.counters["imported"] / max(time.perf_counter() - self.started, 1e-9)
+
+    def report(self) -> None:
+        """Registra el avance en el log."""
+        self.last_report = time.perf_counter()
+        counters = self.counters
+        logger.info(f"Archivos {counters['files']}/{self.total_files}: {counters['imported']} instantáneas "
+                    f"importadas ({self.rate():.0f}/s), {counters['present']} ya presentes, "
+                    f"{counters['invalid']} inválidas, {counters['failed']} con error, "
+                    f"{counters['out_of_order']} fuera de orden omitidas")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importa los archivos de respaldo a la base de datos")
+    parser.add_argument("--database-url", default=os.getenv('DATABASE_URL'), help="URL SQLAlchemy")
+    parser.add_argument("--data-dir", default="./data", help="Directorio de los archivos de respaldo")
+    parser.add_argument("--checkpoint", default="backfill_checkpoint.json",
+                        help="Archivo donde se registran los archivos ya importados")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Procesos que leen y validan los archivos")
+    parser.add_argument("--batch-size", type=int, default=500, help="Instantáneas por transacción")
+    parser.add_argument("--progress-seconds", type=float, default=5.0, help="Segundos entre reportes de avance")
+    parser.add_argument("--allow-out-of-order", action="store_true",
+                        help="Con PROCESS_STORAGE=interval, importar sin procesos las instantáneas "
+                             "anteriores a la última de su servidor (por defecto se omiten)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    # La API se importa después de fijar DATABASE_URL: su configuración se lee al importarla
+    import api_server
+    from maintenance import run_maintenance
+
+    store = BackupStore(Path(args.data_dir), fsync_policy="never")
+    checkpoint = Checkpoint(Path(args.checkpoint))
+    files = [(day, path) for day, _, path in store.all_files() if not checkpoint.is_done(path)]
+    if not files:
+        logger.info(f"No hay archivos para importar en {args.data_dir}")
+        return
+
+    api_server.setup_app(start_background=False)
+    with api_server.app.app_context():
+        # Particiones de los días importados (el nombre del archivo es el día de llegada)
+        run_maintenance(api_server.db.engine, since=files[0][0] - FILE_DAY_SLACK)
+        skip_out_of_order = api_server.PROCESS_STORAGE == 'interval' and not args.allow_out_of_order
+        importer = Importer(api_server.store_batch_in_db, checkpoint, args.batch_size, args.progress_seconds,
+                            len(files), skip_out_of_order)
+        logger.info(f"Importando {len(files)} archivos de {args.data_dir} con {args.workers} procesos")
+        for file_path, records, invalid in parse_in_order([path for _, path in files], args.workers):
+            importer.add_file(file_path, records, invalid)
+        importer.flush()
+        importer.report()
+        if importer.counters["out_of_order"]:
+            logger.warning(f"Se omitieron {importer.counters['out_of_order']} instantáneas anteriores a la última "
+                           f"de su servidor: con PROCESS_STORAGE=interval sus procesos no se pueden guardar. "
+                           f"Impórtelas con PROCESS_STORAGE=snapshot o con --allow-out-of-order (sin procesos)")
+
+
+if __name__ == "__main__":
+    main()
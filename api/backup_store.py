@@ -0,0 +1,234 @@
+"""
+Almacén de respaldo en archivos para la API de Recolección de Información de Sistemas
+--------------------------------------------------------------------------------------
+Guarda cada instantánea como una línea JSON compacta en <IP>_<YYYY-MM-DD>.jsonl:
+- Agregar un registro cuesta O(1): no se relee ni reescribe el archivo
+- Escrituras seguras con varios escritores concurrentes (O_APPEND + flock)
+- Política de fsync configurable (always, interval, never)
+- Lectura compatible con los archivos antiguos <IP>_<YYYY-MM-DD>.json (arreglos JSON)
+- Lectura en streaming acotada por fechas: se omiten los archivos fuera del rango según
+  la fecha de su nombre y los registros se leen de a uno
+"""
+
+import os
+import json
+import time
+import datetime
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Any, List, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: O_APPEND sigue garantizando escrituras al final del archivo
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+FSYNC_POLICIES = ("always", "interval", "never")
+
+# Margen al filtrar archivos por fecha: el nombre usa el día local de llegada, no el de la
+# instantánea, y el rango de la consulta está en UTC. Una instantánea que llegó más de un
+# día después de su timestamp (reenviada desde la cola del agente) queda fuera si se acota 'to'
+FILE_DAY_SLACK = datetime.timedelta(days=1)
+
+
+class BackupStore:
+    """Almacén de respaldo de solo agregado en formato JSON Lines."""
+
+    def __init__(self, data_dir: Path, fsync_policy: str = "interval", fsync_interval: float = 1.0):
+        """
+        Inicializar el almacén.
+
+        Args:
+            data_dir: Directorio donde se guardan los archivos
+            fsync_policy: 'always' (fsync tras cada registro), 'interval' (como máximo
+                un fsync por archivo cada fsync_interval segundos) o 'never' (lo decide el S.O.)
+            fsync_interval: Segundos entre fsync con la política 'interval'
+        """
+        if fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"Política de fsync inválida: {fsync_policy}")
+        self.data_dir = Path(data_dir)
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval
+        self._last_fsync: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def filename_for(self, ip_address: str, day: datetime.date = None) -> Path:
+        """
+        Ruta del archivo JSONL para una IP y un día.
+
+        Args:
+            ip_address: Dirección IP del agente
+            day: Día del registro (hoy por defecto)
+
+        Returns:
+            Ruta en formato <IP>_<YYYY-MM-DD>.jsonl
+        """
+        day = day or datetime.datetime.now().date()
+        return self.data_dir / f"{ip_address}_{day.strftime('%Y-%m-%d')}.jsonl"
+
+    def _should_fsync(self, path: Path) -> bool:
+        """Decide si corresponde un fsync según la política configurada."""
+        if self.fsync_policy == "always":
+            return True
+        if self.fsync_policy == "never":
+            return False
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_fsync.get(str(path), 0.0) < self.fsync_interval:
+                return False
+            self._last_fsync[str(path)] = now
+            return True
+
+    def append(self, data: Dict[str, Any]) -> Path:
+        """
+        Agrega un registro al final del archivo del día.
+
+        El registro se escribe con una sola llamada write() sobre un descriptor
+        abierto con O_APPEND y bajo un flock exclusivo, por lo que las líneas de
+        escritores concurrentes (hilos o procesos) nunca se intercalan.
+
+        Args:
+            data: Datos de información del sistema
+
+        Returns:
+            Ruta del archivo escrito
+        """
+        path = self.filename_for(data.get("ip_address", "unknown"))
+        line = (json.dumps(data, separators=(",", ":"), default=str) + "\n").encode("utf-8")
+
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            view = memoryview(line)
+            while view:
+                written = os.write(fd, view)
+                view = view[written:]
+            if self._should_fsync(path):
+                os.fsync(fd)
+        finally:
+            # Cerrar el descriptor libera el flock
+            os.close(fd)
+        return path
+
+    def iter_file(self, file_path: Path) -> Iterator[Dict[str, Any]]:
+        """
+        Registros de un archivo de respaldo, nuevo (.jsonl) o antiguo (.json), de a uno.
+
+        Los archivos .jsonl se leen línea por línea; los .json antiguos (un arreglo por
+        día) se cargan completos.
+
+        Args:
+            file_path: Archivo a leer
+        """
+        if file_path.suffix == ".jsonl":
+            with open(file_path, "r") as f:
+                for line_number, line in enumerate(f, 1):
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        # Una línea truncada (p. ej. tras un corte de energía) no invalida el resto
+                        logger.warning(f"Línea JSON inválida en {file_path}:{line_number}")
+        else:
+            with open(file_path, "r") as f:
+                data = json.load(f)
+            if isinstance(data, list):
+                yield from data
+            elif isinstance(data, dict):
+                yield data
+
+    def files_for(self, ip_address: str, start: Optional[datetime.datetime] = None,
+                  end: Optional[datetime.datetime] = None) -> List[Path]:
+        """
+        Archivos de una IP cuyo día (según el nombre) puede contener registros del rango.
+
+        Args:
+            ip_address: Dirección IP a buscar
+            start: Marca de tiempo mínima (UTC), sin límite si es None
+            end: Marca de tiempo máxima (UTC), sin límite si es None
+
+        Returns:
+            Archivos en orden cronológico
+        """
+        first_day = (start - FILE_DAY_SLACK).date() if start is not None else None
+        last_day = (end + FILE_DAY_SLACK).date() if end is not None else None
+        files = []
+        for file_path in list(self.data_dir.glob(f"{ip_address}_*.json")) + \
+                list(self.data_dir.glob(f"{ip_address}_*.jsonl")):
+            try:
+                day = datetime.date.fromisoformat(file_path.stem.rsplit("_", 1)[1])
+            except ValueError:
+                continue
+            if (first_day is None or day >= first_day) and (last_day is None or day <= last_day):
+                files.append(file_path)
+        return sorted(files, key=lambda p: (p.stem, p.suffix))
+
+    def all_files(self) -> List[Tuple[datetime.date, str, Path]]:
+        """
+        Todos los archivos de respaldo del directorio (de cualquier IP).
+
+        Returns:
+            Lista de (día, IP, ruta) en orden cronológico y, dentro de un día, por IP
+        """
+        files = []
+        for file_path in list(self.data_dir.glob("*_*.json")) + list(self.data_dir.glob("*_*.jsonl")):
+            ip_address, _, day = file_path.stem.rpartition("_")
+            try:
+                files.append((datetime.date.fromisoformat(day), ip_address, file_path))
+            except ValueError:
+                continue
+        return sorted(files, key=lambda entry: (entry[0], entry[1], entry[2].suffix))
+
+    def iter_records(self, ip_address: str, start: Optional[datetime.datetime] = None,
+                     end: Optional[datetime.datetime] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Registros de una IP en orden cronológico de archivo, sin cargarlos todos en memoria.
+
+        Args:
+            ip_address: Dirección IP a buscar
+            start: Solo registros con timestamp desde este instante (UTC, inclusive)
+            end: Solo registros con timestamp hasta este instante (UTC, inclusive)
+        """
+        bounded = start is not None or end is not None
+        for file_path in self.files_for(ip_address, start, end):
+            try:
+                for record in self.iter_file(file_path):
+                    if bounded:
+                        timestamp = record_timestamp(record)
+                        if timestamp is None or (start is not None and timestamp < start) or \
+                                (end is not None and timestamp > end):
+                            continue
+                    yield record
+            except json.JSONDecodeError:
+                logger.warning(f"No se pudo analizar el archivo JSON: {file_path}")
+            except Exception as e:
+                logger.error(f"Error al leer el archivo {file_path}: {e}")
+
+    def read(self, ip_address: str) -> List[Dict[str, Any]]:
+        """
+        Lee todos los registros de una IP en orden cronológico de archivo.
+
+        Args:
+            ip_address: Dirección IP a buscar
+
+        Returns:
+            Lista de registros de datos para la IP
+        """
+        return list(self.iter_records(ip_address))
+
+
+def record_timestamp(record: Dict[str, Any]) -> Optional[datetime.datetime]:
+    """Marca de tiempo de un registro en UTC sin zona, o None si falta o es inválida."""
+    try:
+        timestamp = datetime.datetime.fromisoformat(record["timestamp"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return timestamp
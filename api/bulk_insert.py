@@ -0,0 +1,110 @@
+"""
+Inserción masiva de filas para la API de Recolección de Información de Sistemas
+--------------------------------------------------------------------------------
+Escribe las filas de una instantánea (procesos, usuarios) como operaciones sobre
+conjuntos en lugar de un objeto ORM por fila:
+- PostgreSQL: COPY ... FROM STDIN para lotes grandes (psycopg2, o asyncpg con asgi_server.py)
+- Resto de los casos: INSERT multi-fila / executemany de SQLAlchemy Core
+"""
+
+import io
+import os
+import datetime
+from typing import Dict, Any, List
+
+from sqlalchemy import insert
+from sqlalchemy.util import await_only
+
+from models import db
+
+# A partir de cuántas filas conviene usar COPY en PostgreSQL
+COPY_THRESHOLD = int(os.getenv('BULK_COPY_THRESHOLD', '50'))
+
+
+def _copy_value(value: Any) -> str:
+    """
+    Convierte un valor Python al formato de texto de COPY.
+
+    Args:
+        value: Valor de una columna
+
+    Returns:
+        Representación escapada del valor (\\N para NULL)
+    """
+    if value is None:
+        return '\\N'
+    if type(value) is int or type(value) is float:
+        return str(value)
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    text = str(value)
+    return (text.replace('\\', '\\\\')
+                .replace('\t', '\\t')
+                .replace('\n', '\\n')
+                .replace('\r', '\\r'))
+
+
+def _copy_rows(table, columns: List[str], rows: List[Dict[str, Any]]) -> None:
+    """
+    Carga filas mediante COPY FROM STDIN usando la conexión de la sesión actual,
+    de modo que forman parte de la misma transacción.
+
+    Args:
+        table: Tabla SQLAlchemy destino
+        columns: Columnas a cargar
+        rows: Filas a insertar
+    """
+    buffer = io.StringIO()
+    # Los valores se repiten mucho (server_id, snapshot_id, timestamp, nombres de proceso y
+    # usuarios): cada valor distinto se convierte una sola vez. La clave incluye el tipo
+    # para no confundir 1, 1.0 y True
+    encoded: Dict[Any, str] = {}
+    for row in rows:
+        fields = []
+        for col in columns:
+            value = row.get(col)
+            key = (value.__class__, value)
+            text = encoded.get(key)
+            if text is None:
+                text = encoded[key] = _copy_value(value)
+            fields.append(text)
+        buffer.write('\t'.join(fields))
+        buffer.write('\n')
+    buffer.seek(0)
+
+    connection = db.session.connection()
+    if connection.dialect.driver == 'asyncpg':
+        # Sesión de AsyncSession.run_sync (asgi_server.py): se espera la corrutina de asyncpg
+        # desde el greenlet, sin bloquear el bucle de eventos
+        await_only(connection.connection.driver_connection.copy_to_table(
+            table.name, source=io.BytesIO(buffer.getvalue().encode('utf-8')), columns=columns))
+        return
+    dbapi_conn = connection.connection
+    cursor = dbapi_conn.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {table.name} ({', '.join(columns)}) FROM STDIN",
+            buffer
+        )
+    finally:
+        cursor.close()
+
+
+def bulk_insert(model, rows: List[Dict[str, Any]]) -> None:
+    """
+    Inserta filas de un modelo dentro de la transacción actual sin crear objetos ORM.
+
+    Args:
+        model: Clase del modelo (p. ej. Process, LoggedUser)
+        rows: Lista de diccionarios columna -> valor, todos con las mismas claves
+    """
+    if not rows:
+        return
+
+    table = model.__table__
+    if db.engine.dialect.name == 'postgresql' and len(rows) >= COPY_THRESHOLD:
+        _copy_rows(table, list(rows[0].keys()), rows)
+    else:
+        db.session.execute(insert(table), rows)
@@ -0,0 +1,204 @@
+"""
+Agregados de uso de CPU para la API de Recolección de Información de Sistemas
+------------------------------------------------------------------------------
+En cada ingesta, el cpu_percent de la instantánea se suma a los agregados de
+1 minuto, 1 hora y 1 día del servidor con dos UPSERT que cubren las tres resoluciones:
+- cpu_rollups: cantidad de muestras, suma, mínimo y máximo por intervalo
+- cpu_rollup_bins: histograma por intervalo (bins de CPU_BIN_WIDTH puntos porcentuales),
+  del que se calcula el percentil 95 al consultar, incluso al combinar intervalos
+
+Un gráfico de 30 días lee unos cientos de filas de 1 hora en lugar de las instantáneas.
+El mantenimiento elimina los intervalos más antiguos que la retención de su resolución;
+un rango que empieza antes se lee de la resolución más gruesa que todavía lo cubre.
+"""
+
+import math
+import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import db, CpuRollup, CpuRollupBin
+from maintenance import CPU_ROLLUP_RETENTION_DAYS
+
+# Resoluciones disponibles (nombre, segundos), de la más fina a la más gruesa
+RESOLUTIONS: List[Tuple[str, int]] = [("1m", 60), ("1h", 3600), ("1d", 86400)]
+
+# Ancho de cada bin del histograma (puntos porcentuales de CPU)
+CPU_BIN_WIDTH = 5.0
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def bucket_start(timestamp: datetime.datetime, seconds: int) -> datetime.datetime:
+    """Inicio del intervalo de `seconds` segundos que contiene la marca de tiempo."""
+    offset = int((timestamp - _EPOCH).total_seconds()) // seconds * seconds
+    return _EPOCH + datetime.timedelta(seconds=offset)
+
+
+def _insert(model):
+    """INSERT con soporte de ON CONFLICT para el motor en uso (PostgreSQL o SQLite)."""
+    dialect = postgresql if db.engine.dialect.name == 'postgresql' else sqlite
+    return dialect.insert(model.__table__)
+
+
+def _least_greatest():
+    """Funciones SQL de mínimo y máximo entre dos valores para el motor en uso."""
+    if db.engine.dialect.name == 'postgresql':
+        return db.func.least, db.func.greatest
+    return db.func.min, db.func.max
+
+
+def update_cpu_rollups(samples: List[Dict[str, Any]]) -> None:
+    """
+    Suma muestras de CPU a los agregados, dentro de la transacción actual.
+
+    Las muestras de un mismo servidor e intervalo se combinan antes de escribir, de
+    modo que un lote de instantáneas cuesta dos sentencias.
+
+    Args:
+        samples: Diccionarios con server_id, timestamp y cpu_percent
+    """
+    rollups: Dict[tuple, Dict[str, Any]] = {}
+    bins: Dict[tuple, int] = {}
+    for sample in samples:
+        cpu = float(sample["cpu_percent"])
+        cpu_bin = min(max(int(cpu // CPU_BIN_WIDTH), 0), int(100 // CPU_BIN_WIDTH))
+        for resolution, seconds in RESOLUTIONS:
+            key = (sample["server_id"], resolution, bucket_start(sample["timestamp"], seconds))
+            row = rollups.get(key)
+            if row is None:
+                rollups[key] = {"server_id": key[0], "resolution": resolution, "bucket": key[2],
+                                "sample_count": 1, "cpu_sum": cpu, "cpu_min": cpu, "cpu_max": cpu}
+            else:
+                row["sample_count"] += 1
+                row["cpu_sum"] += cpu
+                row["cpu_min"] = min(row["cpu_min"], cpu)
+                row["cpu_max"] = max(row["cpu_max"], cpu)
+            bins[key + (cpu_bin,)] = bins.get(key + (cpu_bin,), 0) + 1
+    if not rollups:
+        return
+
+    least, greatest = _least_greatest()
+    stmt = _insert(CpuRollup)
+    table = CpuRollup.__table__
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=["server_id", "resolution", "bucket"],
+        set_={
+            "sample_count": table.c.sample_count + stmt.excluded.sample_count,
+            "cpu_sum": table.c.cpu_sum + stmt.excluded.cpu_sum,
+            "cpu_min": least(table.c.cpu_min, stmt.excluded.cpu_min),
+            "cpu_max": greatest(table.c.cpu_max, stmt.excluded.cpu_max)
+        }
+    ), list(rollups.values()))
+
+    stmt = _insert(CpuRollupBin)
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=["server_id", "resolution", "bucket", "bin"],
+        set_={"sample_count": CpuRollupBin.__table__.c.sample_count + stmt.excluded.sample_count}
+    ), [
+        {"server_id": server_id, "resolution": resolution, "bucket": bucket, "bin": cpu_bin, "sample_count": count}
+        for (server_id, resolution, bucket, cpu_bin), count in bins.items()
+    ])
+
+
+def choose_resolution(step: int, start: Optional[datetime.datetime] = None) -> Tuple[str, int]:
+    """
+    La resolución más gruesa que no supera el paso pedido (como mínimo, la más fina).
+
+    Si el rango empieza antes de la retención de esa resolución, se pasa a la siguiente
+    más gruesa que todavía conserva ese inicio (la última si ninguna lo conserva).
+    """
+    fitting = [resolution for resolution in RESOLUTIONS if resolution[1] <= step]
+    index = RESOLUTIONS.index(fitting[-1]) if fitting else 0
+    if start is not None:
+        today = datetime.datetime.now(datetime.timezone.utc).date()
+        while index < len(RESOLUTIONS) - 1:
+            days = CPU_ROLLUP_RETENTION_DAYS.get(RESOLUTIONS[index][0], 0)
+            if days <= 0 or start.date() >= today - datetime.timedelta(days=days):
+                break
+            index += 1
+    return RESOLUTIONS[index]
+
+
+def default_step(start: datetime.datetime, end: datetime.datetime, max_points: int) -> int:
+    """Paso de la resolución más fina que entrega como máximo max_points puntos en el rango."""
+    span = (end - start).total_seconds()
+    for _, seconds in RESOLUTIONS:
+        if span / seconds <= max_points:
+            return seconds
+    return RESOLUTIONS[-1][1]
+
+
+def _percentile(histogram: Dict[int, int], total: int, fraction: float,
+                low: float, high: float) -> Optional[float]:
+    """Percentil aproximado de un histograma, interpolando dentro del bin y acotado a [low, high]."""
+    if not total:
+        return None
+    rank = fraction * total
+    seen = 0
+    for cpu_bin in sorted(histogram):
+        count = histogram[cpu_bin]
+        if seen + count >= rank:
+            value = (cpu_bin + (rank - seen) / count) * CPU_BIN_WIDTH
+            return round(min(max(value, low), high), 2)
+        seen += count
+    return high
+
+
+def cpu_series(server_id: int, start: datetime.datetime, end: datetime.datetime,
+               step: int) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Serie de uso de CPU de un servidor entre start y end, con un punto cada `step` segundos.
+
+    Args:
+        server_id: Id del servidor
+        start: Inicio del rango (inclusive)
+        end: Fin del rango (exclusivo)
+        step: Segundos entre puntos
+
+    Returns:
+        Tupla (resolución leída, puntos con timestamp, samples, min, avg, max y p95)
+    """
+    resolution, seconds = choose_resolution(step, start)
+    first = bucket_start(start, seconds)
+    rows = CpuRollup.query.filter(
+        CpuRollup.server_id == server_id,
+        CpuRollup.resolution == resolution,
+        CpuRollup.bucket >= first,
+        CpuRollup.bucket < end
+    ).all()
+    bin_rows = CpuRollupBin.query.filter(
+        CpuRollupBin.server_id == server_id,
+        CpuRollupBin.resolution == resolution,
+        CpuRollupBin.bucket >= first,
+        CpuRollupBin.bucket < end
+    ).all()
+
+    # Combinar los intervalos leídos en puntos de `step` segundos
+    points: Dict[datetime.datetime, Dict[str, Any]] = {}
+    for row in rows:
+        point = points.setdefault(bucket_start(row.bucket, step), {
+            "samples": 0, "sum": 0.0, "min": math.inf, "max": -math.inf, "histogram": {}
+        })
+        point["samples"] += row.sample_count
+        point["sum"] += row.cpu_sum
+        point["min"] = min(point["min"], row.cpu_min)
+        point["max"] = max(point["max"], row.cpu_max)
+    for row in bin_rows:
+        point = points.get(bucket_start(row.bucket, step))
+        if point is not None:
+            point["histogram"][row.bin] = point["histogram"].get(row.bin, 0) + row.sample_count
+
+    series = []
+    for timestamp in sorted(points):
+        point = points[timestamp]
+        series.append({
+            "timestamp": timestamp.isoformat(),
+            "samples": point["samples"],
+            "min": point["min"],
+            "avg": round(point["sum"] / point["samples"], 2),
+            "max": point["max"],
+            "p95": _percentile(point["histogram"], point["samples"], 0.95, point["min"], point["max"])
+        })
+    return resolution, series
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Exportación masiva de la telemetría
+-----------------------------------
+Envía las filas de processes, process_intervals, processor_info, logged_users u os_info
+de un rango de tiempo (y opcionalmente de un conjunto de servidores) como CSV o NDJSON, sin construir
+objetos ORM ni diccionarios por fila:
+- PostgreSQL: COPY (SELECT ...) TO STDOUT. Un hilo ejecuta el COPY y entrega fragmentos
+  de hasta CHUNK_BYTES a una cola acotada, de modo que la memoria usada no depende de la
+  cantidad de filas y un cliente lento frena la lectura en lugar de acumularla
+- Otras bases (SQLite): cursor en modo streaming (stream_results), de a FETCH_ROWS filas
+- Compresión gzip opcional, fragmento a fragmento
+
+El filtro de tiempo es sobre timestamp (usa la poda de particiones): en las secciones
+versionadas (os_info, processor_info, logged_users) se exportan las versiones que
+comenzaron en el rango, con su valid_to. processor_info lleva el cpu_percent de la
+instantánea que abrió cada versión (las versiones no lo guardan). process_intervals
+(PROCESS_STORAGE=interval, en el que processes no se escribe) exporta los intervalos que
+se solapan con el rango; los abiertos llevan como last_seen el del servidor.
+
+Uso como CLI (desde el directorio de la API, con las mismas variables de entorno):
+  python export.py processes --from 2026-01-01 --to 2026-01-02 -o processes.csv.gz
+  python export.py logged_users --format ndjson --ip 10.0.0.0/16
+"""
+
+import os
+import csv
+import io
+import sys
+import json
+import zlib
+import queue
+import logging
+import argparse
+import datetime
+import threading
+from typing import Any, List, Optional, Iterator, Generator
+
+from sqlalchemy import select, func, and_, or_, case
+
+from models import Server, Snapshot, Process, ProcessInterval, ProcessorInfo, LoggedUser, OSInfo
+from server_listing import ip_condition
+
+logger = logging.getLogger(__name__)
+
+# Tabla exportable -> (modelo, columnas; cada fila lleva antes la IP del servidor)
+EXPORT_TABLES = {
+    "processes": (Process, ["snapshot_id", "timestamp", "pid", "name", "username"]),
+    "process_intervals": (ProcessInterval, ["pid", "name", "username", "first_seen", "last_seen", "ended_at"]),
+    "processor_info": (ProcessorInfo, ["snapshot_id", "timestamp", "valid_to", "cpu_count", "model"]),
+    "logged_users": (LoggedUser, ["snapshot_id", "timestamp", "valid_to", "username", "terminal", "host"]),
+    "os_info": (OSInfo, ["snapshot_id", "timestamp", "valid_to", "system", "release", "version", "platform"]),
+}
+
+EXPORT_FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+# Bytes por fragmento enviado, fragmentos en espera entre el hilo del COPY y la respuesta,
+# y filas por lectura del cursor en streaming
+CHUNK_BYTES = 65536
+COPY_QUEUE_CHUNKS = 4
+FETCH_ROWS = 2000
+
+# Máximo de IPs en el parámetro servers
+MAX_EXPORT_SERVERS = 1000
+
+# Duración máxima del COPY en PostgreSQL (reemplaza a DB_STATEMENT_TIMEOUT_MS; 0 la desactiva)
+EXPORT_STATEMENT_TIMEOUT_MS = int(os.getenv('EXPORT_STATEMENT_TIMEOUT_MS', '600000'))
+
+
+class ExportError(ValueError):
+    """Parámetro inválido en la exportación."""
+
+
+class _Cancelled(Exception):
+    """El consumidor dejó de leer la exportación (cliente desconectado)."""
+
+
+def export_query(table_name: str, start: datetime.datetime, end: datetime.datetime,
+                 servers: Optional[List[str]] = None, ip_filter: Optional[str] = None,
+                 process_storage: str = "snapshot") -> Any:
+    """
+    Construye la consulta de una exportación.
+
+    Args:
+        table_name: Tabla a exportar (clave de EXPORT_TABLES)
+        start: Comienzo del rango (incluido)
+        end: Fin del rango (excluido)
+        servers: IPs de los servidores a incluir (None: todos)
+        ip_filter: Prefijo de IP o red CIDR IPv4, como en /servers
+        process_storage: Modo de almacenamiento de procesos de la API (PROCESS_STORAGE)
+
+    Returns:
+        Sentencia SELECT de SQLAlchemy
+
+    Raises:
+        ExportError: Si algún parámetro es inválido
+    """
+    if table_name not in EXPORT_TABLES:
+        raise ExportError(f"Parámetro 'table' debe ser uno de: {', '.join(EXPORT_TABLES)}")
+    if start >= end:
+        raise ExportError("El parámetro 'from' debe ser anterior a 'to'")
+    if table_name == "processes" and process_storage == "interval":
+        raise ExportError("Con PROCESS_STORAGE=interval los procesos se guardan como intervalos: "
+                          "use table=process_intervals")
+    model, columns = EXPORT_TABLES[table_name]
+    table = model.__table__
+    selected = [table.c[name] for name in columns]
+    source = table.join(Server.__table__, table.c.server_id == Server.id)
+    if model is ProcessorInfo:
+        # Uso de CPU de la instantánea que abrió la versión (las filas anteriores al versionado
+        # lo guardan en processor_info); el rango sobre snapshots permite podar sus particiones
+        snapshots = Snapshot.__table__
+        source = source.outerjoin(snapshots, and_(
+            snapshots.c.id == table.c.snapshot_id,
+            snapshots.c.timestamp == table.c.timestamp,
+            snapshots.c.timestamp >= start,
+            snapshots.c.timestamp < end
+        ))
+        selected.append(func.coalesce(snapshots.c.cpu_percent, table.c.cpu_percent).label("cpu_percent"))
+    if model is ProcessInterval:
+        # Mientras el intervalo está abierto su last_seen vale first_seen: se informa la
+        # última instantánea del servidor, como en /processes
+        selected[columns.index("last_seen")] = case(
+            (table.c.ended_at.is_(None), Server.last_seen), else_=table.c.last_seen
+        ).label("last_seen")
+        time_filter = [table.c.first_seen < end, or_(table.c.ended_at.is_(None), table.c.ended_at > start)]
+    else:
+        time_filter = [table.c.timestamp >= start, table.c.timestamp < end]
+    query = select(Server.ip_address, *selected).select_from(source).where(*time_filter)
+    if servers:
+        if len(servers) > MAX_EXPORT_SERVERS:
+            raise ExportError(f"Parámetro 'servers' admite hasta {MAX_EXPORT_SERVERS} IPs")
+        query = query.where(Server.ip_address.in_(servers))
+    if ip_filter:
+        try:
+            condition = ip_condition(ip_filter)
+        except ValueError as e:
+            raise ExportError(str(e))
+        if condition is not None:
+            query = query.where(condition)
+    # Sin ORDER BY: las filas salen en el orden de las particiones, sin ordenar el rango completo
+    return query
+
+
+def _copy_sql(cursor, dialect, query: Any, output_format: str) -> str:
+    """Sentencia COPY ... TO STDOUT con los parámetros de la consulta ya incorporados."""
+    compiled = query.compile(dialect=dialect, compile_kwargs={"render_postcompile": True})
+    select_sql = cursor.mogrify(str(compiled), compiled.params).decode("utf-8")
+    if output_format == "csv":
+        return f"COPY ({select_sql}) TO STDOUT WITH (FORMAT csv, HEADER)"
+    return f"COPY (SELECT row_to_json(e) FROM ({select_sql}) e) TO STDOUT"
+
+
+def _copy_chunks(engine, query: Any, output_format: str) -> Iterator[bytes]:
+    """
+    Fragmentos de la salida de un COPY TO STDOUT de la consulta.
+
+    El COPY se ejecuta en un hilo con una conexión propia del pool; la cola acotada limita
+    la memoria a COPY_QUEUE_CHUNKS fragmentos. Si el consumidor deja de leer, el hilo
+    aborta el COPY y descarta la conexión.
+    """
+    chunks: "queue.Queue" = queue.Queue(maxsize=COPY_QUEUE_CHUNKS)
+    cancelled = threading.Event()
+    done = object()
+
+    def put(item) -> None:
+        while True:
+            if cancelled.is_set():
+                raise _Cancelled()
+            try:
+                chunks.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    class Writer:
+        """Destino de copy_expert: psycopg2 llama a write una vez por fila."""
+
+        def __init__(self):
+            self.parts: List[bytes] = []
+            self.size = 0
+
+        def write(self, data) -> None:
+            if isinstance(data, str):
+                data = data.encode("utf-8")
+            if output_format == "ndjson":
+                # El formato de texto de COPY duplica las barras invertidas; el JSON no
+                # tiene otros caracteres que COPY escape (los de control ya vienen escapados)
+                data = data.replace(b"\\\\", b"\\")
+            self.parts.append(data)
+            self.size += len(data)
+            if self.size >= CHUNK_BYTES:
+                self.flush()
+
+        def flush(self) -> None:
+            if self.parts:
+                put(b"".join(self.parts))
+                self.parts, self.size = [], 0
+
+    def produce() -> None:
+        try:
+            raw = engine.raw_connection()
+        except Exception as e:
+            chunks.put(e)
+            return
+        ok = False
+        try:
+            cursor = raw.cursor()
+            cursor.execute(f"SET LOCAL statement_timeout = {EXPORT_STATEMENT_TIMEOUT_MS}")
+            writer = Writer()
+            cursor.copy_expert(_copy_sql(cursor, engine.dialect, query, output_format), writer)
+            writer.flush()
+            cursor.close()
+            raw.rollback()
+            ok = True
+            put(done)
+        except _Cancelled:
+            pass
+        except Exception as e:
+            if not cancelled.is_set():
+                try:
+                    put(e)
+                except _Cancelled:
+                    pass
+        finally:
+            if not ok:
+                # Un COPY interrumpido deja la conexión en un estado inutilizable
+                raw.invalidate()
+            raw.close()
+
+    thread = threading.Thread(target=produce, name="export-copy", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = chunks.get()
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        cancelled.set()
+
+
+def _cursor_chunks(engine, query: Any, output_format: str) -> Iterator[bytes]:
+    """Fragmentos CSV/NDJSON leídos con un cursor en modo streaming (bases sin COPY)."""
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=FETCH_ROWS).execute(query)
+        header = list(result.keys())
+        buffer = io.StringIO()
+        if output_format == "csv":
+            writer = csv.writer(buffer, lineterminator="\n")
+            writer.writerow(header)
+        for rows in result.partitions():
+            if output_format == "csv":
+                writer.writerows(rows)
+            else:
+                for row in rows:
+                    buffer.write(json.dumps(dict(zip(header, row)), default=_json_value, separators=(",", ":")))
+                    buffer.write("\n")
+            if buffer.tell() >= CHUNK_BYTES:
+                yield buffer.getvalue().encode("utf-8")
+                buffer.seek(0)
+                buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode("utf-8")
+
+
+def _json_value(value: Any) -> Any:
+    """Valores que json no serializa (marcas de tiempo en ISO 8601, como row_to_json)."""
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return str(value)
+
+
+def gzip_chunks(chunks: Generator[bytes, None, None], level: int = 6) -> Iterator[bytes]:
+    """Comprime una secuencia de fragmentos como un único flujo gzip."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    try:
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+    finally:
+        # Al cerrar la respuesta antes de tiempo, detiene también la lectura de la base de datos
+        chunks.close()
+
+
+def export_chunks(engine, table_name: str, output_format: str, start: datetime.datetime,
+                  end: datetime.datetime, servers: Optional[List[str]] = None,
+                  ip_filter: Optional[str] = None, compress: bool = False,
+                  process_storage: str = "snapshot") -> Iterator[bytes]:
+    """
+    Fragmentos de una exportación.
+
+    La consulta comienza al pedir el primer fragmento; los errores de la base de datos
+    posteriores interrumpen la secuencia.
+
+    Args:
+        engine: Engine de SQLAlchemy (el hilo del COPY no usa la sesión de la solicitud)
+        table_name: Tabla a exportar (clave de EXPORT_TABLES)
+        output_format: 'csv' (con encabezado) o 'ndjson'
+        start: Comienzo del rango (incluido)
+        end: Fin del rango (excluido)
+        servers: IPs de los servidores a incluir (None: todos)
+        ip_filter: Prefijo de IP o red CIDR IPv4
+        compress: Comprimir con gzip
+        process_storage: Modo de almacenamiento de procesos de la API (PROCESS_STORAGE)
+
+    Raises:
+        ExportError: Si algún parámetro es inválido
+    """
+    if output_format not in EXPORT_FORMATS:
+        raise ExportError(f"Parámetro 'format' debe ser uno de: {', '.join(EXPORT_FORMATS)}")
+    query = export_query(table_name, start, end, servers, ip_filter, process_storage)
+    if engine.dialect.name == "postgresql":
+        chunks = _copy_chunks(engine, query, output_format)
+    else:
+        chunks = _cursor_chunks(engine, query, output_format)
+    return gzip_chunks(chunks) if compress else chunks
+
+
+def parse_datetime(value: str) -> datetime.datetime:
+    """Marca de tiempo ISO 8601 normalizada a UTC sin zona (para la CLI)."""
+    parsed = datetime.datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta la telemetría como CSV o NDJSON")
+    parser.add_argument("table", choices=list(EXPORT_TABLES), help="Tabla a exportar")
+    parser.add_argument("--database-url", default=os.getenv('DATABASE_URL'), help="URL SQLAlchemy")
+    parser.add_argument("--from", dest="start", type=parse_datetime,
+                        help="Comienzo del rango, ISO 8601 (por defecto, 24 horas antes de --to)")
+    parser.add_argument("--to", dest="end", type=parse_datetime, help="Fin del rango, ISO 8601 (por defecto, ahora)")
+    parser.add_argument("--servers", default="", help="IPs separadas por comas")
+    parser.add_argument("--ip", default=None, help="Prefijo de IP o red CIDR IPv4")
+    parser.add_argument("--format", choices=list(EXPORT_FORMATS), default="csv", help="Formato de salida")
+    parser.add_argument("-o", "--output", default="-", help="Archivo de salida (.gz lo comprime; - es stdout)")
+    parser.add_argument("--gzip", action="store_true", help="Comprimir con gzip")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    # La API se importa después de fijar DATABASE_URL: su configuración se lee al importarla
+    import api_server
+
+    end = args.end or datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    start = args.start or end - datetime.timedelta(days=1)
+    servers = [ip.strip() for ip in args.servers.split(",") if ip.strip()] or None
+    compress = args.gzip or args.output.endswith(".gz")
+    output = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+    written = 0
+    try:
+        with api_server.app.app_context():
+            for chunk in export_chunks(api_server.db.engine, args.table, args.format, start, end,
+                                       servers, args.ip, compress, api_server.PROCESS_STORAGE):
+                output.write(chunk)
+                written += len(chunk)
+    except ExportError as e:
+        parser.error(str(e))
+    finally:
+        if output is not sys.stdout.buffer:
+            output.close()
+    logger.info(f"{args.table} {start.isoformat()} - {end.isoformat()}: {written} bytes escritos")
+
+
+if __name__ == "__main__":
+    main()
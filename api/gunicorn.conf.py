@@ -0,0 +1,71 @@
+"""
+Configuración de gunicorn para la API de Recolección de Información de Sistemas
+-------------------------------------------------------------------------------
+Modo de producción: varios procesos (WEB_WORKERS) con varios hilos cada uno (WEB_THREADS),
+o con WEB_SERVER=asgi, workers de uvicorn con un bucle de eventos cada uno (asgi_server.py).
+
+Uso:
+  gunicorn -c gunicorn.conf.py
+  WEB_SERVER=asgi gunicorn -c gunicorn.conf.py
+
+- La aplicación se carga una vez en el proceso principal (preload_app), que crea las
+  tablas y particiones antes de crear los workers
+- Cada worker descarta las conexiones heredadas tras el fork e inicia sus propios hilos
+  (cola de ingesta asíncrona y mantenimiento periódico)
+- Los workers comparten sus métricas en METRICS_DIR (un directorio temporal si no se
+  define), para que /metrics devuelva los totales sin importar qué worker responda
+- La caché de /query se valida con servers.data_version, común a todos los workers; el
+  control de admisión es de cada worker (la cuota por agente efectiva llega a WEB_WORKERS
+  veces RATE_LIMIT_PER_MINUTE)
+"""
+
+import os
+import tempfile
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# 'wsgi' (api_server.py, un hilo por solicitud) o 'asgi' (asgi_server.py, asyncpg; WEB_THREADS no aplica)
+if os.getenv("WEB_SERVER", "wsgi") == "asgi":
+    wsgi_app = "asgi_server:app"
+    worker_class = "uvicorn.workers.UvicornWorker"
+else:
+    wsgi_app = "api_server:app"
+    worker_class = "gthread"
+bind = os.getenv("WEB_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("WEB_WORKERS", str(min(2 * (os.cpu_count() or 1) + 1, 8))))
+threads = int(os.getenv("WEB_THREADS", "4"))
+preload_app = True
+# Segundos sin respuesta antes de reiniciar un worker, y de espera al detenerse
+# (la cola de ingesta se vacía en ese plazo)
+timeout = int(os.getenv("WEB_TIMEOUT", "60"))
+graceful_timeout = int(os.getenv("WEB_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("WEB_KEEPALIVE", "5"))
+# Reiniciar cada worker tras N solicitudes (0 lo desactiva) acota el crecimiento de memoria
+max_requests = int(os.getenv("WEB_MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+accesslog = os.getenv("WEB_ACCESS_LOG") or None
+
+if not os.getenv("METRICS_DIR"):
+    os.environ["METRICS_DIR"] = tempfile.mkdtemp(prefix="sysinfo-metrics-")
+
+
+def on_starting(server):
+    """Las métricas empiezan de cero en cada arranque (Prometheus detecta el reinicio)."""
+    for path in Path(os.environ["METRICS_DIR"]).glob("metrics_*.json"):
+        path.unlink()
+
+
+def when_ready(server):
+    """Prepara la base de datos una sola vez, antes de crear los workers."""
+    import api_server
+    api_server.setup_app(start_background=False)
+
+
+def post_fork(server, worker):
+    """Cada worker abre sus propias conexiones e inicia sus hilos en segundo plano."""
+    import api_server
+    api_server.reset_after_fork()
+    api_server.start_background_tasks()
@@ -0,0 +1,177 @@
+"""
+Cola de ingesta asíncrona (write-behind) para la API de Recolección de Información de Sistemas
+-----------------------------------------------------------------------------------------------
+/collect valida y encola la instantánea; hilos en segundo plano vacían la cola en
+micro-lotes (N instantáneas o T milisegundos) y los escriben en una sola transacción.
+- Cola acotada: si está llena, submit() lanza QueueFullError (la API responde 503)
+- Vaciado ordenado al apagar con stop()
+- Contadores de profundidad, latencia en cola y duración de escritura con stats()
+"""
+
+import time
+import queue
+import logging
+import threading
+from typing import Dict, Any, List, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """La cola de ingesta alcanzó su capacidad máxima."""
+
+
+class IngestQueue:
+    """Cola acotada con trabajadores que escriben instantáneas en micro-lotes."""
+
+    def __init__(self, write_batch: Callable[[List[Dict[str, Any]]], List[bool]],
+                 maxsize: int = 1000, batch_size: int = 50,
+                 flush_interval: float = 0.2, workers: int = 1):
+        """
+        Inicializar la cola.
+
+        Args:
+            write_batch: Función que persiste un lote y devuelve un resultado por elemento
+            maxsize: Capacidad máxima de la cola (instantáneas)
+            batch_size: Tamaño máximo de cada micro-lote
+            flush_interval: Segundos máximos de espera para completar un lote
+            workers: Número de hilos trabajadores
+        """
+        self.write_batch = write_batch
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.workers = workers
+        self._queue: "queue.Queue" = queue.Queue(maxsize=maxsize)
+        self._threads: List[threading.Thread] = []
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._counters = {
+            "enqueued": 0,
+            "rejected": 0,
+            "written": 0,
+            "failed": 0,
+            "batches": 0,
+            "queue_latency_ms_sum": 0.0,
+            "queue_latency_ms_max": 0.0,
+            "write_ms_sum": 0.0,
+            "write_ms_max": 0.0,
+        }
+
+    def start(self) -> None:
+        """Inicia los hilos trabajadores."""
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"ingest-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Cola de ingesta iniciada ({self.workers} trabajadores, capacidad {self._queue.maxsize})")
+
+    def submit(self, data: Dict[str, Any]) -> None:
+        """
+        Encola una instantánea sin bloquear.
+
+        Args:
+            data: Datos de información del sistema ya validados
+
+        Raises:
+            QueueFullError: Si la cola está llena o se está apagando
+        """
+        if self._stopping.is_set():
+            raise QueueFullError("La cola de ingesta se está apagando")
+        try:
+            self._queue.put_nowait((time.monotonic(), data))
+        except queue.Full:
+            with self._lock:
+                self._counters["rejected"] += 1
+            raise QueueFullError("La cola de ingesta está llena")
+        with self._lock:
+            self._counters["enqueued"] += 1
+
+    def _next_batch(self) -> List[tuple]:
+        """Espera el primer elemento y completa el lote hasta batch_size o flush_interval."""
+        try:
+            batch = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        """Bucle de un trabajador: vacía la cola hasta que se pide parar y está vacía."""
+        while not (self._stopping.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch: List[tuple]) -> None:
+        """Escribe un lote y actualiza los contadores."""
+        started = time.monotonic()
+        try:
+            results = self.write_batch([data for _, data in batch])
+        except Exception as e:
+            logger.error(f"Error al escribir lote de ingesta: {e}")
+            results = [False] * len(batch)
+        finished = time.monotonic()
+
+        write_ms = (finished - started) * 1000
+        latencies = [(started - enqueued_at) * 1000 for enqueued_at, _ in batch]
+        with self._lock:
+            c = self._counters
+            c["batches"] += 1
+            c["written"] += sum(1 for ok in results if ok)
+            c["failed"] += sum(1 for ok in results if not ok)
+            c["queue_latency_ms_sum"] += sum(latencies)
+            c["queue_latency_ms_max"] = max(c["queue_latency_ms_max"], max(latencies))
+            c["write_ms_sum"] += write_ms
+            c["write_ms_max"] = max(c["write_ms_max"], write_ms)
+        for _ in batch:
+            self._queue.task_done()
+
+    def stop(self, timeout: Optional[float] = 30.0) -> None:
+        """
+        Deja de aceptar instantáneas y espera a que los trabajadores vacíen la cola.
+
+        Args:
+            timeout: Segundos máximos de espera por trabajador
+        """
+        if self._stopping.is_set():
+            return
+        self._stopping.set()
+        logger.info(f"Vaciando cola de ingesta ({self._queue.qsize()} pendientes)")
+        for thread in self._threads:
+            thread.join(timeout)
+        pending = self._queue.qsize()
+        if pending:
+            logger.error(f"Cola de ingesta apagada con {pending} instantáneas sin escribir")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Contadores de la cola.
+
+        Returns:
+            Diccionario con profundidad, totales y latencias (ms)
+        """
+        with self._lock:
+            c = dict(self._counters)
+        processed = c["written"] + c["failed"]
+        return {
+            "depth": self._queue.qsize(),
+            "capacity": self._queue.maxsize,
+            "enqueued": c["enqueued"],
+            "rejected": c["rejected"],
+            "written": c["written"],
+            "failed": c["failed"],
+            "batches": c["batches"],
+            "avg_batch_size": round(processed / c["batches"], 2) if c["batches"] else 0.0,
+            "avg_queue_latency_ms": round(c["queue_latency_ms_sum"] / processed, 2) if processed else 0.0,
+            "max_queue_latency_ms": round(c["queue_latency_ms_max"], 2),
+            "avg_write_ms": round(c["write_ms_sum"] / c["batches"], 2) if c["batches"] else 0.0,
+            "max_write_ms": round(c["write_ms_max"], 2),
+        }
@@ -0,0 +1,522 @@
+#!/usr/bin/env python3
+"""
+Mantenimiento de las tablas particionadas de la API de Recolección de Información de Sistemas
+---------------------------------------------------------------------------------------------
+- Crea por adelantado las particiones diarias o semanales de las tablas de telemetría
+- Retención: resume las instantáneas antiguas por hora en snapshot_summaries y luego
+  elimina sus particiones completas (DROP TABLE en lugar de DELETE); antes copia al final
+  del rango las versiones de os_info, processor_info y logged_users que siguen vigentes
+- Agregados de CPU: elimina los intervalos de cpu_rollups y cpu_rollup_bins más antiguos
+  que la retención de su resolución (CPU_ROLLUP_RETENTION_1M_DAYS, _1H_DAYS, _1D_DAYS)
+- Índice de procesos: quita de process_index los servidores que no reportan hace más de
+  PROCESS_INDEX_STALE_DAYS días, para que /search/processes no los muestre como activos
+- Solo actúa sobre PostgreSQL con las tablas creadas desde schema.sql (particionadas).
+  Con RETENTION_DAYS > 0 y tablas sin particionar (creadas por db.create_all o por un
+  schema.sql anterior) falla en lugar de no eliminar nada; --migrate las convierte
+
+Se ejecuta al iniciar la API y luego cada MAINTENANCE_INTERVAL segundos; también
+puede ejecutarse a mano o desde cron:
+  python maintenance.py
+  python maintenance.py --migrate   # una vez, con la API detenida
+"""
+
+import os
+import re
+import time
+import logging
+import argparse
+import datetime
+import threading
+from datetime import timezone
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, text
+
+# Cargar variables de entorno (.env) también al ejecutarse desde cron
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Tablas particionadas por rango de timestamp (snapshots primero: es la que se resume)
+PARTITIONED_TABLES = ["snapshots", "os_info", "processor_info", "processes", "logged_users"]
+
+# Tablas con versiones (static_sections.py): columnas copiadas al conservar la versión vigente
+VERSIONED_TABLES = {
+    "os_info": "system, release, version, platform",
+    "processor_info": "cpu_count, model",
+    "logged_users": "username, terminal, host",
+}
+
+# Tamaño de cada partición: 'day' o 'week'
+PARTITION_INTERVAL = os.getenv('PARTITION_INTERVAL', 'day')
+# Particiones a crear por delante de la actual
+PARTITION_PREMAKE = int(os.getenv('PARTITION_PREMAKE', '7'))
+# Días de datos completos a conservar (0 conserva todo)
+RETENTION_DAYS = int(os.getenv('RETENTION_DAYS', '0'))
+# Días a conservar de cada resolución de cpu_rollups (0 conserva todo)
+CPU_ROLLUP_RETENTION_DAYS = {
+    "1m": int(os.getenv('CPU_ROLLUP_RETENTION_1M_DAYS', '7')),
+    "1h": int(os.getenv('CPU_ROLLUP_RETENTION_1H_DAYS', '90')),
+    "1d": int(os.getenv('CPU_ROLLUP_RETENTION_1D_DAYS', '0')),
+}
+# Días sin reportar tras los cuales un servidor sale de process_index (0 lo conserva)
+PROCESS_INDEX_STALE_DAYS = int(os.getenv('PROCESS_INDEX_STALE_DAYS', '7'))
+
+# Clave del advisory lock: un solo proceso de la API hace el mantenimiento a la vez
+MAINTENANCE_LOCK_ID = 48213
+
+# Esquema con las tablas particionadas (lo aplica --migrate)
+SCHEMA_PATH = Path(__file__).parent / "schema.sql"
+
+_BOUND_PATTERN = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+def partition_start(day: datetime.date) -> datetime.date:
+    """Inicio de la partición que contiene el día (los lunes si es semanal)."""
+    if PARTITION_INTERVAL == 'week':
+        return day - datetime.timedelta(days=day.weekday())
+    return day
+
+
+def partition_step() -> datetime.timedelta:
+    """Duración de una partición."""
+    return datetime.timedelta(days=7 if PARTITION_INTERVAL == 'week' else 1)
+
+
+def is_partitioned(conn, table: str) -> bool:
+    """Indica si la tabla existe y está particionada."""
+    return bool(conn.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table pt "
+        "JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = :table)"
+    ), {"table": table}).scalar())
+
+
+def unpartitioned_tables(conn) -> List[str]:
+    """Tablas de telemetría que existen pero no están particionadas."""
+    return [table for table in PARTITIONED_TABLES
+            if conn.execute(text("SELECT to_regclass(:table)"), {"table": table}).scalar() is not None
+            and not is_partitioned(conn, table)]
+
+
+def list_partitions(conn, table: str) -> List[Tuple[str, datetime.datetime, datetime.datetime]]:
+    """
+    Particiones de rango de una tabla (sin la partición DEFAULT).
+
+    Returns:
+        Lista de (nombre, inicio, fin) ordenada por inicio
+    """
+    rows = conn.execute(text(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = CAST(:table AS regclass)"
+    ), {"table": table}).all()
+    partitions = []
+    for name, bound in rows:
+        match = _BOUND_PATTERN.search(bound)
+        if match:
+            partitions.append((name, datetime.datetime.fromisoformat(match.group(1)),
+                               datetime.datetime.fromisoformat(match.group(2))))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def create_partition(conn, table: str, start: datetime.date, end: datetime.date) -> str:
+    """
+    Crea la partición [start, end) de una tabla.
+
+    Si la partición DEFAULT ya tiene filas en ese rango (agentes con el reloj
+    adelantado), se mueven a la nueva partición antes de adjuntarla.
+
+    Returns:
+        Nombre de la partición creada
+    """
+    name = f"{table}_p{start:%Y%m%d}"
+    bounds = f"FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    params = {"start": start, "end": end}
+    in_default = conn.execute(text(
+        f"SELECT EXISTS (SELECT 1 FROM {table}_default WHERE timestamp >= :start AND timestamp < :end)"
+    ), params).scalar()
+    if not in_default:
+        conn.execute(text(f"CREATE TABLE {name} PARTITION OF {table} FOR VALUES {bounds}"))
+        return name
+    conn.execute(text(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    conn.execute(text(
+        f"WITH moved AS (DELETE FROM {table}_default WHERE timestamp >= :start AND timestamp < :end RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved"
+    ), params)
+    conn.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES {bounds}"))
+    return name
+
+
+def ensure_partitions(conn, today: Optional[datetime.date] = None,
+                      since: Optional[datetime.date] = None) -> int:
+    """
+    Crea las particiones de la actual y las PARTITION_PREMAKE siguientes.
+
+    Args:
+        conn: Conexión
+        today: Fecha de referencia (por defecto, hoy en UTC)
+        since: Crear también las particiones anteriores desde este día (p. ej. antes de
+            importar historial con backfill.py); por defecto, desde la actual
+
+    Returns:
+        Cantidad de particiones creadas
+    """
+    today = today or datetime.datetime.now(timezone.utc).date()
+    step = partition_step()
+    first = partition_start(min(since, today) if since else today)
+    last = partition_start(today) + PARTITION_PREMAKE * step
+    created = 0
+    for table in PARTITIONED_TABLES:
+        if not is_partitioned(conn, table):
+            logger.info(f"La tabla {table} no está particionada; se omite el mantenimiento")
+            continue
+        existing = {start.date() for _, start, _ in list_partitions(conn, table)}
+        start = first
+        while start <= last:
+            if start not in existing:
+                logger.info(f"Creando partición {create_partition(conn, table, start, start + step)}")
+                conn.commit()
+                created += 1
+            start += step
+    return created
+
+
+def _weighted(column: str) -> str:
+    """Promedio ponderado por snapshot_count al combinar un resumen existente con uno nuevo."""
+    return (f"CASE WHEN summary.{column} IS NULL THEN EXCLUDED.{column} "
+            f"WHEN EXCLUDED.{column} IS NULL THEN summary.{column} "
+            f"ELSE (summary.{column} * summary.snapshot_count + EXCLUDED.{column} * EXCLUDED.snapshot_count) "
+            f"/ (summary.snapshot_count + EXCLUDED.snapshot_count) END")
+
+
+def downsample(conn, end: datetime.datetime, start: Optional[datetime.datetime] = None,
+               suffix: str = "") -> int:
+    """
+    Resume por servidor y hora las instantáneas del rango [start, end).
+
+    Si una hora ya tiene resumen (instantáneas que llegaron tarde) se combinan.
+
+    Args:
+        conn: Conexión; el llamador hace el commit
+        end: Fin del rango (exclusivo)
+        start: Inicio del rango (None: desde el principio)
+        suffix: Sufijo de tabla ('_default' para resumir solo la partición DEFAULT)
+
+    Returns:
+        Cantidad de horas resumidas
+    """
+    snapshot_filter = "AND s.timestamp >= :start" if start else ""
+    processor_filter = "AND p.timestamp >= :start" if start else ""
+    result = conn.execute(text(f"""
+        INSERT INTO snapshot_summaries AS summary (
+            server_id, bucket, snapshot_count, avg_process_count, max_process_count,
+            avg_user_count, max_user_count, avg_cpu_percent, max_cpu_percent
+        )
+        SELECT s.server_id, date_trunc('hour', s.timestamp), count(*),
+               avg(s.process_count), max(s.process_count),
+               avg(s.user_count), max(s.user_count),
+               avg(coalesce(s.cpu_percent, p.cpu_percent)), max(coalesce(s.cpu_percent, p.cpu_percent))
+        FROM snapshots{suffix} s
+        -- Instantáneas anteriores a snapshots.cpu_percent: el uso estaba en processor_info
+        LEFT JOIN processor_info{suffix} p
+            ON p.snapshot_id = s.id AND p.timestamp = s.timestamp AND p.timestamp < :end {processor_filter}
+        WHERE s.timestamp < :end {snapshot_filter}
+        GROUP BY s.server_id, date_trunc('hour', s.timestamp)
+        ON CONFLICT (server_id, bucket) DO UPDATE SET
+            avg_process_count = {_weighted('avg_process_count')},
+            max_process_count = GREATEST(summary.max_process_count, EXCLUDED.max_process_count),
+            avg_user_count = {_weighted('avg_user_count')},
+            max_user_count = GREATEST(summary.max_user_count, EXCLUDED.max_user_count),
+            avg_cpu_percent = {_weighted('avg_cpu_percent')},
+            max_cpu_percent = GREATEST(summary.max_cpu_percent, EXCLUDED.max_cpu_percent),
+            snapshot_count = summary.snapshot_count + EXCLUDED.snapshot_count
+    """), {"start": start, "end": end})
+    return result.rowcount
+
+
+def carry_forward_versions(conn, end: datetime.datetime, start: Optional[datetime.datetime] = None,
+                           suffix: str = "") -> int:
+    """
+    Copia con timestamp = end las versiones del rango [start, end) que siguen vigentes en end.
+
+    Al eliminar el rango, el contenido de una sección estática que no cambió desde
+    entonces seguiría siendo consultable solo a través de esa copia. Por servidor y tabla
+    se copia la última versión del rango (todas sus filas en logged_users) si no se cerró
+    antes de end.
+
+    Args:
+        conn: Conexión; el llamador hace el commit
+        end: Fin del rango (exclusivo)
+        start: Inicio del rango (None: desde el principio)
+        suffix: Sufijo de tabla ('_default' para leer solo la partición DEFAULT)
+
+    Returns:
+        Cantidad de filas copiadas
+    """
+    range_filter = "AND timestamp >= :start" if start else ""
+    copied = 0
+    for table, columns in VERSIONED_TABLES.items():
+        if not is_partitioned(conn, table):
+            continue
+        source_columns = ", ".join(f"v.{column.strip()}" for column in columns.split(","))
+        result = conn.execute(text(f"""
+            INSERT INTO {table} (server_id, snapshot_id, timestamp, valid_to, {columns})
+            SELECT v.server_id, v.snapshot_id, :end, v.valid_to, {source_columns}
+            FROM {table}{suffix} v
+            JOIN (
+                SELECT server_id, max(timestamp) AS timestamp FROM {table}{suffix}
+                WHERE timestamp < :end {range_filter}
+                GROUP BY server_id
+            ) latest ON latest.server_id = v.server_id AND latest.timestamp = v.timestamp
+            WHERE (v.valid_to IS NULL OR v.valid_to > :end)
+              AND NOT EXISTS (SELECT 1 FROM {table} n WHERE n.server_id = v.server_id AND n.timestamp = :end)
+        """), {"start": start, "end": end})
+        copied += result.rowcount
+    return copied
+
+
+def apply_retention(conn, today: Optional[datetime.date] = None) -> int:
+    """
+    Elimina las particiones anteriores a RETENTION_DAYS, resumiéndolas antes.
+
+    Cada rango se resume, conserva sus versiones vigentes y se elimina en la misma
+    transacción, de modo que una interrupción no deja instantáneas resumidas dos veces
+    ni sin resumir.
+
+    Returns:
+        Cantidad de particiones eliminadas
+    """
+    if RETENTION_DAYS <= 0 or not is_partitioned(conn, "snapshots"):
+        return 0
+    today = today or datetime.datetime.now(timezone.utc).date()
+    cutoff = datetime.datetime.combine(partition_start(today - datetime.timedelta(days=RETENTION_DAYS)),
+                                       datetime.time())
+    partitions = {table: list_partitions(conn, table) for table in PARTITIONED_TABLES
+                  if is_partitioned(conn, table)}
+    expired = sorted({(start, end) for table_partitions in partitions.values()
+                      for _, start, end in table_partitions if end <= cutoff})
+    dropped = 0
+    for start, end in expired:
+        hours = downsample(conn, end, start)
+        carry_forward_versions(conn, end, start)
+        for table, table_partitions in partitions.items():
+            for name, partition_from, partition_to in table_partitions:
+                if (partition_from, partition_to) == (start, end):
+                    conn.execute(text(f"DROP TABLE {name}"))
+                    dropped += 1
+        conn.commit()
+        logger.info(f"Retención: {start:%Y-%m-%d} a {end:%Y-%m-%d} resumido en {hours} horas y eliminado")
+
+    # Filas antiguas en la partición DEFAULT (llegaron con marcas de tiempo atrasadas)
+    downsample(conn, cutoff, suffix="_default")
+    carry_forward_versions(conn, cutoff, suffix="_default")
+    for table in partitions:
+        conn.execute(text(f"DELETE FROM {table}_default WHERE timestamp < :cutoff"), {"cutoff": cutoff})
+    conn.commit()
+    return dropped
+
+
+def prune_cpu_rollups(conn, today: Optional[datetime.date] = None) -> int:
+    """
+    Elimina los agregados de CPU más antiguos que la retención de su resolución.
+
+    Args:
+        conn: Conexión de SQLAlchemy
+        today: Fecha de referencia (por defecto, hoy en UTC)
+
+    Returns:
+        Cantidad de intervalos de cpu_rollups eliminados
+    """
+    today = today or datetime.datetime.now(timezone.utc).date()
+    deleted = 0
+    for resolution, days in CPU_ROLLUP_RETENTION_DAYS.items():
+        if days <= 0:
+            continue
+        params = {"resolution": resolution, "cutoff": today - datetime.timedelta(days=days)}
+        conn.execute(text("DELETE FROM cpu_rollup_bins WHERE resolution = :resolution AND bucket < :cutoff"),
+                     params)
+        deleted += conn.execute(text("DELETE FROM cpu_rollups WHERE resolution = :resolution AND bucket < :cutoff"),
+                                params).rowcount
+        conn.commit()
+    return deleted
+
+
+def prune_process_index(conn, today: Optional[datetime.date] = None) -> int:
+    """
+    Elimina de process_index las entradas de los servidores que dejaron de reportar.
+
+    Si el servidor vuelve a reportar, su próxima ingesta lo agrega de nuevo al índice.
+
+    Args:
+        conn: Conexión de SQLAlchemy
+        today: Fecha de referencia (por defecto, hoy en UTC)
+
+    Returns:
+        Cantidad de entradas eliminadas
+    """
+    if PROCESS_INDEX_STALE_DAYS <= 0:
+        return 0
+    today = today or datetime.datetime.now(timezone.utc).date()
+    deleted = conn.execute(text("""
+        DELETE FROM process_index i USING servers s
+        WHERE s.id = i.server_id AND s.last_seen < :cutoff
+    """), {"cutoff": today - datetime.timedelta(days=PROCESS_INDEX_STALE_DAYS)}).rowcount
+    conn.commit()
+    return deleted
+
+
+def migrate_to_partitioned(conn, today: Optional[datetime.date] = None) -> List[str]:
+    """
+    Convierte las tablas de telemetría sin particionar en tablas particionadas.
+
+    Cada tabla se renombra (con su secuencia, sin sus índices), schema.sql crea la tabla
+    particionada con sus índices y la partición DEFAULT, se crean las particiones desde
+    el día de la fila más antigua y las filas se copian por nombre de columna conservando
+    sus id. Todo ocurre en una transacción: si algo falla, las tablas quedan como estaban.
+    Las ingestas concurrentes esperan el bloqueo y fallan al terminar: ejecutar con la API
+    detenida.
+
+    Args:
+        conn: Conexión de SQLAlchemy
+        today: Fecha de referencia para las particiones por adelantado (por defecto, hoy en UTC)
+
+    Returns:
+        Tablas migradas
+    """
+    tables = unpartitioned_tables(conn)
+    if not tables:
+        return []
+    today = today or datetime.datetime.now(timezone.utc).date()
+    step = partition_step()
+    last = partition_start(today) + PARTITION_PREMAKE * step
+    oldest = {}
+    for table in tables:
+        legacy = f"{table}_unpartitioned"
+        oldest[table] = conn.execute(text(f"SELECT min(timestamp) FROM {table}")).scalar()
+        sequence = conn.execute(text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": table}).scalar()
+        # Los nombres de la secuencia, la clave primaria y los índices quedan libres para schema.sql
+        conn.execute(text(f"ALTER TABLE {table} RENAME TO {legacy}"))
+        if sequence:
+            conn.execute(text(f"ALTER SEQUENCE {sequence} RENAME TO {legacy}_id_seq"))
+        indexes = conn.execute(text(
+            "SELECT c.relname, con.conname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "LEFT JOIN pg_constraint con ON con.conindid = i.indexrelid AND con.conrelid = i.indrelid "
+            "WHERE i.indrelid = CAST(:table AS regclass)"
+        ), {"table": legacy}).all()
+        for index, constraint in indexes:
+            if constraint:
+                conn.execute(text(f"ALTER TABLE {legacy} DROP CONSTRAINT {constraint} CASCADE"))
+            else:
+                conn.execute(text(f"DROP INDEX {index}"))
+    conn.exec_driver_sql(SCHEMA_PATH.read_text(encoding="utf-8"))
+
+    for table in tables:
+        legacy = f"{table}_unpartitioned"
+        start = partition_start(oldest[table].date()) if oldest[table] else partition_start(today)
+        while start <= last:
+            create_partition(conn, table, start, start + step)
+            start += step
+        new_columns = set(conn.execute(text(f"SELECT * FROM {table} LIMIT 0")).keys())
+        columns = ", ".join(column for column in conn.execute(text(f"SELECT * FROM {legacy} LIMIT 0")).keys()
+                            if column in new_columns)
+        copied = conn.execute(text(f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {legacy}")).rowcount
+        conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence(:table, 'id'), max(id)) FROM {legacy} HAVING max(id) IS NOT NULL"
+        ), {"table": table})
+        conn.execute(text(f"DROP TABLE {legacy} CASCADE"))
+        logger.info(f"Tabla {table} particionada: {copied} filas copiadas")
+    conn.commit()
+    return tables
+
+
+def run_maintenance(engine, today: Optional[datetime.date] = None,
+                    since: Optional[datetime.date] = None, migrate: bool = False) -> None:
+    """
+    Crea particiones y aplica la retención (también a los agregados de CPU y al índice
+    de procesos), si ningún otro proceso lo está haciendo.
+
+    Args:
+        engine: Engine de SQLAlchemy
+        today: Fecha de referencia (por defecto, hoy en UTC)
+        since: Crear también las particiones anteriores desde este día
+        migrate: Convertir antes las tablas sin particionar (migrate_to_partitioned)
+
+    Raises:
+        RuntimeError: Si RETENTION_DAYS > 0 y hay tablas de telemetría sin particionar
+    """
+    if engine.dialect.name != 'postgresql':
+        return
+    with engine.connect() as conn:
+        if RETENTION_DAYS > 0 and not migrate:
+            # Sin particiones la retención no eliminaría nada y la base crecería sin límite
+            missing = unpartitioned_tables(conn)
+            conn.rollback()
+            if missing:
+                raise RuntimeError(f"RETENTION_DAYS={RETENTION_DAYS} requiere tablas particionadas y "
+                                   f"{', '.join(missing)} no lo están: ejecute python maintenance.py --migrate")
+        locked = conn.execute(text("SELECT pg_try_advisory_lock(:id)"), {"id": MAINTENANCE_LOCK_ID}).scalar()
+        conn.commit()
+        if not locked:
+            logger.info("Otro proceso está ejecutando el mantenimiento")
+            return
+        try:
+            # Mover filas de la partición DEFAULT o resumir una partición puede superar
+            # DB_STATEMENT_TIMEOUT_MS; el límite se restablece al terminar
+            conn.execute(text("SET statement_timeout = 0"))
+            conn.commit()
+            if migrate:
+                migrate_to_partitioned(conn, today)
+            created = ensure_partitions(conn, today, since)
+            dropped = apply_retention(conn, today)
+            pruned = prune_cpu_rollups(conn, today)
+            stale = prune_process_index(conn, today)
+            if created or dropped or pruned or stale:
+                logger.info(f"Mantenimiento: {created} particiones creadas, {dropped} eliminadas, "
+                            f"{pruned} agregados de CPU eliminados, {stale} entradas del índice de procesos expiradas")
+        finally:
+            conn.rollback()
+            conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MAINTENANCE_LOCK_ID})
+            conn.execute(text("RESET statement_timeout"))
+            conn.commit()
+
+
+def start_maintenance_thread(engine, interval: float) -> threading.Thread:
+    """
+    Ejecuta run_maintenance cada `interval` segundos en un hilo en segundo plano.
+
+    Args:
+        engine: Engine de SQLAlchemy
+        interval: Segundos entre ejecuciones
+    """
+    def loop():
+        while True:
+            try:
+                run_maintenance(engine)
+            except Exception as e:
+                logger.error(f"Error en el mantenimiento de particiones: {e}")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=loop, name="partition-maintenance", daemon=True)
+    thread.start()
+    return thread
+
+
+def main():
+    global RETENTION_DAYS
+    parser = argparse.ArgumentParser(description="Crea particiones y aplica la retención")
+    parser.add_argument("--migrate", action="store_true",
+                        help="Convertir antes las tablas sin particionar (ejecutar con la API detenida)")
+    parser.add_argument("--database-url", default=os.getenv('DATABASE_URL'), help="URL SQLAlchemy")
+    parser.add_argument("--retention-days", type=int, default=RETENTION_DAYS,
+                        help="Días de datos completos a conservar (0 conserva todo)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    RETENTION_DAYS = args.retention_days
+    run_maintenance(create_engine(args.database_url), migrate=args.migrate)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""
+Métricas de la API en formato de texto de Prometheus
+-----------------------------------------------------
+Contadores e histogramas en memoria, sin dependencias externas, para exponer en /metrics:
+- Tiempo por etapa de la ingesta (decodificación, validación, base de datos, commit, archivo)
+- Distribución del tamaño de los cuerpos y de la cantidad de procesos por instantánea
+- Espera para obtener una conexión del pool de la base de datos
+- Errores por etapa y duración de las solicitudes HTTP por endpoint
+
+Registrar una observación cuesta un bisect y un incremento bajo un lock (~1 µs), de modo
+que las métricas quedan siempre activas. Con varios procesos (workers de gunicorn) cada
+uno tiene sus propios valores: si METRICS_DIR está definido, cada proceso guarda los suyos
+en ese directorio cada METRICS_FLUSH_SECONDS segundos y /metrics suma los de todos, de modo
+que cualquier worker que atienda la consulta devuelve los totales.
+"""
+
+import os
+import json
+import time
+import atexit
+import bisect
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+logger = logging.getLogger(__name__)
+
+# Límites de los buckets (segundos y tamaños)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BYTES_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+COUNT_BUCKETS = (10, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Counter:
+    """Contador monótono con etiquetas."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """Suma `amount` al contador de las etiquetas dadas."""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def clear(self) -> None:
+        """Descarta todos los valores."""
+        with self._lock:
+            self._values.clear()
+
+    def dump(self) -> Dict[str, Any]:
+        """Valores actuales, serializables en JSON."""
+        with self._lock:
+            return {json.dumps(key): value for key, value in self._values.items()}
+
+    @staticmethod
+    def merge(total: Dict[str, Any], values: Dict[str, Any]) -> None:
+        """Suma los valores de otro proceso a `total`."""
+        for key, value in values.items():
+            total[key] = total.get(key, 0.0) + value
+
+    def render(self, values: Dict[str, Any]) -> List[str]:
+        """Líneas de texto de Prometheus."""
+        return [f"{self.name}{format_labels(self.labelnames, json.loads(key))} {format_value(value)}"
+                for key, value in sorted(values.items())]
+
+
+class Histogram:
+    """Histograma con buckets fijos y etiquetas."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: Tuple[float, ...],
+                 labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.labelnames = labelnames
+        # Por etiquetas: conteo por bucket (no acumulado, el último es +Inf), suma y cantidad
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        """Registra una observación."""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def time(self, **labels: str) -> "Timer":
+        """Context manager que observa los segundos transcurridos."""
+        return Timer(self, labels)
+
+    def clear(self) -> None:
+        """Descarta todos los valores."""
+        with self._lock:
+            self._values.clear()
+
+    def dump(self) -> Dict[str, Any]:
+        """Valores actuales, serializables en JSON."""
+        with self._lock:
+            return {json.dumps(key): list(state) for key, state in self._values.items()}
+
+    @staticmethod
+    def merge(total: Dict[str, Any], values: Dict[str, Any]) -> None:
+        """Suma los valores de otro proceso a `total`."""
+        for key, state in values.items():
+            current = total.get(key)
+            total[key] = list(state) if current is None else [a + b for a, b in zip(current, state)]
+
+    def render(self, values: Dict[str, Any]) -> List[str]:
+        """Líneas de texto de Prometheus (buckets acumulados, _sum y _count)."""
+        lines = []
+        for key, state in sorted(values.items()):
+            label_values = json.loads(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state):
+                cumulative += count
+                labels = format_labels(self.labelnames + ("le",), label_values + [format_value(bound)])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = format_labels(self.labelnames, label_values)
+            lines.append(f"{self.name}_sum{labels} {format_value(state[-2])}")
+            lines.append(f"{self.name}_count{labels} {state[-1]}")
+        return lines
+
+
+class Timer:
+    """Mide un bloque y lo registra en un histograma."""
+
+    __slots__ = ("histogram", "labels", "started")
+
+    def __init__(self, histogram: Histogram, labels: Dict[str, str]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) -> "Timer":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+
+
+def format_labels(names: Tuple[str, ...], values: List[str]) -> str:
+    """Etiquetas en el formato {a="x",b="y"} con los caracteres especiales escapados."""
+    if not names:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for value in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+
+def format_value(value: float) -> str:
+    """Número en el formato de Prometheus (+Inf, enteros sin decimales)."""
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Registry:
+    """Conjunto de métricas de la API, con agregación opcional entre procesos."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self.directory: Optional[Path] = None
+
+    def register(self, metric: Any) -> Any:
+        """Agrega una métrica al registro y la devuelve."""
+        self._metrics[metric.name] = metric
+        return metric
+
+    def dump(self) -> Dict[str, Dict[str, Any]]:
+        """Valores de este proceso, serializables en JSON."""
+        return {name: metric.dump() for name, metric in self._metrics.items()}
+
+    def reset(self) -> None:
+        """Descarta los valores heredados del proceso principal tras un fork."""
+        for metric in self._metrics.values():
+            metric.clear()
+
+    def _own_file(self) -> Path:
+        return self.directory / f"metrics_{os.getpid()}.json"
+
+    def write(self) -> None:
+        """Guarda los valores de este proceso en METRICS_DIR (reemplazo atómico)."""
+        if self.directory is None:
+            return
+        path = self._own_file()
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self.dump()), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+    def collect(self) -> Dict[str, Dict[str, Any]]:
+        """Valores de este proceso sumados a los guardados por los demás procesos."""
+        totals = self.dump()
+        if self.directory is None:
+            return totals
+        own_file = self._own_file()
+        # Se conservan los archivos de procesos terminados para que los contadores no retrocedan
+        for path in self.directory.glob("metrics_*.json"):
+            if path == own_file:
+                continue
+            try:
+                values = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue
+            for name, metric_values in values.items():
+                metric = self._metrics.get(name)
+                if metric is not None:
+                    metric.merge(totals.setdefault(name, {}), metric_values)
+        return totals
+
+    def render(self) -> str:
+        """Todas las métricas en formato de texto de Prometheus (versión 0.0.4)."""
+        totals = self.collect()
+        lines = []
+        for name, metric in self._metrics.items():
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.extend(metric.render(totals.get(name, {})))
+        return "\n".join(lines) + "\n"
+
+    def start_sharing(self, directory: str, interval: float) -> None:
+        """
+        Comparte los valores de este proceso con los demás a través de un directorio.
+
+        Args:
+            directory: Directorio común a todos los procesos de la API
+            interval: Segundos entre escrituras del archivo de este proceso
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.write()
+                except OSError as e:
+                    logger.warning(f"No se pudieron guardar las métricas en {self.directory}: {e}")
+
+        threading.Thread(target=run, name="metrics-writer", daemon=True).start()
+        atexit.register(self.write)
+
+
+registry = Registry()
+
+INGEST_STAGE_SECONDS = registry.register(Histogram(
+    "sysinfo_ingest_stage_seconds", "Duración de cada etapa de la ingesta",
+    LATENCY_BUCKETS, ("stage",)))
+INGEST_ERRORS = registry.register(Counter(
+    "sysinfo_ingest_errors_total", "Errores de la ingesta por etapa", ("stage",)))
+INGEST_PAYLOAD_BYTES = registry.register(Histogram(
+    "sysinfo_ingest_payload_bytes", "Tamaño del cuerpo recibido (antes de descomprimir)",
+    BYTES_BUCKETS, ("endpoint", "encoding")))
+INGEST_PROCESSES = registry.register(Histogram(
+    "sysinfo_ingest_processes", "Procesos por instantánea", COUNT_BUCKETS))
+DB_POOL_CHECKOUT_SECONDS = registry.register(Histogram(
+    "sysinfo_db_pool_checkout_seconds", "Espera para obtener una conexión del pool", LATENCY_BUCKETS))
+DB_POOL_TIMEOUTS = registry.register(Counter(
+    "sysinfo_db_pool_timeouts_total", "Solicitudes de conexión que agotaron DB_POOL_TIMEOUT"))
+HTTP_REQUEST_SECONDS = registry.register(Histogram(
+    "sysinfo_http_request_seconds", "Duración de las solicitudes HTTP (sin el envío de respuestas en streaming)",
+    LATENCY_BUCKETS, ("endpoint",)))
+HTTP_REQUESTS = registry.register(Counter(
+    "sysinfo_http_requests_total", "Solicitudes HTTP por endpoint y código", ("endpoint", "status")))
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool que registra la espera de cada checkout en DB_POOL_CHECKOUT_SECONDS."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            DB_POOL_TIMEOUTS.inc()
+            raise
+        finally:
+            DB_POOL_CHECKOUT_SECONDS.observe(time.perf_counter() - started)
+
+
+class TimedAsyncQueuePool(TimedQueuePool, AsyncAdaptedQueuePool):
+    """TimedQueuePool para engines asíncronos (asyncpg en asgi_server.py)."""
@@ -16,11 +16,24 @@ class Server(db.Model):
     ip_address = db.Column(db.String(50), unique=True, nullable=False)
     first_seen = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
     last_seen = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc), nullable=False)
+    # Hash y comienzo de la versión vigente de cada sección estática (ver static_sections.py)
+    static_state = db.Column(db.JSON)
+    # Se incrementa con cada instantánea: valida la caché de /query en todos los procesos
+    data_version = db.Column(db.BigInteger, nullable=False, default=0)
+    
+    __table_args__ = (
+        # Paginación por cursor de /servers (del más reciente al más antiguo)
+        db.Index('idx_servers_last_seen', 'last_seen', 'id'),
+        # Filtro por prefijo de IP (LIKE 'prefijo%') en /servers
+        db.Index('idx_servers_ip_pattern', 'ip_address', postgresql_ops={'ip_address': 'text_pattern_ops'}),
+    )
     
     # Relaciones
-    os_info = db.relationship("OSInfo", back_populates="server", cascade="all, delete-orphan")
-    processor_info = db.relationship("ProcessorInfo", back_populates="server", cascade="all, delete-orphan")
+    snapshots = db.relationship("Snapshot", back_populates="server", cascade="all, delete-orphan", lazy="dynamic")
+    os_info = db.relationship("OSInfo", back_populates="server", cascade="all, delete-orphan", lazy="dynamic")
+    processor_info = db.relationship("ProcessorInfo", back_populates="server", cascade="all, delete-orphan", lazy="dynamic")
     processes = db.relationship("Process", back_populates="server", cascade="all, delete-orphan")
+    process_intervals = db.relationship("ProcessInterval", back_populates="server", cascade="all, delete-orphan")
     logged_users = db.relationship("LoggedUser", back_populates="server", cascade="all, delete-orphan")
     
     def __repr__(self):
@@ -38,23 +51,126 @@ class Server(db.Model):
         if include_relations:
             # Incluir relaciones para un vistazo completo
             data['os_info'] = [os.to_dict() for os in self.os_info.order_by(OSInfo.timestamp.desc()).limit(10)]
-            data['processor_info'] = [proc.to_dict() for proc in self.processor_info.order_by(ProcessorInfo.timestamp.desc()).limit(10)]
+            versions = self.processor_info.order_by(ProcessorInfo.timestamp.desc()).limit(10).all()
+            cpu_by_snapshot = {}
+            snapshot_ids = [proc.snapshot_id for proc in versions if proc.snapshot_id is not None]
+            if snapshot_ids:
+                # El rango de marcas de tiempo limita la búsqueda a las particiones de esas instantáneas
+                cpu_by_snapshot = dict(db.session.query(Snapshot.id, Snapshot.cpu_percent).filter(
+                    Snapshot.id.in_(snapshot_ids),
+                    Snapshot.timestamp.between(min(proc.timestamp for proc in versions),
+                                               max(proc.timestamp for proc in versions))
+                ))
+            data['processor_info'] = [proc.to_dict(cpu_by_snapshot.get(proc.snapshot_id)) for proc in versions]
         
         return data
 
 
+class Snapshot(db.Model):
+    """
+    Modelo que representa una instantánea recibida de un agente.
+    
+    Las filas de procesos, usuarios, S.O. y procesador de la instantánea la
+    referencian por snapshot_id, de modo que una instantánea completa se obtiene
+    con una búsqueda por clave en cada tabla.
+    """
+    
+    __tablename__ = 'snapshots'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    server_id = db.Column(db.Integer, db.ForeignKey('servers.id'), nullable=False)
+    timestamp = db.Column(db.DateTime, nullable=False)
+    process_count = db.Column(db.Integer, nullable=False, default=0)
+    user_count = db.Column(db.Integer, nullable=False, default=0)
+    # Uso de CPU informado en la instantánea (antes se guardaba en processor_info)
+    cpu_percent = db.Column(db.Float)
+    
+    __table_args__ = (
+        # Incluye los contadores para listar instantáneas solo con el índice (PostgreSQL)
+        db.Index('idx_snapshots_server_time', 'server_id', 'timestamp',
+                 postgresql_include=['id', 'process_count', 'user_count', 'cpu_percent']),
+    )
+    
+    # Relación
+    server = db.relationship("Server", back_populates="snapshots")
+    
+    def __repr__(self):
+        return f"<Snapshot {self.server_id} {self.timestamp}>"
+    
+    def to_dict(self):
+        """Convertir modelo a diccionario."""
+        return {
+            "id": self.id,
+            "timestamp": self.timestamp.isoformat(),
+            "process_count": self.process_count,
+            "user_count": self.user_count,
+            "cpu_percent": self.cpu_percent
+        }
+
+
+class SnapshotSummary(db.Model):
+    """
+    Modelo que representa el resumen horario de las instantáneas de un servidor.
+    
+    Se genera al aplicar la retención, antes de eliminar las particiones con las
+    instantáneas originales.
+    """
+    
+    __tablename__ = 'snapshot_summaries'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    server_id = db.Column(db.Integer, db.ForeignKey('servers.id'), nullable=False)
+    bucket = db.Column(db.DateTime, nullable=False)
+    snapshot_count = db.Column(db.Integer, nullable=False)
+    avg_process_count = db.Column(db.Float)
+    max_process_count = db.Column(db.Integer)
+    avg_user_count = db.Column(db.Float)
+    max_user_count = db.Column(db.Integer)
+    avg_cpu_percent = db.Column(db.Float)
+    max_cpu_percent = db.Column(db.Float)
+    
+    __table_args__ = (
+        db.UniqueConstraint('server_id', 'bucket', name='unique_summary_bucket'),
+    )
+    
+    def __repr__(self):
+        return f"<SnapshotSummary {self.server_id} {self.bucket}>"
+    
+    def to_dict(self):
+        """Convertir modelo a diccionario."""
+        return {
+            "bucket": self.bucket.isoformat(),
+            "snapshot_count": self.snapshot_count,
+            "avg_process_count": self.avg_process_count,
+            "max_process_count": self.max_process_count,
+            "avg_user_count": self.avg_user_count,
+            "max_user_count": self.max_user_count,
+            "avg_cpu_percent": self.avg_cpu_percent,
+            "max_cpu_percent": self.max_cpu_percent
+        }
+
+
 class OSInfo(db.Model):
-    """Modelo que representa información del sistema operativo."""
+    """
+    Modelo que representa una versión de la información del sistema operativo.
+    
+    Se guarda una fila solo cuando el contenido cambia: timestamp es el comienzo de la
+    versión y valid_to el de la siguiente (NULL mientras está vigente).
+    """
     
     __tablename__ = 'os_info'
     
     id = db.Column(db.Integer, primary_key=True)
     server_id = db.Column(db.Integer, db.ForeignKey('servers.id'), nullable=False)
+    # Instantánea a la que pertenece (sin clave foránea: snapshots está particionada)
+    snapshot_id = db.Column(db.Integer)
     timestamp = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
     system = db.Column(db.String(100))
     release = db.Column(db.String(100))
     version = db.Column(db.String(255))
     platform = db.Column(db.String(255))
+    # Comienzo de la versión siguiente (NULL: vigente, o fila anterior al versionado)
+    valid_to = db.Column(db.DateTime)
     
     # Relación
     server = db.relationship("Server", back_populates="os_info")
@@ -70,21 +186,32 @@ class OSInfo(db.Model):
             "system": self.system,
             "release": self.release,
             "version": self.version,
-            "platform": self.platform
+            "platform": self.platform,
+            "valid_to": self.valid_to.isoformat() if self.valid_to else None
         }
 
 
 class ProcessorInfo(db.Model):
-    """Modelo que representa información del procesador."""
+    """
+    Modelo que representa una versión de la información del procesador.
+    
+    Igual que OSInfo, solo se guarda una fila cuando cambian cpu_count o model.
+    cpu_percent queda NULL en las versiones: el uso de cada instantánea está en snapshots
+    y to_dict informa el de la instantánea que abrió la versión.
+    """
     
     __tablename__ = 'processor_info'
     
     id = db.Column(db.Integer, primary_key=True)
     server_id = db.Column(db.Integer, db.ForeignKey('servers.id'), nullable=False)
+    # Instantánea a la que pertenece (sin clave foránea: snapshots está particionada)
+    snapshot_id = db.Column(db.Integer)
     timestamp = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
     cpu_count = db.Column(db.Integer)
     model = db.Column(db.String(255))
     cpu_percent = db.Column(db.Float)
+    # Comienzo de la versión siguiente (NULL: vigente, o fila anterior al versionado)
+    valid_to = db.Column(db.DateTime)
     
     # Relación
     server = db.relationship("Server", back_populates="processor_info")
@@ -92,17 +219,68 @@ class ProcessorInfo(db.Model):
     def __repr__(self):
         return f"<ProcessorInfo {self.model}>"
     
-    def to_dict(self):
-        """Convertir modelo a diccionario."""
+    def to_dict(self, snapshot_cpu_percent=None):
+        """
+        Convertir modelo a diccionario.
+        
+        snapshot_cpu_percent es el cpu_percent de la instantánea snapshot_id; se usa en
+        las versiones, que no lo guardan (las filas anteriores al versionado sí).
+        """
         return {
             "id": self.id,
             "timestamp": self.timestamp.isoformat(),
             "cpu_count": self.cpu_count,
             "model": self.model,
-            "cpu_percent": self.cpu_percent
+            "cpu_percent": self.cpu_percent if self.cpu_percent is not None else snapshot_cpu_percent,
+            "valid_to": self.valid_to.isoformat() if self.valid_to else None
         }
 
 
+class CpuRollup(db.Model):
+    """
+    Modelo que representa el uso de CPU agregado de un servidor en un intervalo.
+    
+    resolution es '1m', '1h' o '1d' y bucket el inicio del intervalo (UTC).
+    """
+    
+    __tablename__ = 'cpu_rollups'
+    
+    server_id = db.Column(db.Integer, db.ForeignKey('servers.id', ondelete='CASCADE'), primary_key=True)
+    resolution = db.Column(db.String(4), primary_key=True)
+    bucket = db.Column(db.DateTime, primary_key=True)
+    sample_count = db.Column(db.Integer, nullable=False)
+    cpu_sum = db.Column(db.Float, nullable=False)
+    cpu_min = db.Column(db.Float, nullable=False)
+    cpu_max = db.Column(db.Float, nullable=False)
+    
+    __table_args__ = (
+        # Retención por resolución (maintenance.prune_cpu_rollups)
+        db.Index('idx_cpu_rollups_resolution_bucket', 'resolution', 'bucket'),
+    )
+    
+    def __repr__(self):
+        return f"<CpuRollup {self.server_id} {self.resolution} {self.bucket}>"
+
+
+class CpuRollupBin(db.Model):
+    """Modelo que representa un bin del histograma de CPU de un intervalo de CpuRollup."""
+    
+    __tablename__ = 'cpu_rollup_bins'
+    
+    server_id = db.Column(db.Integer, db.ForeignKey('servers.id', ondelete='CASCADE'), primary_key=True)
+    resolution = db.Column(db.String(4), primary_key=True)
+    bucket = db.Column(db.DateTime, primary_key=True)
+    bin = db.Column(db.SmallInteger, primary_key=True)
+    sample_count = db.Column(db.Integer, nullable=False)
+    
+    __table_args__ = (
+        db.Index('idx_cpu_rollup_bins_resolution_bucket', 'resolution', 'bucket'),
+    )
+    
+    def __repr__(self):
+        return f"<CpuRollupBin {self.server_id} {self.resolution} {self.bucket} {self.bin}>"
+
+
 class Process(db.Model):
     """Modelo que representa un proceso en ejecución."""
     
@@ -110,11 +288,17 @@ class Process(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     server_id = db.Column(db.Integer, db.ForeignKey('servers.id'), nullable=False)
+    # Instantánea a la que pertenece (sin clave foránea: snapshots está particionada)
+    snapshot_id = db.Column(db.Integer)
     timestamp = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
     pid = db.Column(db.Integer, nullable=False)
     name = db.Column(db.String(255), nullable=False)
     username = db.Column(db.String(100))
     
+    __table_args__ = (
+        db.Index('idx_processes_snapshot', 'snapshot_id'),
+    )
+    
     # Relación
     server = db.relationship("Server", back_populates="processes")
     
@@ -131,17 +315,108 @@ class Process(db.Model):
         }
 
 
+class ProcessInterval(db.Model):
+    """
+    Modelo que representa el tiempo de vida de un proceso (modo de almacenamiento 'interval').
+    
+    Un intervalo se abre con la primera instantánea en la que aparece el proceso
+    (server, pid, name, username) y se cierra con la primera en la que ya no aparece.
+    """
+    
+    __tablename__ = 'process_intervals'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    server_id = db.Column(db.Integer, db.ForeignKey('servers.id'), nullable=False)
+    pid = db.Column(db.Integer, nullable=False)
+    name = db.Column(db.String(255), nullable=False)
+    username = db.Column(db.String(100))
+    # Primera y última instantánea en la que se observó el proceso
+    # (last_seen se completa al cerrar el intervalo; mientras está abierto vale first_seen
+    # y to_dict informa el last_seen del servidor, su última instantánea)
+    first_seen = db.Column(db.DateTime, nullable=False)
+    last_seen = db.Column(db.DateTime, nullable=False)
+    # Primera instantánea en la que ya no aparece (NULL mientras sigue en ejecución)
+    ended_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('idx_process_intervals_server_open', 'server_id', 'ended_at'),
+        db.Index('idx_process_intervals_server_first', 'server_id', 'first_seen'),
+    )
+    
+    # Relación
+    server = db.relationship("Server", back_populates="process_intervals")
+    
+    def __repr__(self):
+        return f"<ProcessInterval {self.pid} {self.name}>"
+    
+    def to_dict(self, server_last_seen=None):
+        """
+        Convertir modelo a diccionario.
+        
+        server_last_seen es el last_seen del servidor: un intervalo abierto siguió
+        presente hasta la última instantánea, de modo que se informa como su last_seen.
+        """
+        last_seen = server_last_seen if self.ended_at is None and server_last_seen else self.last_seen
+        return {
+            "id": self.id,
+            "pid": self.pid,
+            "name": self.name,
+            "username": self.username,
+            "first_seen": self.first_seen.isoformat(),
+            "last_seen": last_seen.isoformat(),
+            "ended_at": self.ended_at.isoformat() if self.ended_at else None
+        }
+
+
+class ProcessIndexEntry(db.Model):
+    """
+    Modelo que representa un par (proceso, usuario) presente en la última instantánea de un servidor.
+    
+    username vale '' cuando el agente no informó el usuario (forma parte de la clave primaria).
+    """
+    
+    __tablename__ = 'process_index'
+    
+    server_id = db.Column(db.Integer, db.ForeignKey('servers.id', ondelete='CASCADE'), primary_key=True)
+    name = db.Column(db.String(255), primary_key=True)
+    username = db.Column(db.String(100), primary_key=True, default='')
+    # Primera instantánea de la racha actual en la que apareció el par
+    first_seen = db.Column(db.DateTime, nullable=False)
+    
+    __table_args__ = (
+        # Búsqueda por nombre exacto o prefijo (LIKE 'prefijo%') y por usuario
+        db.Index('idx_process_index_name', 'name', 'username', postgresql_ops={'name': 'text_pattern_ops'}),
+        db.Index('idx_process_index_user', 'username'),
+    )
+    
+    def __repr__(self):
+        return f"<ProcessIndexEntry {self.server_id} {self.name} {self.username}>"
+
+
 class LoggedUser(db.Model):
-    """Modelo que representa un usuario con sesión abierta."""
+    """
+    Modelo que representa un usuario con sesión abierta.
+    
+    Las filas de una versión del conjunto de usuarios comparten timestamp (comienzo) y
+    valid_to; se guarda un conjunto nuevo solo cuando cambia.
+    """
     
     __tablename__ = 'logged_users'
     
     id = db.Column(db.Integer, primary_key=True)
     server_id = db.Column(db.Integer, db.ForeignKey('servers.id'), nullable=False)
+    # Instantánea a la que pertenece (sin clave foránea: snapshots está particionada)
+    snapshot_id = db.Column(db.Integer)
     timestamp = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
     username = db.Column(db.String(100), nullable=False)
     terminal = db.Column(db.String(100))
     host = db.Column(db.String(255))
+    # Comienzo de la versión siguiente (NULL: vigente, o fila anterior al versionado)
+    valid_to = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('idx_users_snapshot', 'snapshot_id'),
+    )
     
     # Relación
     server = db.relationship("Server", back_populates="logged_users")
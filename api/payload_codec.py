@@ -0,0 +1,181 @@
+"""
+Decodificación del cuerpo de /collect para la API de Recolección de Información de Sistemas
+--------------------------------------------------------------------------------------------
+- Content-Encoding: gzip y, si el paquete zstandard está instalado, zstd
+- Lista de procesos en formato de columnas (arreglos paralelos) además de la lista de objetos
+- Lotes como arreglo JSON o como NDJSON (una instantánea por línea)
+- Límite de tamaño descomprimido para evitar bombas de compresión
+"""
+
+import io
+import os
+import json
+import zlib
+from typing import Dict, Any, List, Optional, Union
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Tamaño máximo del cuerpo una vez descomprimido (bytes)
+MAX_DECOMPRESSED_BYTES = int(os.getenv('MAX_DECOMPRESSED_BYTES', str(32 * 1024 * 1024)))
+
+# Codificaciones anunciadas a los agentes, de la preferida a la menos preferida
+CONTENT_ENCODINGS: List[str] = (["zstd"] if zstandard else []) + ["gzip", "identity"]
+PROCESS_ENCODINGS: List[str] = ["columnar", "list"]
+
+
+class PayloadError(Exception):
+    """El cuerpo de la solicitud no se puede decodificar."""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _gunzip(body: bytes) -> bytes:
+    """Descomprime gzip respetando MAX_DECOMPRESSED_BYTES."""
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    try:
+        data = decompressor.decompress(body, MAX_DECOMPRESSED_BYTES)
+    except zlib.error as e:
+        raise PayloadError(f"Cuerpo gzip inválido: {e}")
+    if decompressor.unconsumed_tail:
+        raise PayloadError("El cuerpo descomprimido supera el tamaño máximo permitido", 413)
+    return data
+
+
+def _unzstd(body: bytes) -> bytes:
+    """Descomprime zstd respetando MAX_DECOMPRESSED_BYTES."""
+    try:
+        reader = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(body))
+        data = reader.read(MAX_DECOMPRESSED_BYTES + 1)
+    except zstandard.ZstdError as e:
+        raise PayloadError(f"Cuerpo zstd inválido: {e}")
+    if len(data) > MAX_DECOMPRESSED_BYTES:
+        raise PayloadError("El cuerpo descomprimido supera el tamaño máximo permitido", 413)
+    return data
+
+
+def decode_body(body: bytes, content_encoding: Optional[str]) -> bytes:
+    """
+    Deshace el Content-Encoding del cuerpo.
+
+    Args:
+        body: Cuerpo tal como llegó
+        content_encoding: Valor del encabezado Content-Encoding (None si no hay)
+
+    Returns:
+        Cuerpo sin comprimir
+
+    Raises:
+        PayloadError: Codificación no soportada (415) o cuerpo inválido
+    """
+    encoding = (content_encoding or "identity").strip().lower()
+    if encoding == "identity":
+        return body
+    if encoding in ("gzip", "x-gzip"):
+        return _gunzip(body)
+    if encoding == "zstd" and zstandard:
+        return _unzstd(body)
+    raise PayloadError(f"Content-Encoding no soportado: {encoding}", 415)
+
+
+def expand_columnar_processes(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convierte la lista de procesos en formato de columnas a una lista de objetos.
+
+    Formato de columnas: {"pid": [1, 2], "name": ["init", "sshd"], ...}, con todos
+    los arreglos del mismo largo. Si los procesos ya son una lista no hace nada.
+
+    Args:
+        data: Instantánea recibida
+
+    Returns:
+        La misma instantánea con "processes" como lista de diccionarios
+
+    Raises:
+        PayloadError: Si las columnas no son arreglos del mismo largo
+    """
+    columns = data.get("processes")
+    if not isinstance(columns, dict):
+        return data
+    if not all(isinstance(values, list) for values in columns.values()):
+        raise PayloadError("Las columnas de procesos deben ser arreglos")
+    lengths = {len(values) for values in columns.values()}
+    if len(lengths) > 1:
+        raise PayloadError("Las columnas de procesos tienen largos distintos")
+    names = list(columns.keys())
+    data["processes"] = [dict(zip(names, row)) for row in zip(*columns.values())]
+    return data
+
+
+def parse_body(body: bytes, content_encoding: Optional[str]) -> Any:
+    """
+    Decodifica un cuerpo JSON posiblemente comprimido y con procesos en columnas.
+
+    Args:
+        body: Cuerpo tal como llegó
+        content_encoding: Valor del encabezado Content-Encoding
+
+    Returns:
+        Documento JSON decodificado
+
+    Raises:
+        PayloadError: Si el cuerpo no se puede decodificar
+    """
+    raw = decode_body(body, content_encoding)
+    try:
+        data = json.loads(raw)
+    except ValueError:
+        raise PayloadError("El cuerpo no es JSON válido")
+    if isinstance(data, dict):
+        expand_columnar_processes(data)
+    return data
+
+
+def parse_batch_body(body: bytes, content_encoding: Optional[str],
+                     ndjson: bool = False) -> List[Union[Any, PayloadError]]:
+    """
+    Decodifica el cuerpo de un lote de instantáneas.
+
+    Un elemento que no se puede decodificar se devuelve como PayloadError en su
+    posición, para que no invalide al resto del lote.
+
+    Args:
+        body: Cuerpo tal como llegó
+        content_encoding: Valor del encabezado Content-Encoding
+        ndjson: True si el cuerpo es NDJSON, False si es un arreglo JSON
+
+    Returns:
+        Lista de instantáneas decodificadas (o PayloadError por elemento)
+
+    Raises:
+        PayloadError: Si el cuerpo completo no se puede decodificar
+    """
+    raw = decode_body(body, content_encoding)
+    if ndjson:
+        items = []
+        for line in raw.splitlines():
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError:
+                items.append(PayloadError("Línea NDJSON inválida"))
+    else:
+        try:
+            items = json.loads(raw)
+        except ValueError:
+            raise PayloadError("El cuerpo no es JSON válido")
+        if not isinstance(items, list):
+            raise PayloadError("El cuerpo debe ser un arreglo JSON de instantáneas")
+
+    for i, item in enumerate(items):
+        if isinstance(item, dict):
+            try:
+                expand_columnar_processes(item)
+            except PayloadError as e:
+                items[i] = e
+    return items
@@ -0,0 +1,96 @@
+"""
+Índice del estado actual de procesos de la flota
+------------------------------------------------
+Guarda, por servidor, los pares (nombre de proceso, usuario) de su última instantánea,
+para responder "qué servidores están ejecutando X ahora" sin recorrer el historial:
+- Cada ingesta compara la instantánea con el índice del servidor, agrega los pares
+  nuevos y elimina los que desaparecieron (en régimen estable no escribe nada)
+- La hora de última observación es servers.last_seen, que ya se actualiza en cada ingesta
+- El mantenimiento (maintenance.prune_process_index) quita los servidores que dejaron de reportar
+"""
+
+import datetime
+import logging
+from typing import Dict, Any, List, Optional
+
+from sqlalchemy import delete, tuple_
+
+from models import db, Server, ProcessIndexEntry
+from bulk_insert import bulk_insert
+
+logger = logging.getLogger(__name__)
+
+
+def update_process_index(server_id: int, previous_seen: Optional[datetime.datetime],
+                         timestamp: datetime.datetime, processes: List[Dict[str, Any]]) -> None:
+    """
+    Reemplaza el estado actual del servidor en el índice, dentro de la transacción actual.
+
+    Args:
+        server_id: Id del servidor
+        previous_seen: Marca de tiempo de la instantánea anterior del servidor (None si es la primera)
+        timestamp: Marca de tiempo de esta instantánea
+        processes: Lista de procesos de la instantánea
+    """
+    if previous_seen is not None and timestamp < previous_seen:
+        # Una instantánea atrasada no describe el estado actual
+        return
+
+    # El usuario se guarda como '' cuando no se conoce para que forme parte de la clave
+    current = {(proc.get("name") or "unknown", proc.get("username") or "") for proc in processes}
+    indexed = {tuple(row) for row in db.session.query(ProcessIndexEntry.name, ProcessIndexEntry.username).filter(
+        ProcessIndexEntry.server_id == server_id
+    )}
+
+    vanished = indexed - current
+    if vanished:
+        db.session.execute(delete(ProcessIndexEntry.__table__).where(
+            ProcessIndexEntry.__table__.c.server_id == server_id,
+            tuple_(ProcessIndexEntry.__table__.c.name, ProcessIndexEntry.__table__.c.username).in_(list(vanished))
+        ))
+    bulk_insert(ProcessIndexEntry, [
+        {"server_id": server_id, "name": name, "username": username, "first_seen": timestamp}
+        for name, username in current - indexed
+    ])
+
+
+def search_processes(name: Optional[str] = None, username: Optional[str] = None,
+                     prefix: Optional[str] = None, seen_since: Optional[datetime.datetime] = None,
+                     limit: int = 1000) -> List[Dict[str, Any]]:
+    """
+    Busca los servidores cuyo estado actual incluye un proceso o usuario.
+
+    Args:
+        name: Nombre exacto del proceso
+        username: Usuario exacto
+        prefix: Prefijo del nombre del proceso
+        seen_since: Solo servidores vistos desde esta marca de tiempo
+        limit: Máximo de resultados
+
+    Returns:
+        Lista de coincidencias (IP, proceso, usuario, desde cuándo y última vez visto),
+        de los servidores vistos más recientemente a los más antiguos
+    """
+    query = db.session.query(
+        Server.ip_address, Server.last_seen,
+        ProcessIndexEntry.name, ProcessIndexEntry.username, ProcessIndexEntry.first_seen
+    ).join(Server, Server.id == ProcessIndexEntry.server_id)
+    if name:
+        query = query.filter(ProcessIndexEntry.name == name)
+    if prefix:
+        query = query.filter(ProcessIndexEntry.name.startswith(prefix, autoescape=True))
+    if username:
+        query = query.filter(ProcessIndexEntry.username == username)
+    if seen_since is not None:
+        query = query.filter(Server.last_seen >= seen_since)
+    rows = query.order_by(Server.last_seen.desc(), Server.ip_address, ProcessIndexEntry.name).limit(limit).all()
+    return [
+        {
+            "ip_address": row.ip_address,
+            "name": row.name,
+            "username": row.username or None,
+            "running_since": row.first_seen.isoformat(),
+            "last_seen": row.last_seen.isoformat()
+        }
+        for row in rows
+    ]
@@ -0,0 +1,94 @@
+"""
+Almacenamiento de procesos como intervalos de vida (PROCESS_STORAGE=interval)
+------------------------------------------------------------------------------
+En lugar de guardar la lista completa de procesos en cada instantánea, cada
+(server, pid, name, username) se guarda una sola vez como un intervalo:
+- Una ingesta solo abre los intervalos de procesos nuevos y cierra los que desaparecieron
+- Los procesos en ejecución en un instante T se reconstruyen con first_seen <= T < ended_at
+"""
+
+import datetime
+import logging
+from typing import Dict, Any, List, Optional
+
+from sqlalchemy import update, or_
+
+from models import db, ProcessInterval
+from bulk_insert import bulk_insert
+
+logger = logging.getLogger(__name__)
+
+
+def _process_key(proc_data: Dict[str, Any]) -> tuple:
+    """Clave que identifica a un proceso dentro de un servidor."""
+    return (proc_data.get("pid", 0), proc_data.get("name", "unknown"), proc_data.get("username"))
+
+
+def update_process_intervals(server_id: int, previous_seen: Optional[datetime.datetime],
+                             timestamp: datetime.datetime, processes: List[Dict[str, Any]]) -> None:
+    """
+    Aplica una instantánea sobre los intervalos abiertos del servidor, dentro de la
+    transacción actual.
+
+    Args:
+        server_id: Id del servidor
+        previous_seen: Marca de tiempo de la instantánea anterior del servidor (None si es la primera)
+        timestamp: Marca de tiempo de esta instantánea
+        processes: Lista de procesos de la instantánea
+    """
+    if previous_seen is not None and timestamp <= previous_seen:
+        # El diff solo es válido contra la instantánea inmediatamente anterior
+        logger.warning(f"Instantánea fuera de orden para el servidor {server_id} ({timestamp}); "
+                       f"se omiten sus procesos")
+        return
+
+    open_intervals = db.session.query(
+        ProcessInterval.id, ProcessInterval.pid, ProcessInterval.name, ProcessInterval.username
+    ).filter(
+        ProcessInterval.server_id == server_id,
+        ProcessInterval.ended_at.is_(None)
+    ).all()
+    open_by_key = {(row.pid, row.name, row.username): row.id for row in open_intervals}
+
+    current = {_process_key(proc_data) for proc_data in processes}
+
+    # Cerrar los intervalos de procesos que ya no aparecen
+    vanished_ids = [interval_id for key, interval_id in open_by_key.items() if key not in current]
+    if vanished_ids:
+        db.session.execute(
+            update(ProcessInterval.__table__)
+            .where(ProcessInterval.__table__.c.id.in_(vanished_ids))
+            .values(ended_at=timestamp, last_seen=previous_seen)
+        )
+
+    # Abrir intervalos para los procesos nuevos
+    bulk_insert(ProcessInterval, [
+        {
+            "server_id": server_id,
+            "pid": pid,
+            "name": name,
+            "username": username,
+            "first_seen": timestamp,
+            "last_seen": timestamp,
+            "ended_at": None
+        }
+        for pid, name, username in current if (pid, name, username) not in open_by_key
+    ])
+
+
+def processes_at(server_id: int, at: datetime.datetime) -> List[ProcessInterval]:
+    """
+    Reconstruye los procesos en ejecución en un instante dado.
+
+    Args:
+        server_id: Id del servidor
+        at: Instante a consultar
+
+    Returns:
+        Intervalos de los procesos vigentes en la última instantánea anterior o igual a `at`
+    """
+    return ProcessInterval.query.filter(
+        ProcessInterval.server_id == server_id,
+        ProcessInterval.first_seen <= at,
+        or_(ProcessInterval.ended_at.is_(None), ProcessInterval.ended_at > at)
+    ).order_by(ProcessInterval.pid).all()
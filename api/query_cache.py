@@ -0,0 +1,142 @@
+"""
+Caché de respuestas de /query/<ip_address> para la API de Recolección de Información de Sistemas
+-------------------------------------------------------------------------------------------------
+Guarda la respuesta ya serializada, con su ETag, por IP y parámetros de consulta:
+- LRU acotada por número de entradas y con vencimiento (TTL)
+- Cada respuesta guarda la versión de los datos de la IP (servers.data_version, que toda
+  ingesta incrementa en la misma sentencia que actualiza last_seen) y solo se sirve
+  mientras esa versión no cambie: una instantánea recibida por cualquier proceso de la
+  API invalida la respuesta en todos, a costa de una lectura por clave única
+- El proceso que almacena la instantánea además descarta enseguida las respuestas de esa IP
+- Permite responder 304 a If-None-Match sin volver a consultar ni serializar
+"""
+
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Set, Tuple
+
+
+class CachedResponse:
+    """Respuesta serializada guardada en la caché."""
+
+    __slots__ = ("body", "status", "etag", "version", "expires_at")
+
+    def __init__(self, body: bytes, status: int, etag: str, version: Optional[int], expires_at: float):
+        self.body = body
+        self.status = status
+        self.etag = etag
+        self.version = version
+        self.expires_at = expires_at
+
+
+class QueryCache:
+    """Caché LRU con TTL de respuestas serializadas, validadas por versión de los datos de la IP."""
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 60.0):
+        """
+        Inicializar la caché.
+
+        Args:
+            max_entries: Máximo de respuestas guardadas (0 desactiva la caché)
+            ttl: Segundos de validez de cada respuesta
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple, CachedResponse]" = OrderedDict()
+        self._keys_by_ip: Dict[str, Set[Tuple]] = {}
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "stale": 0, "invalidations": 0, "evictions": 0}
+
+    @property
+    def enabled(self) -> bool:
+        """Indica si la caché está activa."""
+        return self.max_entries > 0
+
+    @staticmethod
+    def make_etag(body: bytes) -> str:
+        """ETag fuerte derivado del contenido de la respuesta."""
+        return hashlib.sha1(body).hexdigest()
+
+    def _remove(self, key: Tuple) -> None:
+        """Elimina una entrada (requiere tener el lock)."""
+        self._entries.pop(key, None)
+        keys = self._keys_by_ip.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_ip[key[0]]
+
+    def get(self, key: Tuple, version: Optional[int]) -> Optional[CachedResponse]:
+        """
+        Obtener una respuesta vigente.
+
+        Args:
+            key: Clave (ip, parámetros de consulta)
+            version: Versión actual de los datos de la IP (None si el servidor no existe)
+
+        Returns:
+            Respuesta guardada, o None si no existe, venció o se calculó con otra versión
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires_at < time.monotonic() or entry.version != version:
+                if entry is not None:
+                    self._remove(key)
+                    if entry.version != version:
+                        self._counters["stale"] += 1
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return entry
+
+    def put(self, key: Tuple, body: bytes, status: int, version: Optional[int]) -> CachedResponse:
+        """
+        Guardar una respuesta serializada.
+
+        Args:
+            key: Clave (ip, parámetros de consulta); key[0] debe ser la IP
+            body: Cuerpo de la respuesta
+            status: Código HTTP
+            version: Versión de los datos de la IP leída antes de consultarlos; si cambió
+                mientras tanto, la respuesta guardada deja de servirse en el siguiente get
+
+        Returns:
+            Entrada creada (con su ETag)
+        """
+        entry = CachedResponse(body, status, self.make_etag(body), version, time.monotonic() + self.ttl)
+        if not self.enabled:
+            return entry
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = entry
+            self._keys_by_ip.setdefault(key[0], set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._counters["evictions"] += 1
+        return entry
+
+    def invalidate_ip(self, ip_address: str) -> None:
+        """
+        Eliminar todas las respuestas guardadas de una IP en este proceso (los demás las
+        descartan al ver la nueva versión).
+
+        Args:
+            ip_address: IP cuya información cambió
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            for key in list(self._keys_by_ip.get(ip_address, ())):
+                self._remove(key)
+                self._counters["invalidations"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de la caché."""
+        with self._lock:
+            return dict(self._counters, entries=len(self._entries), max_entries=self.max_entries)
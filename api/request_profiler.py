@@ -0,0 +1,126 @@
+"""
+Perfilador por muestreo de solicitudes lentas
+---------------------------------------------
+Opcional (SLOW_REQUEST_MS > 0). Un hilo toma cada PROFILE_SAMPLE_MS milisegundos la pila de
+los hilos que están atendiendo una solicitud (sys._current_frames, sin instrumentar el
+código). Al terminar una solicitud que tardó al menos SLOW_REQUEST_MS, sus muestras se
+agrupan en pilas "plegadas" (formato de flamegraph.pl / speedscope: marco;marco;marco N),
+se registran en el log y se guardan las últimas PROFILE_KEEP en memoria para /debug/slow-requests.
+Las solicitudes rápidas solo pagan el alta y la baja en un diccionario.
+"""
+
+import sys
+import time
+import logging
+import threading
+from collections import Counter, deque
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Marcos por pila y pilas distintas guardadas por solicitud lenta
+MAX_STACK_DEPTH = 64
+MAX_STACKS_PER_REPORT = 30
+
+
+class ActiveRequest:
+    """Solicitud en curso y sus muestras de pila."""
+
+    __slots__ = ("started", "samples")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.samples: Counter = Counter()
+
+
+def fold_stack(frame) -> str:
+    """Pila de un hilo en formato plegado, de la raíz al marco actual."""
+    names = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SlowRequestProfiler:
+    """Muestrea las pilas de las solicitudes en curso y reporta las lentas."""
+
+    def __init__(self, threshold_ms: float, sample_ms: float = 10.0, keep: int = 20):
+        """
+        Inicializar el perfilador.
+
+        Args:
+            threshold_ms: Duración mínima (ms) de una solicitud para reportarla
+            sample_ms: Milisegundos entre muestras
+            keep: Cantidad de reportes recientes guardados en memoria
+        """
+        self.threshold = threshold_ms / 1000
+        self.interval = sample_ms / 1000
+        self._active: Dict[int, ActiveRequest] = {}
+        self._reports: "deque[Dict[str, Any]]" = deque(maxlen=keep)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Inicia el hilo de muestreo (una vez por proceso)."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+        logger.info(f"Perfilador de solicitudes lentas activo (umbral {self.threshold * 1000:.0f} ms)")
+
+    def _run(self) -> None:
+        own_thread = threading.get_ident()
+        while True:
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, active in self._active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None and thread_id != own_thread:
+                        active.samples[fold_stack(frame)] += 1
+            del frames
+
+    def begin(self) -> None:
+        """Registra el inicio de una solicitud en el hilo actual."""
+        with self._lock:
+            self._active[threading.get_ident()] = ActiveRequest()
+
+    def end(self, description: str) -> Optional[Dict[str, Any]]:
+        """
+        Registra el fin de la solicitud del hilo actual.
+
+        Args:
+            description: Método y ruta de la solicitud
+
+        Returns:
+            Reporte de la solicitud si superó el umbral, o None
+        """
+        with self._lock:
+            active = self._active.pop(threading.get_ident(), None)
+        if active is None:
+            return None
+        elapsed = time.perf_counter() - active.started
+        if elapsed < self.threshold:
+            return None
+
+        report = {
+            "request": description,
+            "duration_ms": round(elapsed * 1000, 1),
+            "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime()),
+            "samples": sum(active.samples.values()),
+            "sample_ms": self.interval * 1000,
+            "stacks": [f"{stack} {count}" for stack, count in active.samples.most_common(MAX_STACKS_PER_REPORT)]
+        }
+        with self._lock:
+            self._reports.append(report)
+        logger.warning(f"Solicitud lenta: {description} en {report['duration_ms']} ms "
+                       f"({report['samples']} muestras)\n" + "\n".join(report["stacks"][:5]))
+        return report
+
+    def reports(self) -> List[Dict[str, Any]]:
+        """Reportes recientes, del más nuevo al más antiguo."""
+        with self._lock:
+            return list(reversed(self._reports))
@@ -1,5 +1,17 @@
 -- Schema para base de datos normalizada del sistema de relevamiento
 -- PostgreSQL
+--
+-- Las tablas de telemetría (snapshots, os_info, processor_info, processes y
+-- logged_users) están particionadas por rango de timestamp. maintenance.py crea
+-- las particiones por adelantado y aplica la retención eliminando particiones;
+-- la partición DEFAULT recibe las filas fuera de las particiones creadas.
+-- La clave primaria incluye timestamp, como exige PostgreSQL en tablas particionadas,
+-- y snapshot_id no es una clave foránea porque snapshots también está particionada.
+--
+-- os_info, processor_info y logged_users guardan versiones: una fila (o un conjunto de
+-- usuarios) solo cuando el contenido cambia, vigente desde timestamp hasta valid_to
+-- (NULL mientras es la versión actual). servers.static_state guarda el hash de cada versión
+-- vigente para detectar los cambios en la ingesta.
 
 -- Servidores monitoreados
 CREATE TABLE IF NOT EXISTS servers (
@@ -7,57 +19,180 @@ CREATE TABLE IF NOT EXISTS servers (
     ip_address VARCHAR(50) NOT NULL,
     first_seen TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     last_seen TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    static_state JSON,
+    data_version BIGINT NOT NULL DEFAULT 0,
     CONSTRAINT unique_ip UNIQUE (ip_address)
 );
 
+-- Instantáneas recibidas (las filas de las tablas siguientes la referencian)
+CREATE TABLE IF NOT EXISTS snapshots (
+    id SERIAL,
+    server_id INTEGER NOT NULL,
+    timestamp TIMESTAMP NOT NULL,
+    process_count INTEGER NOT NULL DEFAULT 0,
+    user_count INTEGER NOT NULL DEFAULT 0,
+    cpu_percent FLOAT,
+    PRIMARY KEY (id, timestamp),
+    FOREIGN KEY (server_id) REFERENCES servers(id) ON DELETE CASCADE
+) PARTITION BY RANGE (timestamp);
+CREATE TABLE IF NOT EXISTS snapshots_default PARTITION OF snapshots DEFAULT;
+
 -- Información del sistema operativo
 CREATE TABLE IF NOT EXISTS os_info (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     server_id INTEGER NOT NULL,
+    snapshot_id INTEGER,
     timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     system VARCHAR(100),
     release VARCHAR(100),
     version VARCHAR(255),
     platform VARCHAR(255),
+    valid_to TIMESTAMP,
+    PRIMARY KEY (id, timestamp),
     FOREIGN KEY (server_id) REFERENCES servers(id) ON DELETE CASCADE
-);
+) PARTITION BY RANGE (timestamp);
+CREATE TABLE IF NOT EXISTS os_info_default PARTITION OF os_info DEFAULT;
 
 -- Información del procesador
 CREATE TABLE IF NOT EXISTS processor_info (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     server_id INTEGER NOT NULL,
+    snapshot_id INTEGER,
     timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     cpu_count INTEGER,
     model VARCHAR(255),
     cpu_percent FLOAT,
+    valid_to TIMESTAMP,
+    PRIMARY KEY (id, timestamp),
     FOREIGN KEY (server_id) REFERENCES servers(id) ON DELETE CASCADE
-);
+) PARTITION BY RANGE (timestamp);
+CREATE TABLE IF NOT EXISTS processor_info_default PARTITION OF processor_info DEFAULT;
 
 -- Procesos en ejecución
 CREATE TABLE IF NOT EXISTS processes (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     server_id INTEGER NOT NULL,
+    snapshot_id INTEGER,
     timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     pid INTEGER NOT NULL,
     name VARCHAR(255) NOT NULL,
     username VARCHAR(100),
+    PRIMARY KEY (id, timestamp),
+    FOREIGN KEY (server_id) REFERENCES servers(id) ON DELETE CASCADE
+) PARTITION BY RANGE (timestamp);
+CREATE TABLE IF NOT EXISTS processes_default PARTITION OF processes DEFAULT;
+
+-- Tiempo de vida de procesos (PROCESS_STORAGE=interval)
+-- ended_at es la primera instantánea en la que el proceso ya no aparece (NULL si sigue en ejecución)
+CREATE TABLE IF NOT EXISTS process_intervals (
+    id SERIAL PRIMARY KEY,
+    server_id INTEGER NOT NULL,
+    pid INTEGER NOT NULL,
+    name VARCHAR(255) NOT NULL,
+    username VARCHAR(100),
+    first_seen TIMESTAMP NOT NULL,
+    last_seen TIMESTAMP NOT NULL,
+    ended_at TIMESTAMP,
+    FOREIGN KEY (server_id) REFERENCES servers(id) ON DELETE CASCADE
+);
+
+-- Estado actual de procesos por servidor: pares (proceso, usuario) de la última instantánea
+-- username vale '' si el agente no informó el usuario
+CREATE TABLE IF NOT EXISTS process_index (
+    server_id INTEGER NOT NULL,
+    name VARCHAR(255) NOT NULL,
+    username VARCHAR(100) NOT NULL DEFAULT '',
+    first_seen TIMESTAMP NOT NULL,
+    PRIMARY KEY (server_id, name, username),
     FOREIGN KEY (server_id) REFERENCES servers(id) ON DELETE CASCADE
 );
 
 -- Usuarios con sesión
 CREATE TABLE IF NOT EXISTS logged_users (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     server_id INTEGER NOT NULL,
+    snapshot_id INTEGER,
     timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     username VARCHAR(100) NOT NULL,
     terminal VARCHAR(100),
     host VARCHAR(255),
+    valid_to TIMESTAMP,
+    PRIMARY KEY (id, timestamp),
     FOREIGN KEY (server_id) REFERENCES servers(id) ON DELETE CASCADE
+) PARTITION BY RANGE (timestamp);
+CREATE TABLE IF NOT EXISTS logged_users_default PARTITION OF logged_users DEFAULT;
+
+-- Resumen horario de instantáneas, generado antes de eliminar particiones por retención
+CREATE TABLE IF NOT EXISTS snapshot_summaries (
+    id SERIAL PRIMARY KEY,
+    server_id INTEGER NOT NULL,
+    bucket TIMESTAMP NOT NULL,
+    snapshot_count INTEGER NOT NULL,
+    avg_process_count FLOAT,
+    max_process_count INTEGER,
+    avg_user_count FLOAT,
+    max_user_count INTEGER,
+    avg_cpu_percent FLOAT,
+    max_cpu_percent FLOAT,
+    FOREIGN KEY (server_id) REFERENCES servers(id) ON DELETE CASCADE,
+    CONSTRAINT unique_summary_bucket UNIQUE (server_id, bucket)
 );
 
+-- Uso de CPU agregado por servidor e intervalo ('1m', '1h', '1d'), actualizado en cada ingesta
+CREATE TABLE IF NOT EXISTS cpu_rollups (
+    server_id INTEGER NOT NULL,
+    resolution VARCHAR(4) NOT NULL,
+    bucket TIMESTAMP NOT NULL,
+    sample_count INTEGER NOT NULL,
+    cpu_sum FLOAT NOT NULL,
+    cpu_min FLOAT NOT NULL,
+    cpu_max FLOAT NOT NULL,
+    PRIMARY KEY (server_id, resolution, bucket),
+    FOREIGN KEY (server_id) REFERENCES servers(id) ON DELETE CASCADE
+);
+
+-- Histograma de CPU de cada intervalo (bins de 5 puntos porcentuales) para calcular percentiles
+CREATE TABLE IF NOT EXISTS cpu_rollup_bins (
+    server_id INTEGER NOT NULL,
+    resolution VARCHAR(4) NOT NULL,
+    bucket TIMESTAMP NOT NULL,
+    bin SMALLINT NOT NULL,
+    sample_count INTEGER NOT NULL,
+    PRIMARY KEY (server_id, resolution, bucket, bin),
+    FOREIGN KEY (server_id) REFERENCES servers(id) ON DELETE CASCADE
+);
+
+-- Bases creadas antes de la tabla snapshots (las filas anteriores quedan con snapshot_id NULL)
+ALTER TABLE os_info ADD COLUMN IF NOT EXISTS snapshot_id INTEGER;
+ALTER TABLE processor_info ADD COLUMN IF NOT EXISTS snapshot_id INTEGER;
+ALTER TABLE processes ADD COLUMN IF NOT EXISTS snapshot_id INTEGER;
+ALTER TABLE logged_users ADD COLUMN IF NOT EXISTS snapshot_id INTEGER;
+
+-- Bases creadas antes del versionado de las secciones estáticas (las filas anteriores
+-- quedan con valid_to NULL y se leen como una versión por instantánea)
+ALTER TABLE servers ADD COLUMN IF NOT EXISTS static_state JSON;
+ALTER TABLE servers ADD COLUMN IF NOT EXISTS data_version BIGINT NOT NULL DEFAULT 0;
+-- (un idx_snapshots_server_time ya existente no incluye cpu_percent: recrearlo para que
+-- find_snapshots siga resolviéndose solo con el índice)
+ALTER TABLE snapshots ADD COLUMN IF NOT EXISTS cpu_percent FLOAT;
+ALTER TABLE os_info ADD COLUMN IF NOT EXISTS valid_to TIMESTAMP;
+ALTER TABLE processor_info ADD COLUMN IF NOT EXISTS valid_to TIMESTAMP;
+ALTER TABLE logged_users ADD COLUMN IF NOT EXISTS valid_to TIMESTAMP;
+
 -- Índices para optimizar consultas
 CREATE INDEX IF NOT EXISTS idx_server_ip ON servers(ip_address);
+CREATE INDEX IF NOT EXISTS idx_servers_last_seen ON servers(last_seen, id);
+CREATE INDEX IF NOT EXISTS idx_servers_ip_pattern ON servers(ip_address text_pattern_ops);
 CREATE INDEX IF NOT EXISTS idx_processes_server_time ON processes(server_id, timestamp);
 CREATE INDEX IF NOT EXISTS idx_os_info_server_time ON os_info(server_id, timestamp);
 CREATE INDEX IF NOT EXISTS idx_processor_server_time ON processor_info(server_id, timestamp);
 CREATE INDEX IF NOT EXISTS idx_users_server_time ON logged_users(server_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_process_intervals_server_open ON process_intervals(server_id, ended_at);
+CREATE INDEX IF NOT EXISTS idx_process_intervals_server_first ON process_intervals(server_id, first_seen);
+CREATE INDEX IF NOT EXISTS idx_snapshots_server_time ON snapshots(server_id, timestamp) INCLUDE (id, process_count, user_count, cpu_percent);
+CREATE INDEX IF NOT EXISTS idx_processes_snapshot ON processes(snapshot_id);
+CREATE INDEX IF NOT EXISTS idx_users_snapshot ON logged_users(snapshot_id);
+CREATE INDEX IF NOT EXISTS idx_process_index_name ON process_index(name text_pattern_ops, username);
+CREATE INDEX IF NOT EXISTS idx_process_index_user ON process_index(username);
+CREATE INDEX IF NOT EXISTS idx_cpu_rollups_resolution_bucket ON cpu_rollups(resolution, bucket);
+CREATE INDEX IF NOT EXISTS idx_cpu_rollup_bins_resolution_bucket ON cpu_rollup_bins(resolution, bucket);
@@ -0,0 +1,129 @@
+"""
+Resolución de servidores en la ingesta
+--------------------------------------
+Cada instantánea necesita el id de su servidor y la marca de tiempo de la instantánea
+anterior. En lugar de buscar el servidor y luego insertarlo o actualizarlo con el ORM:
+- Una caché LRU acotada (local a cada proceso) guarda ip -> server_id; con un acierto,
+  un solo UPDATE por id actualiza last_seen
+- Con un fallo, un solo INSERT ... ON CONFLICT (ip_address) DO UPDATE ... RETURNING crea
+  el servidor o actualiza el existente; dos primeros reportes simultáneos de una IP nueva
+  ya no fallan por la restricción unique_ip
+
+La caché evita además el UPSERT en régimen estable: en PostgreSQL cada conflicto consume
+un valor de la secuencia de servers.id.
+"""
+
+import datetime
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+from sqlalchemy import select, update, func, literal
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import db, Server
+
+
+class ServerIdCache:
+    """Caché LRU ip -> server_id, segura entre hilos."""
+
+    def __init__(self, max_entries: int = 100000):
+        """
+        Inicializar la caché.
+
+        Args:
+            max_entries: Máximo de IPs guardadas (0 desactiva la caché)
+        """
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, ip_address: str) -> Optional[int]:
+        """Id del servidor de una IP, o None si no está en la caché."""
+        with self._lock:
+            server_id = self._entries.get(ip_address)
+            if server_id is None:
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(ip_address)
+            self._counters["hits"] += 1
+            return server_id
+
+    def put(self, ip_address: str, server_id: int) -> None:
+        """Guardar el id del servidor de una IP, descartando la menos usada si hace falta."""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[ip_address] = server_id
+            self._entries.move_to_end(ip_address)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def discard(self, ip_address: str) -> None:
+        """Olvidar una IP (por ejemplo, si su servidor ya no existe)."""
+        with self._lock:
+            self._entries.pop(ip_address, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de la caché."""
+        with self._lock:
+            return dict(self._counters, entries=len(self._entries), max_entries=self.max_entries)
+
+
+def _previous_seen(ip_address: str) -> Any:
+    """Expresión para RETURNING con el last_seen del servidor antes de la sentencia."""
+    query = select(Server.__table__.c.last_seen).where(Server.__table__.c.ip_address == ip_address)
+    if db.engine.dialect.name == 'postgresql':
+        # Las subconsultas de RETURNING ven los datos del inicio de la sentencia
+        return query.scalar_subquery()
+    # SQLite las evalúa después de escribir: se lee antes (es local, sin viaje de red)
+    return literal(db.session.execute(query).scalar(), db.DateTime)
+
+
+def touch_server(cache: ServerIdCache, ip_address: str,
+                 timestamp: datetime.datetime) -> Tuple[int, Optional[datetime.datetime], Optional[Dict[str, Any]]]:
+    """
+    Registra una instantánea de una IP en servers, dentro de la transacción actual.
+
+    Crea el servidor si no existe; si existe, lleva last_seen a la marca de tiempo más
+    reciente entre la guardada y la de esta instantánea e incrementa data_version. La fila queda bloqueada hasta
+    el fin de la transacción, de modo que static_state no cambia mientras se usa.
+
+    Args:
+        cache: Caché ip -> server_id
+        ip_address: IP del agente
+        timestamp: Marca de tiempo de la instantánea
+
+    Returns:
+        Tupla (server_id, last_seen anterior, static_state), con None en los dos últimos
+        si el servidor es nuevo
+    """
+    table = Server.__table__
+    greatest = func.greatest if db.engine.dialect.name == 'postgresql' else func.max
+
+    server_id = cache.get(ip_address)
+    if server_id is not None:
+        row = db.session.execute(
+            update(table)
+            .where(table.c.id == server_id)
+            .values(last_seen=greatest(table.c.last_seen, timestamp), data_version=table.c.data_version + 1)
+            .returning(table.c.id, _previous_seen(ip_address).label("previous_seen"), table.c.static_state)
+        ).first()
+        if row is not None:
+            return row.id, row.previous_seen, row.static_state
+        # El servidor se eliminó o su alta se revirtió: volver al UPSERT
+        cache.discard(ip_address)
+
+    dialect = postgresql if db.engine.dialect.name == 'postgresql' else sqlite
+    stmt = dialect.insert(table).values(ip_address=ip_address, first_seen=timestamp, last_seen=timestamp)
+    row = db.session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["ip_address"],
+            set_={"last_seen": greatest(table.c.last_seen, stmt.excluded.last_seen),
+                  "data_version": table.c.data_version + 1}
+        ).returning(table.c.id, _previous_seen(ip_address).label("previous_seen"), table.c.static_state)
+    ).one()
+    cache.put(ip_address, row.id)
+    return row.id, row.previous_seen, row.static_state
@@ -0,0 +1,131 @@
+"""
+Listado paginado de servidores para la API de Recolección de Información de Sistemas
+-------------------------------------------------------------------------------------
+- Paginación por cursor (keyset) sobre (last_seen, id), del más reciente al más antiguo:
+  cada página es una búsqueda en idx_servers_last_seen sin OFFSET
+- Filtros por última actividad, prefijo de IP o red CIDR (IPv4) y familia de S.O.
+"""
+
+import json
+import base64
+import datetime
+import ipaddress
+from typing import Dict, Any, Optional, Tuple
+
+from sqlalchemy import select, tuple_, or_, func, exists
+
+from models import Server, OSInfo
+
+
+class ListingError(ValueError):
+    """Parámetro inválido en el listado de servidores."""
+
+
+def encode_cursor(server: Dict[str, Any]) -> str:
+    """
+    Cursor opaco que apunta al último servidor de una página.
+
+    Args:
+        server: Último servidor devuelto (Server.to_dict())
+
+    Returns:
+        Cursor en base64 (URL-safe)
+    """
+    raw = json.dumps([server["last_seen"], server["id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime.datetime, int]:
+    """
+    Decodifica un cursor generado por encode_cursor.
+
+    Args:
+        cursor: Cursor recibido en ?cursor=
+
+    Returns:
+        Tupla (last_seen, id) del último servidor de la página anterior
+
+    Raises:
+        ListingError: Si el cursor no es válido
+    """
+    try:
+        last_seen, server_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.datetime.fromisoformat(last_seen), int(server_id)
+    except (ValueError, TypeError):
+        raise ListingError("Parámetro 'cursor' inválido")
+
+
+def ip_condition(ip_filter: str) -> Any:
+    """
+    Traduce el filtro de IP a una condición sobre servers.ip_address.
+
+    Un valor sin '/' es un prefijo literal ("10.0."). Una red CIDR IPv4 se expande a
+    los prefijos de octeto que la cubren (/16 es un solo prefijo y /20 son 16), que
+    se comparan con LIKE 'prefijo%'.
+
+    Args:
+        ip_filter: Prefijo o red CIDR
+
+    Returns:
+        Condición de SQLAlchemy, o None si no filtra nada (0.0.0.0/0)
+
+    Raises:
+        ListingError: Si la red no es una red IPv4 válida
+    """
+    if "/" not in ip_filter:
+        return Server.ip_address.startswith(ip_filter, autoescape=True)
+    try:
+        network = ipaddress.ip_network(ip_filter, strict=False)
+    except ValueError:
+        raise ListingError("Parámetro 'ip' inválido, use un prefijo o una red CIDR")
+    if network.version != 4:
+        raise ListingError("Parámetro 'ip': solo se admiten redes CIDR IPv4")
+    if network.prefixlen == 32:
+        return Server.ip_address == str(network.network_address)
+    # Llevar la red al límite de octeto siguiente y cortar las direcciones en ese octeto
+    octets = -(-network.prefixlen // 8)
+    if octets == 0:
+        return None
+    return or_(*[
+        Server.ip_address.startswith(".".join(str(subnet.network_address).split(".")[:octets]) + ".")
+        for subnet in network.subnets(new_prefix=octets * 8)
+    ])
+
+
+def servers_page_query(limit: int, cursor: Optional[str] = None,
+                       seen_since: Optional[datetime.datetime] = None,
+                       ip_filter: Optional[str] = None, os_family: Optional[str] = None) -> Any:
+    """
+    Construye la consulta de una página de servidores.
+
+    Se piden limit + 1 filas: si llega la fila extra hay una página siguiente.
+
+    Args:
+        limit: Servidores por página
+        cursor: Cursor de la página anterior (None para la primera)
+        seen_since: Solo servidores con last_seen >= esta marca de tiempo
+        ip_filter: Prefijo de IP o red CIDR IPv4
+        os_family: Familia de S.O. (valor de os_info.system, sin distinguir mayúsculas)
+
+    Returns:
+        Sentencia SELECT de SQLAlchemy
+
+    Raises:
+        ListingError: Si algún parámetro es inválido
+    """
+    query = select(Server)
+    if cursor:
+        last_seen, server_id = decode_cursor(cursor)
+        query = query.where(tuple_(Server.last_seen, Server.id) < tuple_(last_seen, server_id))
+    if seen_since is not None:
+        query = query.where(Server.last_seen >= seen_since)
+    if ip_filter:
+        condition = ip_condition(ip_filter)
+        if condition is not None:
+            query = query.where(condition)
+    if os_family:
+        query = query.where(exists().where(
+            OSInfo.server_id == Server.id,
+            func.lower(OSInfo.system) == os_family.lower()
+        ))
+    return query.order_by(Server.last_seen.desc(), Server.id.desc()).limit(limit + 1)
@@ -0,0 +1,160 @@
+"""
+Versionado de las secciones estáticas de las instantáneas
+---------------------------------------------------------
+La información del S.O., el modelo y la cantidad de CPUs y casi siempre el conjunto de
+usuarios conectados se repiten idénticos en cada instantánea. En lugar de guardar una
+fila por instantánea:
+- Cada ingesta calcula el hash de cada sección y lo compara con el de la versión vigente,
+  guardado en servers.static_state (lo devuelve touch_server, sin consultas adicionales)
+- Solo cuando el contenido cambia se cierra la versión vigente (valid_to) y se insertan
+  las filas de la nueva, vigente desde la marca de tiempo de la instantánea
+- El contenido en un instante T es la última versión con timestamp <= T cuyas filas
+  tienen valid_to NULL o posterior a T
+
+Una instantánea atrasada (anterior al comienzo de la versión vigente) no crea versiones.
+Las filas anteriores al versionado (una por instantánea, con valid_to NULL) se leen con la
+misma regla: cada una es una versión que dura hasta la siguiente.
+"""
+
+import bisect
+import hashlib
+import json
+import datetime
+from typing import Dict, Any, List, Optional
+
+from sqlalchemy import update, func
+
+from models import db, Server, OSInfo, ProcessorInfo, LoggedUser
+from bulk_insert import bulk_insert
+
+
+def _os_rows(data: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+    os_info = data.get("os_info")
+    if not isinstance(os_info, dict) or not os_info:
+        return None
+    return [{key: os_info.get(key) for key in ("system", "release", "version", "platform")}]
+
+
+def _processor_rows(data: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+    processor = data.get("processor")
+    if not isinstance(processor, dict) or not processor:
+        return None
+    # cpu_percent cambia en cada instantánea: se guarda en snapshots, no en la versión
+    return [{"cpu_count": processor.get("cpu_count"), "model": processor.get("model")}]
+
+
+def _user_rows(data: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+    users = data.get("logged_in_users")
+    if not isinstance(users, list):
+        return None
+    return [
+        {"username": user.get("username", "unknown"), "terminal": user.get("terminal"), "host": user.get("host")}
+        for user in users
+    ]
+
+
+# Clave en servers.static_state -> (modelo, filas de la sección en una instantánea)
+SECTIONS = {
+    "os_info": (OSInfo, _os_rows),
+    "processor_info": (ProcessorInfo, _processor_rows),
+    "logged_users": (LoggedUser, _user_rows),
+}
+
+
+def section_hash(rows: List[Dict[str, Any]]) -> str:
+    """Hash del contenido de una sección, independiente del orden de las filas."""
+    encoded = sorted(json.dumps(row, sort_keys=True, default=str) for row in rows)
+    return hashlib.blake2b("\n".join(encoded).encode("utf-8"), digest_size=8).hexdigest()
+
+
+def update_static_sections(server_id: int, snapshot_id: int, timestamp: datetime.datetime,
+                           data: Dict[str, Any], static_state: Optional[Dict[str, Any]]) -> int:
+    """
+    Guarda una versión nueva de cada sección estática que cambió, dentro de la transacción actual.
+
+    Si alguna cambió, actualiza servers.static_state sin modificar servers.last_seen.
+
+    Args:
+        server_id: Id del servidor
+        snapshot_id: Id de la instantánea (referenciado por las filas de las versiones nuevas)
+        timestamp: Marca de tiempo de la instantánea
+        data: Datos de información del sistema
+        static_state: servers.static_state devuelto por touch_server (None si el servidor es nuevo)
+
+    Returns:
+        Cantidad de secciones con una versión nueva
+    """
+    state = dict(static_state or {})
+    changed = 0
+    for key, (model, extract) in SECTIONS.items():
+        rows = extract(data)
+        if rows is None:
+            continue
+        digest = section_hash(rows)
+        current = state.get(key)
+        if current is not None:
+            current_hash, since = current[0], datetime.datetime.fromisoformat(current[1])
+            if digest == current_hash or timestamp <= since:
+                # Sin cambios, o instantánea atrasada: no se reescribe el historial de versiones
+                continue
+            table = model.__table__
+            db.session.execute(
+                update(table)
+                .where(table.c.server_id == server_id, table.c.valid_to.is_(None), table.c.timestamp >= since)
+                .values(valid_to=timestamp)
+            )
+        bulk_insert(model, [
+            dict(row, server_id=server_id, snapshot_id=snapshot_id, timestamp=timestamp) for row in rows
+        ])
+        state[key] = [digest, timestamp.isoformat()]
+        changed += 1
+
+    if changed:
+        # last_seen se asigna a sí misma para que no se aplique el onupdate de la columna (hora
+        # actual, con zona): touch_server ya la llevó a la marca de tiempo de la instantánea, y
+        # sin esto cada cambio de una sección la adelantaría a la hora de la ingesta
+        table = Server.__table__
+        db.session.execute(
+            update(table).where(table.c.id == server_id).values(static_state=state, last_seen=table.c.last_seen)
+        )
+    return changed
+
+
+def users_by_snapshot(server_id: int, snapshots: List[Any]) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Reconstruye los usuarios conectados en cada instantánea a partir de las versiones.
+
+    Args:
+        server_id: Id del servidor
+        snapshots: Instantáneas devueltas por find_snapshots
+
+    Returns:
+        Diccionario marca de tiempo ISO -> usuarios como diccionarios
+    """
+    first = min(snap.timestamp for snap in snapshots)
+    last = max(snap.timestamp for snap in snapshots)
+    # Comienzo de la versión vigente en la primera instantánea
+    start = db.session.query(func.max(LoggedUser.timestamp)).filter(
+        LoggedUser.server_id == server_id,
+        LoggedUser.timestamp <= first
+    ).scalar() or first
+
+    versions: Dict[datetime.datetime, List[Any]] = {}
+    for row in LoggedUser.query.filter(
+        LoggedUser.server_id == server_id,
+        LoggedUser.timestamp.between(start, last)
+    ).order_by(LoggedUser.timestamp, LoggedUser.id):
+        versions.setdefault(row.timestamp, []).append(row)
+    starts = sorted(versions)
+
+    grouped = {}
+    for snap in snapshots:
+        # user_count distingue una instantánea sin usuarios (no deja filas) de una versión sin cambios
+        index = bisect.bisect_right(starts, snap.timestamp) - 1
+        if not snap.user_count or index < 0:
+            continue
+        users = [row.to_dict() for row in versions[starts[index]]
+                 if row.valid_to is None or row.valid_to > snap.timestamp]
+        if users:
+            grouped[snap.timestamp.isoformat()] = users
+    return grouped
@@ -0,0 +1,45 @@
+"""
+Validación de instantáneas para la API de Recolección de Información de Sistemas
+--------------------------------------------------------------------------------
+Reglas compartidas por /collect y /collect/batch.
+"""
+
+import datetime
+from datetime import timezone
+from typing import Dict, Any, Optional
+
+# Campos que toda instantánea debe incluir
+REQUIRED_FIELDS = ["ip_address", "processor", "processes", "logged_in_users", "os_info"]
+
+
+def validate_snapshot(data: Any) -> Optional[str]:
+    """
+    Valida una instantánea recibida de un agente.
+
+    Args:
+        data: Documento JSON decodificado
+
+    Returns:
+        Mensaje de error, o None si la instantánea es válida
+    """
+    if not isinstance(data, dict):
+        return "La solicitud debe ser un objeto JSON"
+    for field in REQUIRED_FIELDS:
+        if field not in data:
+            return f"Campo requerido faltante: {field}"
+    return None
+
+
+def apply_defaults(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Completa los campos opcionales de una instantánea válida.
+
+    Args:
+        data: Instantánea validada
+
+    Returns:
+        La misma instantánea, con timestamp (UTC) si no estaba presente
+    """
+    if "timestamp" not in data:
+        data["timestamp"] = datetime.datetime.now(timezone.utc).isoformat()
+    return data
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Control de admisión de /collect ante una ráfaga de reinicio de la flota.
+
+Uso:
+  python benchmarks/bench_admission.py --database-url postgresql+psycopg2://postgres@localhost/sysinfo
+  python benchmarks/bench_admission.py --agents 300 --threads 64 --limits 0,4,8
+
+--agents agentes envían su instantánea en el mismo instante a un gunicorn de 1 worker con
+--threads hilos (un hilo por solicitud, como el servidor de Flask) y un pool de 5+5
+conexiones con DB_POOL_TIMEOUT=2. Cada agente reintenta como SystemInfoAgent: respeta
+Retry-After (multiplicado por --time-scale para acortar la prueba) o espera de forma
+exponencial con jitter ante errores sin Retry-After, hasta 10 intentos con timeout de 10 s.
+Para cada INGEST_MAX_CONCURRENCY de --limits (0 = sin límite) se informa el tiempo hasta
+que todos quedaron guardados, los códigos de los primeros intentos, los intentos totales
+y la latencia de las solicitudes, y las instantáneas de más en la base de datos (intentos
+que el agente dio por fallidos por timeout pero la API terminó de guardar).
+"""
+
+import argparse
+import http.client
+import json
+import random
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from sqlalchemy import create_engine, text  # noqa: E402
+
+from bench_serving import API_SECRET, free_port, start_server  # noqa: E402
+from payloads import make_snapshot  # noqa: E402
+
+MAX_ATTEMPTS = 10
+REQUEST_TIMEOUT = 10
+
+
+def count_snapshots(database_url: str) -> int:
+    """Instantáneas guardadas."""
+    engine = create_engine(database_url)
+    try:
+        with engine.connect() as conn:
+            return conn.execute(text("SELECT count(*) FROM snapshots")).scalar()
+    finally:
+        engine.dispose()
+
+
+def run_burst(port: int, agents: int, processes: int, time_scale: float) -> dict:
+    """Ráfaga de `agents` agentes con reintentos; devuelve los resultados."""
+    bodies = [json.dumps(make_snapshot(f"10.90.{i // 250}.{i % 250 + 1}", processes, seed=i)).encode("utf-8")
+              for i in range(agents)]
+    headers = {"Content-Type": "application/json", "Authorization": f"ApiKey {API_SECRET}"}
+    barrier = threading.Barrier(agents)
+    lock = threading.Lock()
+    first_status, statuses, latencies, done_at = Counter(), Counter(), [], []
+
+    def agent(i: int):
+        rng = random.Random(i)
+        barrier.wait()
+        for attempt in range(MAX_ATTEMPTS):
+            started = time.perf_counter()
+            retry_after = None
+            try:
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=REQUEST_TIMEOUT)
+                conn.request("POST", "/collect", body=bodies[i], headers=headers)
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+                retry_after = response.getheader("Retry-After")
+                conn.close()
+            except (OSError, http.client.HTTPException, socket.timeout):
+                status = -1
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                statuses[status] += 1
+                if attempt == 0:
+                    first_status[status] += 1
+            if status in (200, 201, 202):
+                with lock:
+                    done_at.append(time.perf_counter())
+                return
+            delay = float(retry_after) if retry_after else rng.uniform(0, min(60, 2 ** (attempt + 1)))
+            time.sleep(delay * time_scale)
+
+    threads = [threading.Thread(target=agent, args=(i,)) for i in range(agents)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    latencies.sort()
+    return {
+        "stored": len(done_at),
+        "seconds": (max(done_at) - started) if done_at else float("nan"),
+        "first": first_status,
+        "attempts": sum(statuses.values()),
+        "p50": latencies[len(latencies) // 2],
+        "p99": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url", required=True, help="URL SQLAlchemy de PostgreSQL")
+    parser.add_argument("--agents", type=int, default=200, help="Agentes en la ráfaga")
+    parser.add_argument("--processes", type=int, default=150, help="Procesos por instantánea")
+    parser.add_argument("--threads", type=int, default=64, help="Hilos de gunicorn")
+    parser.add_argument("--limits", default="0,8", help="Valores de INGEST_MAX_CONCURRENCY")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="Factor aplicado a las esperas de los agentes")
+    args = parser.parse_args()
+
+    print(f"{args.agents} agentes, gunicorn 1 worker x {args.threads} hilos, pool 5+5 (timeout 2 s)")
+    print(f"{'límite':>7} {'guardadas':>10} {'segundos':>9} {'1er intento':>34} {'intentos':>9} "
+          f"{'p50 ms':>8} {'p99 ms':>8} {'duplicadas':>11}")
+    for limit in map(int, args.limits.split(",")):
+        tmpdir = tempfile.mkdtemp(prefix="bench_admission_")
+        port = free_port()
+        server = start_server(args.database_url, 1, args.threads, port, tmpdir,
+                              INGEST_MAX_CONCURRENCY=str(limit), DB_POOL_SIZE="5", DB_MAX_OVERFLOW="5",
+                              DB_POOL_TIMEOUT="2")
+        try:
+            before = count_snapshots(args.database_url)
+            result = run_burst(port, args.agents, args.processes, args.time_scale)
+        finally:
+            server.terminate()
+            server.wait(timeout=60)
+            shutil.rmtree(tmpdir, ignore_errors=True)
+        duplicates = count_snapshots(args.database_url) - before - result["stored"]
+        first = " ".join(f"{status}:{count}" for status, count in sorted(result["first"].items()))
+        print(f"{limit or 'no':>7} {result['stored']:>10} {result['seconds']:>9,.1f} {first:>34} "
+              f"{result['attempts']:>9} {result['p50'] * 1000:>8,.0f} {result['p99'] * 1000:>8,.0f} {duplicates:>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Costo de una recolección del agente: recolectores anteriores (bloqueantes, en serie) frente a
+SystemInfoAgent.collect_all_info con cada motor de recolección (/proc y psutil).
+
+Uso:
+  python benchmarks/bench_agent_collect.py
+  python benchmarks/bench_agent_collect.py --extra-processes 500 --iterations 10
+
+--extra-processes inicia procesos "sleep" para simular un host con muchos procesos. Se informa
+la mediana del tiempo real y de CPU por recolección, el porcentaje de un núcleo que
+representa ese costo con intervalos de 60 y 300 segundos, y el arranque en frío de cada motor
+(un intérprete nuevo que importa el agente y crea SystemInfoAgent, sin la primera recolección).
+"""
+
+import argparse
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "portable_agent"))
+
+import psutil  # noqa: E402
+from system_info_agent import SystemInfoAgent, ProcCollector, PsutilCollector  # noqa: E402
+
+COLD_START = """
+import sys, time
+start = time.perf_counter()
+sys.path.insert(0, {path!r})
+import system_info_agent as agent
+agent.SystemInfoAgent("http://127.0.0.1:9", agent.select_collector({collector!r}))
+print((time.perf_counter() - start) * 1000, "psutil" in sys.modules, "requests" in sys.modules)
+"""
+
+
+def legacy_collect(ip_address: str) -> dict:
+    """Recolección como la hacía el agente antes (cpu_percent(interval=1) y cpu_freq() x3)."""
+    processes = []
+    for proc in psutil.process_iter(['pid', 'name', 'username', 'memory_percent', 'cpu_percent']):
+        try:
+            info = proc.info
+            processes.append({
+                "pid": info["pid"], "name": info["name"], "username": info["username"],
+                "memory_percent": round(info["memory_percent"] or 0.0, 2), "cpu_percent": info["cpu_percent"]
+            })
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            pass
+    return {
+        "ip_address": ip_address,
+        "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+        "processor": {
+            "physical_cores": psutil.cpu_count(logical=False),
+            "logical_cores": psutil.cpu_count(logical=True),
+            "cpu_percent": psutil.cpu_percent(interval=1),
+            "cpu_freq": {
+                "current": getattr(psutil.cpu_freq(), "current", 0),
+                "min": getattr(psutil.cpu_freq(), "min", 0),
+                "max": getattr(psutil.cpu_freq(), "max", 0)
+            },
+            "architecture": platform.machine(),
+            "processor": platform.processor()
+        },
+        "processes": processes,
+        "logged_in_users": [{"username": user.name} for user in psutil.users()],
+        "os_info": {"system": platform.system(), "release": platform.release(),
+                    "version": platform.version(), "platform": platform.platform()}
+    }
+
+
+def measure(func, iterations: int):
+    """Medianas de tiempo real y de CPU (ms) de `iterations` ejecuciones."""
+    wall, cpu = [], []
+    for _ in range(iterations):
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        func()
+        wall.append((time.perf_counter() - wall_start) * 1000)
+        cpu.append((time.process_time() - cpu_start) * 1000)
+    return statistics.median(wall), statistics.median(cpu)
+
+
+def cold_start(collector: str, runs: int = 5):
+    """Mediana (ms) del arranque en frío y módulos pesados importados, en intérpretes nuevos."""
+    times = []
+    for _ in range(runs):
+        output = subprocess.check_output([
+            sys.executable, "-c", COLD_START.format(path=str(ROOT / "portable_agent"), collector=collector)
+        ], text=True).split()
+        times.append(float(output[0]))
+    return statistics.median(times), output[1] == "True", output[2] == "True"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--extra-processes", type=int, default=500, help="Procesos 'sleep' adicionales")
+    parser.add_argument("--iterations", type=int, default=10, help="Recolecciones por caso")
+    args = parser.parse_args()
+
+    sleepers = [subprocess.Popen(["sleep", "600"]) for _ in range(args.extra_processes)]
+    try:
+        agents = {name: SystemInfoAgent("http://127.0.0.1:9", collector())
+                  for name, collector in (("proc", ProcCollector), ("psutil", PsutilCollector))}
+        for agent in agents.values():
+            # La primera recolección espera la ventana mínima de CPU_SAMPLE_SECONDS; no se mide
+            agent.collect_all_info()
+        cases = [
+            ("anterior (en serie, bloqueante)", lambda: legacy_collect(agents["psutil"].system_ip)),
+            ("collect_all_info (proc)", agents["proc"].collect_all_info),
+            ("collect_all_info (psutil)", agents["psutil"].collect_all_info),
+        ]
+        print(f"Procesos en el host: {len(psutil.pids())}  CPUs: {psutil.cpu_count()}  "
+              f"recolecciones por caso: {args.iterations}")
+        print(f"{'recolector':<32} {'real ms':>9} {'CPU ms':>8} {'% núcleo @60s':>14} {'% núcleo @300s':>15}")
+        for name, func in cases:
+            wall_ms, cpu_ms = measure(func, args.iterations)
+            print(f"{name:<32} {wall_ms:>9,.1f} {cpu_ms:>8,.1f} {cpu_ms / 600:>14,.3f} {cpu_ms / 3000:>15,.4f}")
+
+        print()
+        print(f"{'arranque en frío':<32} {'ms':>9} {'importa psutil':>15} {'importa requests':>17}")
+        for collector in ("proc", "psutil"):
+            start_ms, uses_psutil, uses_requests = cold_start(collector)
+            print(f"{collector:<32} {start_ms:>9,.1f} {'sí' if uses_psutil else 'no':>15} "
+                  f"{'sí' if uses_requests else 'no':>17}")
+    finally:
+        for sleeper in sleepers:
+            sleeper.kill()
+            sleeper.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Importación de los archivos de respaldo: reenvío a /collect de a una instantánea frente a
+api/backfill.py (pool de procesos + lotes con COPY).
+
+Uso:
+  python benchmarks/bench_backfill.py --database-url postgresql+psycopg2://postgres@localhost/sysinfo
+  python benchmarks/bench_backfill.py --servers 50 --days 7 --per-day 96 --processes 150
+
+Escribe --servers x --days archivos <IP>_<YYYY-MM-DD>.jsonl con --per-day instantáneas de
+--processes procesos (sesiones estables, 2% de procesos reemplazados por instantánea) y mide:
+- Reenvío: las primeras --replay-sample instantáneas, en orden, con POST /collect secuenciales
+  a gunicorn (2 workers x 4 hilos)
+- backfill.py con --workers procesos de lectura y --batch-size instantáneas por transacción,
+  para el historial completo, y una segunda ejecución sin checkpoint (todo ya presente)
+Las tablas de la API se vacían antes de cada medición.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "api"))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from sqlalchemy import create_engine, inspect, text  # noqa: E402
+
+from bench_serving import API_SECRET, free_port, start_server  # noqa: E402
+from payloads import make_processes, make_snapshot  # noqa: E402
+from models import db  # noqa: E402
+
+
+def write_backups(data_dir: Path, servers: int, days: int, per_day: int, processes: int) -> int:
+    """Escribe los archivos de respaldo; devuelve la cantidad de instantáneas."""
+    data_dir.mkdir(parents=True, exist_ok=True)
+    base = datetime.now(timezone.utc).replace(tzinfo=None, hour=0, minute=0, second=0, microsecond=0) \
+        - timedelta(days=days)
+    fleet = []
+    for i in range(servers):
+        rng = random.Random(i)
+        first = make_snapshot(f"10.60.{i // 250}.{i % 250 + 1}", processes, seed=i)
+        fleet.append((first, make_processes(processes, rng), rng))
+    total = 0
+    for day in range(days):
+        for first, procs, rng in fleet:
+            timestamp = base + timedelta(days=day)
+            path = data_dir / f"{first['ip_address']}_{timestamp:%Y-%m-%d}.jsonl"
+            with open(path, "w") as f:
+                for n in range(per_day):
+                    for _ in range(int(len(procs) * 0.02 + rng.random())):
+                        procs[rng.randrange(len(procs))] = make_processes(1, rng)[0]
+                    snapshot = dict(first, processes=procs,
+                                    timestamp=(timestamp + timedelta(minutes=1440 * n / per_day)).isoformat())
+                    snapshot["processor"] = dict(first["processor"], cpu_percent=round(rng.random() * 100, 1))
+                    f.write(json.dumps(snapshot, separators=(",", ":")) + "\n")
+                    total += 1
+    return total
+
+
+def clear_tables(database_url: str) -> None:
+    """Vacía las tablas de la API (conserva el esquema y las particiones)."""
+    engine = create_engine(database_url)
+    try:
+        existing = set(inspect(engine).get_table_names())
+        tables = [table.name for table in db.metadata.sorted_tables if table.name in existing]
+        with engine.begin() as conn:
+            if engine.dialect.name == "postgresql":
+                conn.execute(text(f"TRUNCATE {', '.join(tables)} RESTART IDENTITY CASCADE"))
+            else:
+                for name in reversed(tables):
+                    conn.execute(text(f'DELETE FROM "{name}"'))
+    finally:
+        engine.dispose()
+
+
+def count_snapshots(database_url: str) -> int:
+    """Instantáneas guardadas."""
+    engine = create_engine(database_url)
+    try:
+        with engine.connect() as conn:
+            return conn.execute(text("SELECT count(*) FROM snapshots")).scalar()
+    finally:
+        engine.dispose()
+
+
+def replay(data_dir: Path, database_url: str, sample: int, tmpdir: str) -> float:
+    """Segundos para reenviar las primeras `sample` instantáneas a /collect, de a una."""
+    records = []
+    for path in sorted(data_dir.glob("*.jsonl"), key=lambda p: (p.stem.rsplit("_", 1)[1], p.stem)):
+        with open(path) as f:
+            records.extend(f.readlines())
+        if len(records) >= sample:
+            break
+    port = free_port()
+    server = start_server(database_url, 2, 4, port, tmpdir)
+    try:
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        headers = {"Content-Type": "application/json", "Authorization": f"ApiKey {API_SECRET}"}
+        started = time.perf_counter()
+        for line in records[:sample]:
+            conn.request("POST", "/collect", body=line.encode("utf-8"), headers=headers)
+            response = conn.getresponse()
+            response.read()
+            if response.status >= 300:
+                raise RuntimeError(f"/collect respondió {response.status}")
+        return time.perf_counter() - started
+    finally:
+        server.terminate()
+        server.wait(timeout=120)
+
+
+def run_backfill(data_dir: Path, database_url: str, workers: int, batch_size: int, tmpdir: str) -> float:
+    """Segundos de una ejecución de backfill.py sobre el directorio (sin checkpoint previo)."""
+    checkpoint = Path(tmpdir) / "checkpoint.json"
+    checkpoint.unlink(missing_ok=True)
+    env = dict(os.environ, API_SECRET=API_SECRET, MAINTENANCE_INTERVAL="0")
+    started = time.perf_counter()
+    subprocess.run([sys.executable, str(ROOT / "api" / "backfill.py"), "--database-url", database_url,
+                    "--data-dir", str(data_dir), "--checkpoint", str(checkpoint), "--workers", str(workers),
+                    "--batch-size", str(batch_size), "--progress-seconds", "3600"],
+                   cwd=tmpdir, env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url", default=None, help="URL SQLAlchemy (SQLite temporal por defecto)")
+    parser.add_argument("--servers", type=int, default=20, help="Servidores")
+    parser.add_argument("--days", type=int, default=5, help="Días de historial")
+    parser.add_argument("--per-day", type=int, default=96, help="Instantáneas por servidor y día")
+    parser.add_argument("--processes", type=int, default=150, help="Procesos por instantánea")
+    parser.add_argument("--replay-sample", type=int, default=500, help="Instantáneas reenviadas a /collect")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Procesos de lectura de backfill.py")
+    parser.add_argument("--batch-size", type=int, default=500, help="Instantáneas por transacción de backfill.py")
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix="bench_backfill_")
+    database_url = args.database_url or f"sqlite:///{tmpdir}/bench.db"
+    data_dir = Path(tmpdir) / "data"
+    try:
+        total = write_backups(data_dir, args.servers, args.days, args.per_day, args.processes)
+        size = sum(path.stat().st_size for path in data_dir.iterdir()) / 2**20
+        print(f"Base de datos: {database_url.split(':')[0].split('+')[0]}  CPUs: {os.cpu_count()}  "
+              f"{total} instantáneas de {args.processes} procesos en {args.servers * args.days} archivos "
+              f"({size:,.0f} MiB)")
+        print(f"{'método':<34} {'instantáneas':>13} {'segundos':>9} {'instantáneas/s':>15}")
+
+        clear_tables(database_url)
+        sample = min(args.replay_sample, total)
+        elapsed = replay(data_dir, database_url, sample, tmpdir)
+        print(f"{'reenvío a /collect (secuencial)':<34} {sample:>13} {elapsed:>9,.1f} {sample / elapsed:>15,.1f}")
+
+        clear_tables(database_url)
+        elapsed = run_backfill(data_dir, database_url, args.workers, args.batch_size, tmpdir)
+        imported = count_snapshots(database_url)
+        print(f"{'backfill.py':<34} {imported:>13} {elapsed:>9,.1f} {imported / elapsed:>15,.1f}")
+
+        elapsed = run_backfill(data_dir, database_url, args.workers, args.batch_size, tmpdir)
+        print(f"{'backfill.py (todo ya presente)':<34} {total:>13} {elapsed:>9,.1f} {total / elapsed:>15,.1f}")
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Lectura de los archivos de respaldo en /query/<ip>: lista completa en memoria (anterior)
+frente a lectura en streaming acotada por fechas.
+
+Uso:
+  python benchmarks/bench_backup_read.py
+  python benchmarks/bench_backup_read.py --days 30,90,180 --per-day 24 --processes 150
+
+Para cada historial se escriben --days archivos <IP>_<YYYY-MM-DD>.jsonl con --per-day
+instantáneas y se mide, con el cliente de pruebas de Flask y sin base de datos, el pico de
+memoria (tracemalloc) y el tiempo de la respuesta completa sin rango, y el tiempo de una
+consulta de un día (?from=&to=).
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "api"))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from payloads import make_snapshot  # noqa: E402
+
+IP = "10.70.0.1"
+
+
+def measure(func):
+    """Segundos y pico de memoria (MiB) de una llamada."""
+    tracemalloc.start()
+    started = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--days", default="30,90", help="Días de historial a medir")
+    parser.add_argument("--per-day", type=int, default=24, help="Instantáneas por día")
+    parser.add_argument("--processes", type=int, default=100, help="Procesos por instantánea")
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix="bench_backup_read_")
+    os.chdir(tmpdir)
+    os.environ.update(DATABASE_URL=f"sqlite:///{tmpdir}/bench.db", API_SECRET="bench", MAINTENANCE_INTERVAL="0")
+    import api_server
+    api_server.setup_app(start_background=False)
+    client = api_server.app.test_client()
+    data_dir = Path(tmpdir) / "data"
+    base = datetime(2026, 1, 1)
+
+    def drain(path):
+        response = client.get(path, buffered=False)
+        for _ in response.response:
+            pass
+        response.close()
+
+    print(f"{'días':>5} {'MiB en disco':>13} {'lista: s':>9} {'lista: pico MiB':>16} "
+          f"{'streaming: s':>13} {'streaming: pico MiB':>20} {'un día: ms':>11}")
+    try:
+        written = 0
+        for days in map(int, args.days.split(",")):
+            for day in range(written, days):
+                timestamp = base + timedelta(days=day)
+                with open(data_dir / f"{IP}_{timestamp:%Y-%m-%d}.jsonl", "w") as f:
+                    for n in range(args.per_day):
+                        snapshot = make_snapshot(IP, args.processes, seed=n,
+                                                 timestamp=timestamp + timedelta(hours=24 * n / args.per_day))
+                        f.write(json.dumps(snapshot, separators=(",", ":")) + "\n")
+            written = days
+            size = sum(path.stat().st_size for path in data_dir.glob(f"{IP}_*")) / 2**20
+
+            # Anterior: todos los registros en una lista y la respuesta serializada completa
+            list_s, list_peak = measure(lambda: json.dumps(
+                {"status": "success", "data": api_server.backup_store.read(IP)}))
+            stream_s, stream_peak = measure(lambda: drain(f"/query/{IP}"))
+            middle = base + timedelta(days=days // 2)
+            day_s, _ = measure(lambda: drain(f"/query/{IP}?from={middle:%Y-%m-%dT%H:%M:%S}"
+                                             f"&to={middle + timedelta(days=1):%Y-%m-%dT%H:%M:%S}"))
+            print(f"{days:>5} {size:>13,.1f} {list_s:>9,.2f} {list_peak:>16,.1f} "
+                  f"{stream_s:>13,.2f} {stream_peak:>20,.2f} {day_s * 1000:>11,.1f}")
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Throughput de ingesta: una solicitud a /collect por instantánea frente a /collect/batch
+con distintos tamaños de lote.
+
+Uso:
+  python benchmarks/bench_batch_ingest.py --database-url postgresql+psycopg2://...
+  python benchmarks/bench_batch_ingest.py --snapshots 200 --processes 300 --batch-sizes 10,100
+
+Las solicitudes se hacen con el cliente de pruebas de Flask (sin red), de modo que se
+mide el costo de la API y de la base de datos por instantánea.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "api"))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from payloads import make_snapshot  # noqa: E402
+
+API_SECRET = "bench-secret"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url", default=None, help="URL SQLAlchemy (SQLite temporal por defecto)")
+    parser.add_argument("--snapshots", type=int, default=200, help="Instantáneas por caso")
+    parser.add_argument("--processes", type=int, default=300, help="Procesos por instantánea")
+    parser.add_argument("--batch-sizes", default="10,100", help="Tamaños de lote para /collect/batch")
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix="bench_batch_")
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tmpdir}/bench.db"
+    os.environ["API_SECRET"] = API_SECRET
+    os.chdir(tmpdir)
+
+    import api_server as api
+    api.setup_app()
+    client = api.app.test_client()
+    headers = {"Authorization": f"ApiKey {API_SECRET}"}
+
+    with api.app.app_context():
+        dialect = api.db.engine.dialect.name
+    print(f"Base de datos: {dialect}  instantáneas: {args.snapshots}  procesos: {args.processes}")
+    print(f"{'modo':<22} {'instantáneas/s':>15} {'filas/s':>12}")
+
+    cases = [("/collect (1 por POST)", 1)] + \
+        [(f"/collect/batch ({n})", n) for n in map(int, args.batch_sizes.split(","))]
+    for case_number, (name, batch_size) in enumerate(cases):
+        snapshots = [
+            make_snapshot(f"10.{case_number}.{i // 250}.{i % 250}", args.processes, seed=i)
+            for i in range(args.snapshots)
+        ]
+        start = time.perf_counter()
+        if batch_size == 1:
+            for snapshot in snapshots:
+                assert client.post("/collect", json=snapshot, headers=headers).status_code == 201
+        else:
+            for i in range(0, len(snapshots), batch_size):
+                response = client.post("/collect/batch", json=snapshots[i:i + batch_size], headers=headers)
+                assert response.status_code == 201, response.json
+        elapsed = time.perf_counter() - start
+        rows = sum(len(s["processes"]) + len(s["logged_in_users"]) + 2 for s in snapshots)
+        print(f"{name:<22} {args.snapshots / elapsed:>15,.1f} {rows / elapsed:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
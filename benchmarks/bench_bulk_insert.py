@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark de store_data_in_db: un objeto ORM por fila (ruta anterior) frente a la
+inserción masiva (executemany y, en PostgreSQL, COPY).
+
+Uso:
+  python benchmarks/bench_bulk_insert.py --database-url postgresql+psycopg2://...
+  python benchmarks/bench_bulk_insert.py            # SQLite temporal
+
+Informa filas/segundo (procesos + usuarios) para instantáneas de 100, 1k y 5k procesos.
+"""
+
+import argparse
+import datetime
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "api"))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from payloads import make_snapshot  # noqa: E402
+
+
+def legacy_store_data_in_db(api, data):
+    """Réplica de la ruta anterior: un objeto ORM y un db.session.add() por fila."""
+    db = api.db
+    timestamp = datetime.datetime.fromisoformat(data["timestamp"])
+    server = api.Server.query.filter_by(ip_address=data["ip_address"]).first()
+    if not server:
+        server = api.Server(ip_address=data["ip_address"], first_seen=timestamp, last_seen=timestamp)
+        db.session.add(server)
+    else:
+        server.last_seen = timestamp
+    db.session.add(api.OSInfo(server=server, timestamp=timestamp, **data["os_info"]))
+    db.session.add(api.ProcessorInfo(server=server, timestamp=timestamp,
+                                     cpu_percent=data["processor"]["cpu_percent"]))
+    for proc in data["processes"]:
+        db.session.add(api.Process(server=server, timestamp=timestamp, pid=proc["pid"],
+                                   name=proc["name"], username=proc["username"]))
+    for user in data["logged_in_users"]:
+        db.session.add(api.LoggedUser(server=server, timestamp=timestamp, username=user["username"],
+                                      terminal=user["terminal"], host=user["host"]))
+    db.session.commit()
+    return True
+
+
+def run_case(api, store, size, repeats, tag):
+    """Almacena `repeats` instantáneas de `size` procesos y devuelve filas/segundo."""
+    snapshots = [
+        make_snapshot(f"10.{size % 250}.{i}.{hash(tag) % 250}", size, seed=i)
+        for i in range(repeats)
+    ]
+    rows = sum(len(s["processes"]) + len(s["logged_in_users"]) for s in snapshots)
+    with api.app.app_context():
+        start = time.perf_counter()
+        for snapshot in snapshots:
+            if not store(snapshot):
+                raise RuntimeError("store_data_in_db devolvió False")
+        elapsed = time.perf_counter() - start
+    return rows / elapsed, elapsed / repeats * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url", default=None, help="URL SQLAlchemy (SQLite temporal por defecto)")
+    parser.add_argument("--sizes", default="100,1000,5000", help="Tamaños de instantánea (procesos)")
+    parser.add_argument("--repeats", type=int, default=5, help="Instantáneas por caso")
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix="bench_bulk_")
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tmpdir}/bench.db"
+    os.chdir(tmpdir)
+
+    import api_server as api
+    import bulk_insert
+
+    with api.app.app_context():
+        api.db.create_all()
+        dialect = api.db.engine.dialect.name
+
+    is_postgres = dialect == "postgresql"
+    modes = [("orm (anterior)", lambda d: legacy_store_data_in_db(api, d), None),
+             ("executemany", api.store_data_in_db, 10 ** 9)]
+    if is_postgres:
+        modes.append(("copy", api.store_data_in_db, 0))
+
+    print(f"Base de datos: {dialect}  repeticiones: {args.repeats}")
+    print(f"{'procesos':>9} {'modo':<16} {'filas/s':>12} {'ms/instantánea':>15}")
+    for size in [int(s) for s in args.sizes.split(",")]:
+        for name, store, threshold in modes:
+            if threshold is not None:
+                bulk_insert.COPY_THRESHOLD = threshold
+            rate, ms = run_case(api, store, size, args.repeats, name)
+            print(f"{size:>9} {name:<16} {rate:>12,.0f} {ms:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Exportación de la telemetría: lectura por servidor con el ORM y to_dict() (como /query)
+frente a /export en streaming (COPY TO STDOUT en PostgreSQL).
+
+Uso:
+  python benchmarks/bench_export.py --database-url postgresql+psycopg2://postgres@localhost/sysinfo
+  python benchmarks/bench_export.py --servers 50 --snapshots 48 --processes 150
+
+Carga --servers x --snapshots instantáneas de --processes procesos en la última hora y mide,
+con el cliente de pruebas de Flask, el tiempo y el pico de memoria de Python (tracemalloc,
+en una segunda ejecución) de exportar la tabla processes completa:
+- ORM: una consulta por servidor, to_dict() por fila y json.dumps de la lista
+- /export en CSV, NDJSON y CSV con gzip
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "api"))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from payloads import make_snapshot  # noqa: E402
+
+
+def measure(func):
+    """Segundos de una llamada (sin tracemalloc) y pico de memoria (MiB) de otra."""
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url", default=None, help="URL SQLAlchemy (SQLite temporal por defecto)")
+    parser.add_argument("--servers", type=int, default=20, help="Servidores")
+    parser.add_argument("--snapshots", type=int, default=24, help="Instantáneas por servidor")
+    parser.add_argument("--processes", type=int, default=150, help="Procesos por instantánea")
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix="bench_export_")
+    os.chdir(tmpdir)
+    os.environ.update(DATABASE_URL=args.database_url or f"sqlite:///{tmpdir}/bench.db",
+                      API_SECRET="bench", MAINTENANCE_INTERVAL="0", QUERY_CACHE_SIZE="0")
+    import api_server
+    from models import Server, Process
+    api_server.setup_app(start_background=False)
+    client = api_server.app.test_client()
+    headers = {"Authorization": "ApiKey bench"}
+    end = datetime.now(timezone.utc).replace(tzinfo=None)
+    start = end - timedelta(hours=1)
+
+    try:
+        with api_server.app.app_context():
+            for i in range(args.servers):
+                ip = f"10.80.{i // 250}.{i % 250 + 1}"
+                api_server.store_batch_in_db([
+                    make_snapshot(ip, args.processes, seed=i * 1000 + n,
+                                  timestamp=start + timedelta(seconds=3000 * (n + 1) / (args.snapshots + 1)))
+                    for n in range(args.snapshots)
+                ])
+            rows = Process.query.filter(Process.timestamp >= start).count()
+            dialect = api_server.db.engine.dialect.name
+
+        def orm():
+            size = 0
+            with api_server.app.app_context():
+                for server in Server.query.all():
+                    size += len(json.dumps([process.to_dict() for process in Process.query.filter(
+                        Process.server_id == server.id, Process.timestamp >= start, Process.timestamp < end)]))
+                api_server.db.session.remove()
+            return size
+
+        def export(output_format, gzip=False):
+            def run():
+                response = client.get(f"/export?table=processes&format={output_format}"
+                                      f"&from={start.isoformat()}&to={end.isoformat()}",
+                                      headers=dict(headers, **({"Accept-Encoding": "gzip"} if gzip else {})),
+                                      buffered=False)
+                size = sum(len(chunk) for chunk in response.response)
+                response.close()
+                return size
+            return run
+
+        print(f"Base de datos: {dialect}  {rows} procesos de {args.servers * args.snapshots} instantáneas")
+        print(f"{'método':<30} {'segundos':>9} {'filas/s':>10} {'MiB enviados':>13} {'pico MiB':>9}")
+        for label, func in [("ORM + to_dict por servidor", orm),
+                            ("/export CSV", export("csv")),
+                            ("/export NDJSON", export("ndjson")),
+                            ("/export CSV + gzip", export("csv", gzip=True))]:
+            elapsed, peak, size = measure(func)
+            print(f"{label:<30} {elapsed:>9,.2f} {rows / elapsed:>10,.0f} {size / 2**20:>13,.1f} {peak:>9,.1f}")
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
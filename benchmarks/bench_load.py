@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga: N agentes simulados reportando a /collect con lectores concurrentes.
+
+Uso:
+  python benchmarks/bench_load.py --database-url postgresql+psycopg2://...
+  python benchmarks/bench_load.py --agents 500 --interval 10 --duration 60 --output resultados.json
+  python benchmarks/bench_load.py --compare anterior.json --output actual.json
+
+Se inicia gunicorn con api/gunicorn.conf.py (las variables de entorno de la API, como
+INGEST_MODE o PROCESS_STORAGE, se heredan del entorno) y se simula una flota:
+- Cada agente tiene su propia IP, una cantidad de procesos variable entre agentes (distribución
+  log-normal alrededor de --processes), un --churn de procesos reemplazados por reporte y
+  sesiones de usuario que cambian con el tiempo
+- Los agentes reportan cada --interval segundos, repartidos de forma uniforme dentro del
+  intervalo, con el mismo formato que el agente real (procesos en columnas y gzip); --interval 0
+  envía tan rápido como pueden los hilos escritores (capacidad máxima)
+- En paralelo, lectores consultan /query/<ip> de agentes ya registrados y recorren /servers
+  página por página
+
+Se informan solicitudes/s, latencias p50/p95/p99 por endpoint, el retraso de los reportes
+respecto de su horario (si crece, la instancia no sostiene esa flota), las filas escritas por
+tabla y la memoria (RSS) de gunicorn y sus workers. --output guarda el resultado en JSON y
+--compare muestra las diferencias con un resultado anterior.
+"""
+
+import argparse
+import gzip
+import heapq
+import http.client
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "benchmarks"))
+sys.path.insert(0, str(ROOT / "portable_agent"))
+sys.path.insert(0, str(ROOT / "api"))
+
+import psutil  # noqa: E402
+from sqlalchemy import create_engine, inspect, text  # noqa: E402
+
+from bench_serving import API_SECRET, free_port, start_server  # noqa: E402
+from payloads import USERNAMES, make_processes, make_snapshot  # noqa: E402
+from system_info_agent import to_columnar  # noqa: E402
+from models import db  # noqa: E402
+
+RSS_SAMPLE_SECONDS = 1.0
+SERVERS_PAGE = 100
+
+
+class SimulatedAgent:
+    """Agente simulado que conserva sus procesos entre reportes."""
+
+    def __init__(self, ip_address: str, median_processes: int, churn: float, rng: random.Random):
+        self.ip_address = ip_address
+        self.churn = churn
+        self.rng = rng
+        count = int(rng.lognormvariate(math.log(median_processes), 0.5))
+        self.processes = make_processes(max(5, min(count, median_processes * 20)), rng)
+        self.next_pid = max(proc["pid"] for proc in self.processes) + 1
+        self.next_terminal = 0
+        self.sessions = [self.new_session() for _ in range(rng.randint(0, 4))]
+
+    def new_session(self) -> Dict[str, Any]:
+        """Sesión nueva; se conserva igual en los reportes siguientes hasta que se cierra."""
+        self.next_terminal += 1
+        return {"username": self.rng.choice(USERNAMES), "terminal": f"pts/{self.next_terminal}",
+                "host": f"10.0.{self.rng.randint(0, 255)}.{self.rng.randint(1, 254)}"}
+
+    def next_snapshot(self, timestamp: datetime) -> Dict[str, Any]:
+        """Instantánea siguiente: reemplaza una fracción de procesos y, a veces, una sesión."""
+        for _ in range(int(len(self.processes) * self.churn + self.rng.random())):
+            proc = make_processes(1, self.rng)[0]
+            proc["pid"] = self.next_pid
+            self.next_pid += 1
+            self.processes[self.rng.randrange(len(self.processes))] = proc
+        for proc in self.processes:
+            proc["cpu_percent"] = round(self.rng.random() * 5, 1)
+        if self.rng.random() < 0.1:
+            if self.sessions and self.rng.random() < 0.5:
+                self.sessions.pop(self.rng.randrange(len(self.sessions)))
+            else:
+                self.sessions.append(self.new_session())
+
+        snapshot = make_snapshot(self.ip_address, 0, user_count=0, seed=self.rng.random(), timestamp=timestamp)
+        snapshot["processes"] = self.processes
+        snapshot["logged_in_users"] = [dict(session) for session in self.sessions]
+        return snapshot
+
+
+class Recorder:
+    """Latencias y códigos de estado de un endpoint, seguro entre hilos."""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.statuses: Counter = Counter()
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+
+    def add(self, status: Optional[int], latency_ms: float, bytes_sent: int = 0) -> None:
+        """Registrar una solicitud (status None si falló la conexión)."""
+        with self._lock:
+            self.statuses[str(status) if status is not None else "connection_error"] += 1
+            self.bytes_sent += bytes_sent
+            if status is not None and status < 400:
+                self.latencies.append(latency_ms)
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        """Solicitudes/s, percentiles de latencia (ms) y errores."""
+        with self._lock:
+            ok = len(self.latencies)
+            return dict(percentiles(self.latencies), requests=sum(self.statuses.values()), ok=ok,
+                        errors=sum(self.statuses.values()) - ok, rps=round(ok / elapsed, 2),
+                        statuses=dict(self.statuses), bytes_sent=self.bytes_sent)
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    """p50, p95, p99 y máximo (rango más cercano) de una lista de valores en ms."""
+    ordered = sorted(values)
+    if not ordered:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    pick = lambda q: round(ordered[min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1)], 2)  # noqa: E731
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "max": round(ordered[-1], 2)}
+
+
+def encode(snapshot: Dict[str, Any], wire: str) -> bytes:
+    """Cuerpo de /collect: como lo envía el agente (columnas + gzip) o JSON plano."""
+    if wire == "json":
+        return json.dumps(snapshot).encode("utf-8")
+    return gzip.compress(json.dumps(to_columnar(snapshot), separators=(",", ":")).encode("utf-8"), 6)
+
+
+def count_rows(database_url: str) -> Dict[str, Any]:
+    """Filas por tabla de la API y tamaño de la base de datos en bytes."""
+    engine = create_engine(database_url)
+    try:
+        existing = set(inspect(engine).get_table_names())
+        with engine.connect() as conn:
+            rows = {name: conn.execute(text(f'SELECT count(*) FROM "{name}"')).scalar()
+                    for name in sorted(db.metadata.tables) if name in existing}
+            if engine.dialect.name == "postgresql":
+                size = conn.execute(text("SELECT pg_database_size(current_database())")).scalar()
+            else:
+                size = os.path.getsize(engine.url.database)
+    finally:
+        engine.dispose()
+    return {"rows": rows, "bytes": size}
+
+
+def server_rss(pid: int) -> int:
+    """RSS en bytes del proceso principal de gunicorn más sus workers."""
+    try:
+        master = psutil.Process(pid)
+        return sum(proc.memory_info().rss for proc in [master] + master.children(recursive=True))
+    except psutil.Error:
+        return 0
+
+
+def run_load(args, port: int, server_pid: int) -> Dict[str, Any]:
+    """Ejecuta la carga durante args.duration segundos y devuelve las mediciones."""
+    rng = random.Random(args.seed)
+    agents = [SimulatedAgent(f"10.{60 + i // 65536}.{i // 256 % 256}.{i % 256}", args.processes,
+                             args.churn, random.Random(rng.random())) for i in range(args.agents)]
+    headers = {"Authorization": f"ApiKey {API_SECRET}", "Content-Type": "application/json"}
+    if args.wire == "agent":
+        headers["Content-Encoding"] = "gzip"
+
+    recorders = {"/collect": Recorder(), "/query": Recorder(), "/servers": Recorder()}
+    lags: List[float] = []
+    registered: List[str] = []
+    rss_samples: List[int] = []
+    # Horario de reportes: (vencimiento, índice del agente), repartidos dentro del intervalo
+    start = time.monotonic()
+    schedule = [(start + rng.random() * args.interval, i) for i in range(args.agents)]
+    heapq.heapify(schedule)
+    schedule_lock = threading.Lock()
+    stop_at = start + args.duration
+    # Las marcas de tiempo de las instantáneas avanzan con el reloj real de la prueba
+    base_time = datetime.now(timezone.utc).replace(tzinfo=None)
+    first_report = set()
+
+    def connect() -> http.client.HTTPConnection:
+        return http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+
+    def request(conn, recorder: Recorder, method: str, path: str, body: Optional[bytes] = None,
+                request_headers: Optional[Dict[str, str]] = None):
+        began = time.perf_counter()
+        try:
+            conn.request(method, path, body=body, headers=request_headers or {})
+            response = conn.getresponse()
+            payload = response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            recorder.add(None, 0.0)
+            return None
+        recorder.add(status, (time.perf_counter() - began) * 1000, len(body or b""))
+        return payload if status < 400 else None
+
+    def writer():
+        conn = connect()
+        while True:
+            with schedule_lock:
+                due, index = heapq.heappop(schedule)
+                # Los reportes atrasados que no se enviaron antes del final quedan sin enviar
+                if due >= stop_at or time.monotonic() >= stop_at:
+                    heapq.heappush(schedule, (due, index))
+                    break
+                heapq.heappush(schedule, (due + args.interval if args.interval else time.monotonic(), index))
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            now = time.monotonic()
+            if args.interval:
+                lags.append(max(0.0, now - due) * 1000)
+            agent = agents[index]
+            timestamp = base_time + timedelta(seconds=now - start)
+            body = encode(agent.next_snapshot(timestamp), args.wire)
+            if request(conn, recorders["/collect"], "POST", "/collect", body, headers) is not None \
+                    and agent.ip_address not in first_report:
+                first_report.add(agent.ip_address)
+                registered.append(agent.ip_address)
+        conn.close()
+
+    def query_reader(seed: int):
+        reader_rng = random.Random(seed)
+        conn = connect()
+        while time.monotonic() < stop_at:
+            if registered:
+                request(conn, recorders["/query"], "GET", f"/query/{reader_rng.choice(registered)}")
+            time.sleep(args.reader_pause)
+        conn.close()
+
+    def servers_reader():
+        conn = connect()
+        cursor = None
+        while time.monotonic() < stop_at:
+            path = f"/servers?limit={SERVERS_PAGE}" + (f"&cursor={cursor}" if cursor else "")
+            payload = request(conn, recorders["/servers"], "GET", path)
+            cursor = json.loads(payload).get("next_cursor") if payload else None
+            time.sleep(args.reader_pause)
+        conn.close()
+
+    def sample_rss():
+        while time.monotonic() < stop_at:
+            rss_samples.append(server_rss(server_pid))
+            time.sleep(RSS_SAMPLE_SECONDS)
+
+    threads = [threading.Thread(target=writer) for _ in range(args.writers)]
+    threads += [threading.Thread(target=query_reader, args=(args.seed + i,)) for i in range(args.query_readers)]
+    threads += [threading.Thread(target=servers_reader) for _ in range(args.servers_readers)]
+    threads.append(threading.Thread(target=sample_rss))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - start
+    rss_samples.append(server_rss(server_pid))
+
+    collect = recorders["/collect"].summary(elapsed)
+    return {
+        "elapsed_s": round(elapsed, 2),
+        "target_reports_per_s": round(args.agents / args.interval, 2) if args.interval else None,
+        "agents_registered": len(registered),
+        "endpoints": {name: recorder.summary(elapsed) for name, recorder in recorders.items()},
+        "schedule_lag_ms": percentiles(lags) if args.interval else None,
+        "snapshots_per_s": collect["rps"],
+        "server_rss_mib": {
+            "start": round(rss_samples[0] / 2**20, 1),
+            "end": round(rss_samples[-1] / 2**20, 1),
+            "peak": round(max(rss_samples) / 2**20, 1)
+        }
+    }
+
+
+def print_report(result: Dict[str, Any]) -> None:
+    """Resumen legible de un resultado."""
+    run = result["run"]
+    print(f"{'endpoint':<9} {'solic.':>7} {'errores':>8} {'solic./s':>9} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'máx ms':>8}")
+    for name, stats in run["endpoints"].items():
+        print(f"{name:<9} {stats['requests']:>7} {stats['errors']:>8} {stats['rps']:>9,.1f} {stats['p50']:>8,.1f} "
+              f"{stats['p95']:>8,.1f} {stats['p99']:>8,.1f} {stats['max']:>8,.1f}")
+    if run["schedule_lag_ms"] is not None:
+        lag = run["schedule_lag_ms"]
+        print(f"Instantáneas/s: {run['snapshots_per_s']:,.1f} de {run['target_reports_per_s']:,.1f} previstas; "
+              f"retraso respecto del horario p50/p99: {lag['p50']:,.0f} / {lag['p99']:,.0f} ms")
+    else:
+        print(f"Instantáneas/s (máximo): {run['snapshots_per_s']:,.1f}")
+    print(f"Agentes registrados: {run['agents_registered']} de {result['config']['agents']}")
+    rss = run["server_rss_mib"]
+    print(f"RSS de gunicorn (MiB) inicio/fin/pico: {rss['start']:,.1f} / {rss['end']:,.1f} / {rss['peak']:,.1f}")
+    database = result["database"]
+    written = ", ".join(f"{name} {rows:,}" for name, rows in database["rows_written"].items() if rows)
+    print(f"Filas escritas: {written or 'ninguna'}; tamaño de la base: +{database['bytes_written'] / 2**20:,.1f} MiB")
+
+
+def print_comparison(baseline: Dict[str, Any], result: Dict[str, Any]) -> None:
+    """Diferencias de throughput y latencia respecto de un resultado anterior."""
+    print(f"\nComparación con {baseline.get('version') or 'el resultado anterior'}:")
+    print(f"{'endpoint':<9} {'métrica':<8} {'anterior':>10} {'actual':>10} {'cambio':>8}")
+    for name, stats in result["run"]["endpoints"].items():
+        previous = baseline["run"]["endpoints"].get(name)
+        if previous is None:
+            continue
+        for metric in ("rps", "p50", "p95", "p99"):
+            before, after = previous[metric], stats[metric]
+            change = f"{(after - before) / before * 100:+.1f}%" if before else "-"
+            print(f"{name:<9} {metric:<8} {before:>10,.1f} {after:>10,.1f} {change:>8}")
+
+
+def git_version() -> Optional[str]:
+    """Commit del árbol medido (con -dirty si hay cambios sin confirmar)."""
+    try:
+        return subprocess.check_output(["git", "describe", "--always", "--dirty"], cwd=ROOT,
+                                       text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url", default=None, help="URL SQLAlchemy (SQLite temporal por defecto)")
+    parser.add_argument("--agents", type=int, default=200, help="Agentes simulados")
+    parser.add_argument("--interval", type=float, default=10, help="Segundos entre reportes de cada agente "
+                                                                   "(0 = tan rápido como sea posible)")
+    parser.add_argument("--duration", type=float, default=60, help="Segundos de carga")
+    parser.add_argument("--processes", type=int, default=150, help="Mediana de procesos por agente")
+    parser.add_argument("--churn", type=float, default=0.02, help="Fracción de procesos reemplazados por reporte")
+    parser.add_argument("--wire", choices=["agent", "json"], default="agent",
+                        help="Formato del cuerpo: el del agente (columnas + gzip) o JSON plano")
+    parser.add_argument("--writers", type=int, default=8, help="Hilos que envían los reportes")
+    parser.add_argument("--query-readers", type=int, default=2, help="Hilos que consultan /query/<ip>")
+    parser.add_argument("--servers-readers", type=int, default=1, help="Hilos que recorren /servers")
+    parser.add_argument("--reader-pause", type=float, default=0.2, help="Pausa (s) entre lecturas de cada lector")
+    parser.add_argument("--workers", type=int, default=2, help="Workers de gunicorn")
+    parser.add_argument("--threads", type=int, default=4, help="Hilos por worker")
+    parser.add_argument("--seed", type=int, default=1, help="Semilla de la flota simulada")
+    parser.add_argument("--output", default=None, help="Archivo JSON donde guardar el resultado")
+    parser.add_argument("--compare", default=None, help="Resultado JSON anterior con el que comparar")
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix="bench_load_")
+    args.database_url = args.database_url or f"sqlite:///{tmpdir}/bench.db"
+    started_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    port = free_port()
+    server = start_server(args.database_url, args.workers, args.threads, port, tmpdir)
+    try:
+        before = count_rows(args.database_url)
+        print(f"Base de datos: {args.database_url.split(':')[0].split('+')[0]}  CPUs: {os.cpu_count()}  "
+              f"agentes: {args.agents}  intervalo: {args.interval} s  duración: {args.duration} s")
+        run = run_load(args, port, server.pid)
+    finally:
+        # La detención ordenada vacía la cola de ingesta (INGEST_MODE=async) antes de contar filas
+        server.terminate()
+        server.wait(timeout=120)
+    after = count_rows(args.database_url)
+
+    config = {key: value for key, value in vars(args).items() if key not in ("database_url", "output", "compare")}
+    config["database"] = args.database_url.split(":")[0].split("+")[0]
+    config["api_env"] = {key: value for key, value in os.environ.items()
+                         if key in ("INGEST_MODE", "PROCESS_STORAGE", "QUERY_CACHE_SIZE", "DB_POOL_SIZE")}
+    result = {
+        "benchmark": "bench_load",
+        "version": git_version(),
+        "started_at": started_at,
+        "machine": {"cpus": os.cpu_count(), "python": platform.python_version(), "platform": platform.platform()},
+        "config": config,
+        "run": run,
+        "database": {
+            "rows_written": {name: after["rows"][name] - before["rows"].get(name, 0) for name in after["rows"]},
+            "bytes_written": after["bytes"] - before["bytes"]
+        }
+    }
+    print_report(result)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print_comparison(json.load(f), result)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nResultado guardado en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
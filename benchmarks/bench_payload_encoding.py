@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Bytes en la red y CPU por instantánea (codificación en el agente, decodificación en la API)
+para cada combinación de formato de procesos (lista / columnas) y Content-Encoding.
+
+Uso:
+  python benchmarks/bench_payload_encoding.py --sizes 300,1000 --iterations 200
+
+La decodificación mide payload_codec.parse_body (descompresión + json.loads + expansión
+de columnas), que es el trabajo que hace /collect antes de validar.
+"""
+
+import argparse
+import gzip
+import json
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "api"))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from payloads import make_snapshot  # noqa: E402
+import payload_codec  # noqa: E402
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def encode(data, columnar, encoding):
+    """Misma codificación que SystemInfoAgent.encode_payload."""
+    payload = data
+    if columnar:
+        columns = list(data["processes"][0].keys())
+        payload = dict(data, processes={c: [p.get(c) for p in data["processes"]] for c in columns})
+    if encoding == "json (anterior)":
+        return json.dumps(payload).encode("utf-8"), None
+    body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(body), "zstd"
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6), "gzip"
+    return body, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="300,1000", help="Procesos por instantánea")
+    parser.add_argument("--iterations", type=int, default=200, help="Repeticiones por caso")
+    args = parser.parse_args()
+
+    encodings = ["json (anterior)", "identity", "gzip"] + (["zstd"] if zstandard else [])
+    print(f"{'procesos':>9} {'procesos en':<12} {'encoding':<16} {'bytes':>9} {'ratio':>7} "
+          f"{'encode µs (agente)':>19} {'decode µs (API)':>16}")
+    for size in [int(s) for s in args.sizes.split(",")]:
+        data = make_snapshot("10.0.0.1", size, seed=size)
+        baseline = None
+        for columnar in (False, True):
+            for encoding in encodings:
+                if columnar and encoding == "json (anterior)":
+                    continue
+                start = time.process_time()
+                for _ in range(args.iterations):
+                    body, content_encoding = encode(data, columnar, encoding)
+                encode_us = (time.process_time() - start) / args.iterations * 1e6
+                baseline = baseline or len(body)
+                start = time.process_time()
+                for _ in range(args.iterations):
+                    decoded = payload_codec.parse_body(body, content_encoding)
+                cpu_us = (time.process_time() - start) / args.iterations * 1e6
+                assert decoded["processes"] == data["processes"]
+                layout = "columnas" if columnar else "lista"
+                print(f"{size:>9} {layout:<12} {encoding:<16} {len(body):>9,} "
+                      f"{baseline / len(body):>6.1f}x {encode_us:>19,.0f} {cpu_us:>16,.0f}")
+
+
+if __name__ == "__main__":
+    main()
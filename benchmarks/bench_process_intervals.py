@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Comparación de tamaño entre PROCESS_STORAGE=snapshot y PROCESS_STORAGE=interval sobre
+una flota sintética con rotación de procesos.
+
+Uso:
+  python benchmarks/bench_process_intervals.py --database-url postgresql+psycopg2://...
+  python benchmarks/bench_process_intervals.py --hosts 50 --processes 300 --snapshots 60 --churn 0.02
+
+Cada instantánea reemplaza una fracción `churn` de los procesos de cada host. Informa
+filas escritas, tamaño en disco (PostgreSQL) y la extrapolación a filas/día, y verifica
+que los procesos reconstruidos en un instante coinciden con la instantánea original.
+"""
+
+import argparse
+import datetime
+import os
+import random
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "api"))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from payloads import make_snapshot, make_processes  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+
+
+def fleet_snapshots(hosts, processes, snapshots, churn, seed=1):
+    """Genera (índice, instantánea) para cada host y paso de tiempo, en orden temporal."""
+    rng = random.Random(seed)
+    start = datetime.datetime(2026, 1, 1, 0, 0, 0)
+    state = {h: make_processes(processes, rng) for h in range(hosts)}
+    for step in range(snapshots):
+        timestamp = start + datetime.timedelta(minutes=step)
+        for h in range(hosts):
+            if step:
+                procs = state[h]
+                replaced = max(1, int(len(procs) * churn))
+                for i in rng.sample(range(len(procs)), replaced):
+                    procs[i] = dict(procs[i], pid=rng.randint(100000, 4000000))
+            snapshot = make_snapshot(f"10.1.{h // 250}.{h % 250}", 0, seed=h, timestamp=timestamp)
+            snapshot["processes"] = [dict(p) for p in state[h]]
+            yield step, snapshot
+
+
+def table_size(db, table):
+    """Tamaño total (datos + índices) de una tabla en PostgreSQL, o None en otros motores."""
+    if db.engine.dialect.name != "postgresql":
+        return None
+    db.session.execute(text(f"ANALYZE {table}"))
+    return db.session.execute(text(f"SELECT pg_total_relation_size('{table}')")).scalar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url", default=None, help="URL SQLAlchemy (SQLite temporal por defecto)")
+    parser.add_argument("--hosts", type=int, default=50)
+    parser.add_argument("--processes", type=int, default=300)
+    parser.add_argument("--snapshots", type=int, default=60, help="Instantáneas por host (una por minuto)")
+    parser.add_argument("--churn", type=float, default=0.02, help="Fracción de procesos que cambia por instantánea")
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix="bench_intervals_")
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tmpdir}/bench.db"
+    os.chdir(tmpdir)
+
+    import api_server as api
+    from models import db, Server, OSInfo, ProcessorInfo, Process, ProcessInterval, LoggedUser
+
+    results = {}
+    with api.app.app_context():
+        db.drop_all()
+        db.create_all()
+        for mode, table, model in (("snapshot", "processes", Process),
+                                   ("interval", "process_intervals", ProcessInterval)):
+            api.PROCESS_STORAGE = mode
+            checkpoint = None
+            for step, snapshot in fleet_snapshots(args.hosts, args.processes, args.snapshots, args.churn):
+                if not api.store_data_in_db(snapshot):
+                    raise RuntimeError("store_data_in_db devolvió False")
+                if step == args.snapshots // 2 and checkpoint is None:
+                    checkpoint = snapshot
+            results[mode] = (model.query.count(), table_size(db, table))
+
+            # Verificar la reconstrucción de "procesos en el instante T" desde los intervalos
+            if mode == "interval":
+                at = datetime.datetime.fromisoformat(checkpoint["timestamp"])
+                found = api.find_data_for_ip_in_db(checkpoint["ip_address"], at)["latest_processes"]
+                rebuilt = {(p["pid"], p["name"], p["username"]) for procs in found.values() for p in procs}
+                expected = {(p["pid"], p["name"], p["username"]) for p in checkpoint["processes"]}
+                assert rebuilt == expected, "Reconstrucción incorrecta de los procesos en el instante T"
+
+            # Reiniciar servidores para que el segundo modo empiece desde cero
+            for reset_model in (Process, ProcessInterval, LoggedUser, OSInfo, ProcessorInfo, Server):
+                db.session.query(reset_model).delete()
+            db.session.commit()
+
+    print(f"Flota: {args.hosts} hosts x {args.processes} procesos x {args.snapshots} instantáneas, "
+          f"rotación {args.churn:.0%} por instantánea")
+    for mode, (rows, size) in results.items():
+        per_host_day = rows / args.hosts / args.snapshots * 1440
+        size_text = f"{size / 1024 / 1024:.1f} MiB" if size is not None else "n/d"
+        print(f"  {mode:<9} filas={rows:>9,}  tamaño={size_text:>10}  filas/host/día≈{per_host_day:>10,.0f}")
+    snapshot_rows, interval_rows = results["snapshot"][0], results["interval"][0]
+    print(f"  reducción de filas: {snapshot_rows / interval_rows:.1f}x")
+    if results["snapshot"][1]:
+        print(f"  reducción de tamaño: {results['snapshot'][1] / results['interval'][1]:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
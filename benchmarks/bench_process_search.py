@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Búsqueda de procesos en la flota: /search/processes (índice de estado actual) frente a
+recorrer la tabla processes con todo el historial.
+
+Uso:
+  python benchmarks/bench_process_search.py --database-url postgresql+psycopg2://...
+  python benchmarks/bench_process_search.py --hosts 10000 --processes 50 --snapshots 3
+
+Un 0,5% de los hosts ejecuta "xmrig" (usuario "mallory") en su última instantánea. Se mide la mediana de
+--repeat consultas por nombre, por usuario y por prefijo, y se verifica que ambas formas
+devuelven los mismos servidores.
+"""
+
+import argparse
+import datetime
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "api"))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from payloads import make_snapshot  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+
+
+def median_ms(func, repeat):
+    """Mediana en milisegundos de `repeat` ejecuciones, y el último resultado."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url", default=None, help="URL SQLAlchemy (SQLite temporal por defecto)")
+    parser.add_argument("--hosts", type=int, default=10000)
+    parser.add_argument("--processes", type=int, default=50, help="Procesos por instantánea")
+    parser.add_argument("--snapshots", type=int, default=3, help="Instantáneas por host")
+    parser.add_argument("--repeat", type=int, default=20, help="Repeticiones por consulta")
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix="bench_search_")
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tmpdir}/bench.db"
+    os.chdir(tmpdir)
+
+    import api_server as api
+    from models import db
+
+    rng = random.Random(7)
+    infected = set(rng.sample(range(args.hosts), max(1, args.hosts // 200)))
+    start = datetime.datetime(2026, 1, 1)
+    client = api.app.test_client()
+
+    with api.app.app_context():
+        db.drop_all()
+        db.create_all()
+        dialect = db.engine.dialect.name
+        load_start = time.perf_counter()
+        for step in range(args.snapshots):
+            batch = []
+            for h in range(args.hosts):
+                snapshot = make_snapshot(f"10.{h // 62500}.{h // 250 % 250}.{h % 250}", args.processes,
+                                         seed=h * 31 + step, timestamp=start + datetime.timedelta(minutes=5 * step))
+                if step == args.snapshots - 1 and h in infected:
+                    snapshot["processes"].append({"pid": 31337, "name": "xmrig", "username": "mallory"})
+                batch.append(snapshot)
+                if len(batch) == 200:
+                    api.store_batch_in_db(batch)
+                    batch = []
+            if batch:
+                api.store_batch_in_db(batch)
+        load_seconds = time.perf_counter() - load_start
+        if dialect == "postgresql":
+            db.session.execute(text("ANALYZE"))
+            db.session.commit()
+        process_rows = db.session.execute(text("SELECT count(*) FROM processes")).scalar()
+        print(f"Base de datos: {dialect}  hosts: {args.hosts}  filas en processes: {process_rows:,}  "
+              f"carga: {load_seconds:.0f}s")
+
+        scans = {
+            "name=xmrig": "SELECT DISTINCT s.ip_address FROM processes p JOIN servers s ON s.id = p.server_id "
+                          "WHERE p.name = 'xmrig'",
+            "user=mallory": "SELECT DISTINCT s.ip_address FROM processes p JOIN servers s ON s.id = p.server_id "
+                            "WHERE p.username = 'mallory'",
+            "prefix=xmr": "SELECT DISTINCT s.ip_address FROM processes p JOIN servers s ON s.id = p.server_id "
+                          "WHERE p.name LIKE 'xmr%'",
+        }
+        print(f"{'consulta':<14} {'recorrido ms':>13} {'/search ms':>11} {'servidores':>11}")
+        for query, sql in scans.items():
+            scan_ms, scan_result = median_ms(lambda: db.session.execute(text(sql)).scalars().all(), args.repeat)
+            search_ms, response = median_ms(lambda: client.get(f"/search/processes?{query}"), args.repeat)
+            servers = response.json["servers"]
+            assert sorted(scan_result) == servers, query
+            print(f"{query:<14} {scan_ms:>13,.1f} {search_ms:>11,.1f} {len(servers):>11,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Throughput HTTP de la API en modo de producción (gunicorn) con 1, 4 y 8 workers.
+
+Uso:
+  python benchmarks/bench_serving.py --database-url postgresql+psycopg2://...
+  python benchmarks/bench_serving.py --workers 1,4,8 --threads 4 --clients 16 --duration 10
+  python benchmarks/bench_serving.py --database-url postgresql+psycopg2://... --modes wsgi,asgi --db-latency-ms 2
+
+Para cada modo (WEB_SERVER: 'wsgi' con api_server.py, 'asgi' con asgi_server.py, que
+requiere PostgreSQL) y cada cantidad de workers se inicia gunicorn con api/gunicorn.conf.py
+en un puerto local y se mide, durante --duration segundos cada uno, POST /collect (instantáneas de
+--processes procesos) y GET /query/<ip> con la caché de respuestas desactivada, para
+medir el camino completo hasta la base de datos. Los clientes son hilos con conexiones
+keep-alive que corren en la misma máquina. Con --db-latency-ms la API se conecta a PostgreSQL
+a través de un proxy TCP local que demora cada envío esa cantidad de milisegundos en cada
+sentido, para simular una base de datos en otro host.
+"""
+
+import argparse
+import asyncio
+import datetime
+import http.client
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from payloads import make_snapshot  # noqa: E402
+
+API_SECRET = "bench-secret"
+IPS_PER_CLIENT = 20
+
+
+def free_port() -> int:
+    """Puerto TCP libre en localhost."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(database_url: str, workers: int, threads: int, port: int, tmpdir: str,
+                 **extra_env: str) -> subprocess.Popen:
+    """Inicia gunicorn y espera a que /health responda."""
+    env = dict(os.environ, DATABASE_URL=database_url, API_SECRET=API_SECRET,
+               WEB_WORKERS=str(workers), WEB_THREADS=str(threads), WEB_BIND=f"127.0.0.1:{port}",
+               MAINTENANCE_INTERVAL="0", **extra_env)
+    server = subprocess.Popen(
+        # La API se ejecuta en tmpdir para que sus archivos de respaldo (./data) queden allí
+        [sys.executable, "-m", "gunicorn", "-c", str(ROOT / "api" / "gunicorn.conf.py"),
+         "--chdir", tmpdir, "--pythonpath", str(ROOT / "api"), "--log-level", "warning"],
+        cwd=tmpdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("gunicorn no respondió a /health")
+
+
+def start_latency_proxy(database_url: str, delay_ms: float) -> str:
+    """
+    Inicia en un hilo un proxy TCP hacia PostgreSQL que demora cada envío delay_ms en cada
+    sentido (sin limitar el ancho de banda ni reordenar los datos).
+
+    Returns:
+        URL de la base de datos a través del proxy
+    """
+    from sqlalchemy.engine import make_url
+    url = make_url(database_url)
+    socket_dir = url.query.get("host")
+    delay = delay_ms / 1000
+    port = free_port()
+
+    async def pipe(reader, writer):
+        # Cada fragmento se entrega delay segundos después de leído, en orden
+        pending = asyncio.Queue()
+
+        async def deliver():
+            while True:
+                due, data = await pending.get()
+                if data is None:
+                    break
+                await asyncio.sleep(due - time.monotonic())
+                writer.write(data)
+                await writer.drain()
+            writer.close()
+
+        sender = asyncio.ensure_future(deliver())
+        try:
+            while data := await reader.read(65536):
+                pending.put_nowait((time.monotonic() + delay, data))
+        finally:
+            pending.put_nowait((0, None))
+            await sender
+
+    async def handle(client_reader, client_writer):
+        if socket_dir:
+            server_reader, server_writer = await asyncio.open_unix_connection(
+                f"{socket_dir}/.s.PGSQL.{url.port or 5432}")
+        else:
+            server_reader, server_writer = await asyncio.open_connection(url.host or "localhost", url.port or 5432)
+        await asyncio.gather(pipe(client_reader, server_writer), pipe(server_reader, client_writer),
+                             return_exceptions=True)
+
+    ready = threading.Event()
+
+    def serve():
+        loop = asyncio.new_event_loop()
+        loop.run_until_complete(asyncio.start_server(handle, "127.0.0.1", port))
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=serve, daemon=True).start()
+    ready.wait()
+    return url.set(host="127.0.0.1", port=port, query={k: v for k, v in url.query.items() if k != "host"}) \
+        .render_as_string(hide_password=False)
+
+
+def run_clients(port: int, clients: int, duration: float, make_request) -> dict:
+    """
+    Ejecuta `clients` hilos que repiten make_request(conn, client, i) durante `duration` segundos.
+
+    Returns:
+        Diccionario con solicitudes/s, latencias p50/p99 (ms) y errores
+    """
+    latencies = [[] for _ in range(clients)]
+    errors = [0] * clients
+    stop_at = time.monotonic() + duration
+
+    def worker(client: int):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        i = 0
+        while time.monotonic() < stop_at:
+            start = time.perf_counter()
+            try:
+                status = make_request(conn, client, i)
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+                status = None
+            if status is not None and status < 400:
+                latencies[client].append((time.perf_counter() - start) * 1000)
+            else:
+                errors[client] += 1
+            i += 1
+        conn.close()
+
+    threads = [threading.Thread(target=worker, args=(client,)) for client in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    all_latencies = sorted(latency for client_latencies in latencies for latency in client_latencies)
+    return {
+        "rps": len(all_latencies) / elapsed,
+        "p50": statistics.median(all_latencies) if all_latencies else 0.0,
+        "p99": all_latencies[int(len(all_latencies) * 0.99)] if all_latencies else 0.0,
+        "errors": sum(errors)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url", default=None, help="URL SQLAlchemy (SQLite temporal por defecto)")
+    parser.add_argument("--modes", default="wsgi", help="Modos de servicio a medir (wsgi, asgi)")
+    parser.add_argument("--workers", default="1,4,8", help="Cantidades de workers a medir")
+    parser.add_argument("--threads", type=int, default=4, help="Hilos por worker")
+    parser.add_argument("--clients", type=int, default=16, help="Clientes concurrentes")
+    parser.add_argument("--duration", type=float, default=10, help="Segundos por medición")
+    parser.add_argument("--processes", type=int, default=100, help="Procesos por instantánea")
+    parser.add_argument("--db-latency-ms", type=float, default=0, help="Demora por sentido hacia PostgreSQL")
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix="bench_serving_")
+    args.database_url = args.database_url or f"sqlite:///{tmpdir}/bench.db"
+    if args.db_latency_ms > 0:
+        args.database_url = start_latency_proxy(args.database_url, args.db_latency_ms)
+    headers = {"Authorization": f"ApiKey {API_SECRET}", "Content-Type": "application/json"}
+    # Cada cliente envía instantáneas de sus propias IPs con marcas de tiempo crecientes
+    base = datetime.datetime(2026, 1, 1)
+    bodies = [
+        [
+            json.dumps(make_snapshot(f"10.50.{client}.{n}", args.processes, seed=client * 100 + n,
+                                     timestamp=base)).encode("utf-8")
+            for n in range(IPS_PER_CLIENT)
+        ]
+        for client in range(args.clients)
+    ]
+    sequence = [0]
+
+    def post_collect(conn, client, i):
+        # Reemplazar la marca de tiempo sin volver a serializar toda la instantánea
+        sequence[0] += 1
+        timestamp = (base + datetime.timedelta(seconds=sequence[0])).isoformat()
+        body = bodies[client][i % IPS_PER_CLIENT].replace(base.isoformat().encode(), timestamp.encode(), 1)
+        conn.request("POST", "/collect", body=body, headers=headers)
+        response = conn.getresponse()
+        response.read()
+        return response.status
+
+    def get_query(conn, client, i):
+        conn.request("GET", f"/query/10.50.{client}.{i % IPS_PER_CLIENT}")
+        response = conn.getresponse()
+        response.read()
+        return response.status
+
+    print(f"Base de datos: {args.database_url.split(':')[0].split('+')[0]}  CPUs: {os.cpu_count()}  hilos por worker: "
+          f"{args.threads}  clientes: {args.clients}  procesos por instantánea: {args.processes}  "
+          f"demora hacia la base de datos: {args.db_latency_ms:g} ms")
+    print(f"{'modo':<5} {'workers':>7} {'endpoint':<9} {'solic./s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errores':>8}")
+    seeded = False
+    for mode, workers in [(mode, int(workers)) for mode in args.modes.split(",") for workers in args.workers.split(",")]:
+        port = free_port()
+        # Sin límite de concurrencia de la ingesta: se mide el servidor, no el control de admisión
+        server = start_server(args.database_url, workers, args.threads, port, tmpdir, QUERY_CACHE_SIZE="0",
+                              INGEST_MAX_CONCURRENCY="0", WEB_SERVER=mode)
+        try:
+            if not seeded:
+                # Una instantánea por IP para que /query no devuelva 404
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+                for client in range(args.clients):
+                    for n in range(IPS_PER_CLIENT):
+                        post_collect(conn, client, n)
+                conn.close()
+                seeded = True
+            for name, make_request in (("/collect", post_collect), ("/query", get_query)):
+                result = run_clients(port, args.clients, args.duration, make_request)
+                print(f"{mode:<5} {workers:>7} {name:<9} {result['rps']:>9,.1f} {result['p50']:>8,.1f} "
+                      f"{result['p99']:>8,.1f} {result['errors']:>8}")
+        finally:
+            server.terminate()
+            server.wait(timeout=60)
+
+
+if __name__ == "__main__":
+    main()
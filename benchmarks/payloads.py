@@ -0,0 +1,78 @@
+"""
+Generador de instantáneas sintéticas con la misma forma que
+SystemInfoAgent.collect_all_info(), para usar en los benchmarks.
+"""
+
+import random
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
+
+PROCESS_NAMES = [
+    "systemd", "sshd", "bash", "python3", "nginx", "postgres", "cron", "dockerd",
+    "containerd", "kworker/0:1", "rsyslogd", "node", "java", "gunicorn", "redis-server",
+    "chronyd", "agetty", "polkitd", "dbus-daemon", "snapd", "udisksd", "top", "vim",
+]
+USERNAMES = ["root", "www-data", "postgres", "deploy", "ubuntu", "nobody", "syslog"]
+
+
+def make_processes(count: int, rng: random.Random) -> List[Dict[str, Any]]:
+    """Genera una lista de procesos con pids únicos."""
+    pids = rng.sample(range(1, max(count * 20, 1000)), count)
+    return [
+        {
+            "pid": pid,
+            "name": rng.choice(PROCESS_NAMES),
+            "username": rng.choice(USERNAMES),
+            "memory_percent": round(rng.random() * 2, 2),
+            "cpu_percent": round(rng.random() * 5, 1)
+        }
+        for pid in pids
+    ]
+
+
+def make_snapshot(ip_address: str, process_count: int, user_count: int = 3,
+                  seed: Optional[int] = None,
+                  timestamp: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Genera una instantánea completa para una IP.
+
+    Args:
+        ip_address: IP del agente simulado
+        process_count: Número de procesos
+        user_count: Número de sesiones de usuario
+        seed: Semilla para resultados reproducibles
+        timestamp: Marca de tiempo (UTC ahora por defecto)
+
+    Returns:
+        Diccionario con la forma de collect_all_info()
+    """
+    rng = random.Random(seed)
+    timestamp = timestamp or datetime.now(timezone.utc)
+    return {
+        "ip_address": ip_address,
+        "timestamp": timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+        "processor": {
+            "physical_cores": 4,
+            "logical_cores": 8,
+            "cpu_percent": round(rng.random() * 100, 1),
+            "cpu_freq": {"current": 2400.0, "min": 800.0, "max": 3600.0},
+            "architecture": "x86_64",
+            "processor": "x86_64"
+        },
+        "processes": make_processes(process_count, rng),
+        "logged_in_users": [
+            {
+                "username": rng.choice(USERNAMES),
+                "terminal": f"pts/{i}",
+                "host": f"10.0.{rng.randint(0, 255)}.{rng.randint(1, 254)}",
+                "started": timestamp.strftime("%Y-%m-%d %H:%M:%S")
+            }
+            for i in range(user_count)
+        ],
+        "os_info": {
+            "system": "Linux",
+            "release": "5.15.0-91-generic",
+            "version": "#101-Ubuntu SMP",
+            "platform": "Linux-5.15.0-91-generic-x86_64-with-glibc2.35"
+        }
+    }
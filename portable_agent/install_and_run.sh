@@ -35,33 +35,8 @@ else
     fi
 fi
 
-# Verificar si pip está disponible
-if ! command -v pip3 &>/dev/null && ! command -v pip &>/dev/null; then
-    echo "Pip no está disponible. Intentando instalar..."
-    
-    if command -v apt-get &>/dev/null; then
-        sudo apt-get install -y python3-pip
-    elif command -v yum &>/dev/null; then
-        sudo yum install -y python3-pip
-    elif command -v dnf &>/dev/null; then
-        sudo dnf install -y python3-pip
-    else
-        echo "No se pudo detectar un gestor de paquetes compatible."
-        echo "Por favor, instala pip manualmente."
-        exit 1
-    fi
-fi
-
-# Determinar comando de pip
-if command -v pip3 &>/dev/null; then
-    PIP_CMD="pip3"
-else
-    PIP_CMD="pip"
-fi
-
-# Instalar dependencias requeridas
-echo "Instalando dependencias..."
-$PIP_CMD install psutil requests
+# En Linux el agente lee /proc directamente y solo usa la biblioteca estándar de Python:
+# no hace falta instalar dependencias
 
 # Verificar permisos de ejecución
 if [ ! -x "system_info_agent.py" ]; then
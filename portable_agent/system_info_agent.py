@@ -3,17 +3,33 @@
 Agente Portable de Información del Sistema
 ---------------------------------
 Este script independiente recopila información del sistema y la envía a una API de recolección.
-Funciona tanto en plataformas Windows como Linux sin dependencias externas.
+Funciona tanto en plataformas Windows como Linux. En Linux lee /proc y utmp directamente y
+solo usa la biblioteca estándar; en otras plataformas usa psutil, que se importa (e instala
+si falta) solo cuando se necesita. requests se usa para los envíos si está instalado.
 
 Uso:
   python system_info_agent.py
+  python system_info_agent.py --daemon --interval 300
 
 No se requieren argumentos. La URL de la API está preconfigurada en el script.
+En modo daemon el agente queda en ejecución, envía una instantánea cada N segundos
+y guarda en disco las que no pudieron enviarse para reenviarlas después.
 """
 
+import os
 import sys
-import subprocess
+import gzip
+import json
+import time
+import random
+import socket
+import struct
 import platform
+import subprocess
+from pathlib import Path
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Tuple
 
 # URL de la API de recolección
 API_URL = "http://52.14.229.100:5000"
@@ -24,45 +40,523 @@ API_SECRET = "8VarhXGAwTAlR7QV0UXhG3fZHWkB3O7h"
 # Opcional: Modo silencioso (True = sin mensajes, False = mostrar mensajes)
 QUIET_MODE = False
 
-def ensure_dependencies():
-    """Asegurar que todas las dependencias requeridas están instaladas."""
-    try:
-        # Verificar si necesitamos instalar dependencias
+# Modo daemon: intervalo entre envíos (segundos) y retardo aleatorio máximo antes de cada envío
+DEFAULT_INTERVAL = 300
+DEFAULT_JITTER = 30
+
+# Reintentos con espera exponencial antes de guardar una instantánea en la cola local
+MAX_RETRIES = 3
+BACKOFF_BASE = 2
+BACKOFF_MAX = 60
+
+# Cola local en disco para instantáneas no enviadas (máximo de archivos; se descartan las más antiguas)
+SPOOL_DIR = "spool"
+SPOOL_MAX_ITEMS = 1000
+
+# Instantáneas pendientes por solicitud al reenviar la cola local mediante /collect/batch
+SPOOL_BATCH_SIZE = 100
+
+# Tiempo máximo de espera de cada solicitud HTTP (segundos)
+REQUEST_TIMEOUT = 10
+
+# Ventana mínima (segundos) entre la primera lectura de los contadores de CPU y la primera
+# recolección; las siguientes miden el uso desde la recolección anterior
+CPU_SAMPLE_SECONDS = 1.0
+
+def ensure_dependencies(packages: List[str]) -> None:
+    """
+    Instalar con pip los paquetes indicados si no están disponibles.
+    
+    Args:
+        packages: Nombres de los paquetes (deben coincidir con el nombre del módulo)
+    """
+    missing = []
+    for package in packages:
         try:
-            import psutil
-            import requests
+            __import__(package)
         except ImportError:
-            print("Instalando dependencias requeridas...")
-            subprocess.check_call([sys.executable, "-m", "pip", "install", "psutil", "requests"])
-            print("Dependencias instaladas correctamente.")
+            missing.append(package)
+    if not missing:
+        return
+    try:
+        print("Instalando dependencias requeridas...")
+        subprocess.check_call([sys.executable, "-m", "pip", "install", *missing])
+        print("Dependencias instaladas correctamente.")
     except Exception as e:
         print(f"Error al instalar las dependencias: {e}")
         print("Por favor, instala manualmente las dependencias requeridas:")
-        print("pip install psutil requests")
+        print(f"pip install {' '.join(missing)}")
         sys.exit(1)
 
 
-# Asegurar que las dependencias estén instaladas antes de continuar
-ensure_dependencies()
+def load_zstandard():
+    """Módulo zstandard si está instalado (compresión opcional), o None."""
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
 
-# Ahora podemos importar las dependencias
-import socket
-from datetime import datetime, timezone
-import psutil
-import requests
-from typing import Dict, List, Any
+
+def load_psutil():
+    """Importar psutil (instalándolo si falta); solo lo usan las plataformas sin /proc."""
+    ensure_dependencies(["psutil"])
+    import psutil
+    return psutil
+
+
+# Errores de red del cliente HTTP en uso (ver create_http_session)
+HTTP_ERRORS: Tuple[type, ...] = (OSError,)
+
+
+def create_http_session() -> Any:
+    """
+    Crear la sesión HTTP persistente del agente: requests si está instalado, o
+    StdlibSession (biblioteca estándar) si no lo está. Se importa al primer envío.
+    """
+    global HTTP_ERRORS
+    try:
+        import requests
+    except ImportError:
+        import http.client
+        # json() de una respuesta que no es JSON se trata como error de red, igual que en requests
+        HTTP_ERRORS = (OSError, http.client.HTTPException, ValueError)
+        return StdlibSession()
+    HTTP_ERRORS = (requests.RequestException,)
+    return requests.Session()
+
+
+class StdlibResponse:
+    """Respuesta HTTP con la interfaz de requests que usa el agente."""
+
+    def __init__(self, status_code: int, headers: Any, body: bytes):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = body
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+
+class StdlibSession:
+    """Sesión HTTP mínima sobre http.client, con la conexión TCP abierta entre envíos."""
+
+    def __init__(self):
+        self.headers: Dict[str, str] = {}
+        self._conn = None
+        self._origin = None
+
+    def get(self, url: str, timeout: Optional[float] = None) -> StdlibResponse:
+        return self.request("GET", url, timeout=timeout)
+
+    def post(self, url: str, data: Optional[bytes] = None, headers: Optional[Dict[str, str]] = None,
+             timeout: Optional[float] = None) -> StdlibResponse:
+        return self.request("POST", url, data, headers, timeout)
+
+    def request(self, method: str, url: str, data: Optional[bytes] = None,
+                headers: Optional[Dict[str, str]] = None, timeout: Optional[float] = None) -> StdlibResponse:
+        """
+        Enviar una solicitud reutilizando la conexión abierta con el mismo servidor.
+        
+        Raises:
+            OSError, http.client.HTTPException: Error de red
+        """
+        # Importados aquí: http.client carga ssl y email, que no hacen falta para recolectar
+        import http.client
+        import urllib.parse
+        parts = urllib.parse.urlsplit(url)
+        path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        all_headers = dict(self.headers, **(headers or {}))
+        # Una conexión reutilizada puede haber sido cerrada por el servidor: un reintento
+        for attempt in range(2):
+            reused = self._conn is not None and self._origin == (parts.scheme, parts.netloc)
+            if not reused:
+                self.close()
+                connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+                self._conn = connection_class(parts.netloc, timeout=timeout)
+                self._origin = (parts.scheme, parts.netloc)
+            try:
+                self._conn.request(method, path, body=data, headers=all_headers)
+                response = self._conn.getresponse()
+                return StdlibResponse(response.status, response.headers, response.read())
+            except (OSError, http.client.HTTPException):
+                self.close()
+                if not reused or attempt:
+                    raise
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+        self._conn = None
+
+
+class PsutilCollector:
+    """Recolectores basados en psutil (Windows, macOS y Linux sin /proc)."""
+    
+    name = "psutil"
+    
+    def __init__(self):
+        self.psutil = load_psutil()
+        self.physical_cores = self.psutil.cpu_count(logical=False)
+        self.logical_cores = self.psutil.cpu_count(logical=True)
+        self._memory_total = self.psutil.virtual_memory().total
+    
+    def prime(self) -> None:
+        """
+        Tomar la primera lectura de los contadores de CPU del sistema y de cada proceso.
+        
+        psutil guarda la lectura anterior de cpu_percent() del sistema por hilo: prime()
+        y cpu_percent() deben llamarse desde el mismo hilo.
+        """
+        self.psutil.cpu_percent(interval=None)
+        # process_iter reutiliza los objetos Process entre llamadas, y con ellos su última lectura
+        for proc in self.psutil.process_iter():
+            try:
+                proc.cpu_percent(interval=None)
+            except self.psutil.Error:
+                pass
+    
+    def cpu_percent(self) -> float:
+        """Uso de CPU del sistema desde la lectura anterior."""
+        return self.psutil.cpu_percent(interval=None)
+    
+    def cpu_freq(self) -> Dict[str, float]:
+        """Frecuencia actual, mínima y máxima (MHz)."""
+        cpu_freq = self.psutil.cpu_freq()
+        return {
+            "current": getattr(cpu_freq, "current", 0),
+            "min": getattr(cpu_freq, "min", 0),
+            "max": getattr(cpu_freq, "max", 0)
+        }
+    
+    def _read_or_none(self, method):
+        """Leer un atributo de un proceso; None si el sistema niega el acceso (p. ej. el usuario)."""
+        try:
+            return method()
+        except self.psutil.AccessDenied:
+            return None
+    
+    def processes(self) -> List[Dict[str, Any]]:
+        """Procesos en ejecución, con su uso de CPU desde la lectura anterior."""
+        psutil = self.psutil
+        processes = []
+        for proc in psutil.process_iter():
+            try:
+                # oneshot: los atributos se obtienen con una sola lectura por proceso
+                with proc.oneshot():
+                    memory = self._read_or_none(proc.memory_info)
+                    processes.append({
+                        "pid": proc.pid,
+                        "name": proc.name(),
+                        "username": self._read_or_none(proc.username),
+                        "memory_percent": round(memory.rss / self._memory_total * 100, 2) if memory else 0.0,
+                        "cpu_percent": self._read_or_none(proc.cpu_percent) or 0.0
+                    })
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                pass
+        return processes
+    
+    def users(self) -> List[Dict[str, Any]]:
+        """Usuarios con sesiones abiertas."""
+        return [
+            {
+                "username": user.name,
+                "terminal": user.terminal,
+                "host": user.host,
+                "started": datetime.fromtimestamp(user.started, tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+            }
+            for user in self.psutil.users()
+        ]
+
+
+class ProcCollector:
+    """
+    Recolectores para Linux que leen /proc y utmp directamente, solo con la biblioteca
+    estándar. Producen los mismos campos y unidades que PsutilCollector.
+    """
+    
+    name = "proc"
+    
+    # struct utmp de glibc (384 bytes): ut_type, ut_pid, ut_line, ut_id, ut_user, ut_host,
+    # ut_exit, ut_session, ut_tv (segundos, microsegundos), ut_addr_v6 y relleno
+    UTMP_RECORD = struct.Struct("=hxxi32s4s32s256shhiii16s20s")
+    USER_PROCESS = 7
+    UTMP_PATHS = ("/var/run/utmp", "/run/utmp")
+    
+    def __init__(self, proc_dir: str = "/proc"):
+        import pwd
+        self._pwd = pwd
+        self.proc_dir = proc_dir
+        self.clock_ticks = os.sysconf("SC_CLK_TCK")
+        self.page_size = os.sysconf("SC_PAGE_SIZE")
+        self.logical_cores = os.cpu_count()
+        self.physical_cores = self._physical_cores()
+        self._memory_total = self._memory_total_bytes()
+        self._usernames: Dict[int, str] = {}
+        # Lecturas anteriores de CPU: (ocupado, total) del sistema y pid -> (inicio, ticks) por proceso
+        self._last_cpu: Optional[Tuple[int, int]] = None
+        self._last_processes: Dict[int, Tuple[int, int]] = {}
+        self._last_processes_at: Optional[float] = None
+    
+    @staticmethod
+    def available() -> bool:
+        """Indica si /proc está disponible (Linux)."""
+        return sys.platform.startswith("linux") and os.path.exists("/proc/stat")
+    
+    def _read(self, relative_path: str) -> str:
+        with open(f"{self.proc_dir}/{relative_path}") as f:
+            return f.read()
+    
+    def _physical_cores(self) -> Optional[int]:
+        """Núcleos físicos: pares (physical id, core id) distintos de /proc/cpuinfo."""
+        cores = set()
+        physical_id = None
+        for line in self._read("cpuinfo").splitlines():
+            key, _, value = line.partition(":")
+            key = key.strip()
+            if key == "physical id":
+                physical_id = value.strip()
+            elif key == "core id":
+                cores.add((physical_id, value.strip()))
+        return len(cores) or None
+    
+    def _memory_total_bytes(self) -> int:
+        for line in self._read("meminfo").splitlines():
+            if line.startswith("MemTotal:"):
+                return int(line.split()[1]) * 1024
+        return 0
+    
+    def prime(self) -> None:
+        """Tomar la primera lectura de los contadores de CPU del sistema y de cada proceso."""
+        self.cpu_percent()
+        self.processes()
+    
+    def cpu_percent(self) -> float:
+        """Uso de CPU del sistema desde la lectura anterior (línea "cpu" de /proc/stat)."""
+        with open(f"{self.proc_dir}/stat") as f:
+            fields = [int(value) for value in f.readline().split()[1:]]
+        # idle + iowait; guest y guest_nice ya están incluidos en user y nice
+        idle = fields[3] + (fields[4] if len(fields) > 4 else 0)
+        total = sum(fields[:8])
+        last, self._last_cpu = self._last_cpu, (total - idle, total)
+        if last is None or total <= last[1]:
+            return 0.0
+        return round(min(100.0, (total - idle - last[0]) / (total - last[1]) * 100), 1)
+    
+    def cpu_freq(self) -> Dict[str, float]:
+        """Frecuencia actual (promedio de /proc/cpuinfo), mínima y máxima (cpufreq en /sys), en MHz."""
+        current = [
+            float(line.partition(":")[2])
+            for line in self._read("cpuinfo").splitlines() if line.startswith("cpu MHz")
+        ]
+        limits = {}
+        for key, filename in (("min", "cpuinfo_min_freq"), ("max", "cpuinfo_max_freq")):
+            try:
+                with open(f"/sys/devices/system/cpu/cpu0/cpufreq/{filename}") as f:
+                    limits[key] = int(f.read()) / 1000
+            except (OSError, ValueError):
+                limits[key] = 0.0
+        return {"current": sum(current) / len(current) if current else 0.0, **limits}
+    
+    def _username(self, uid: int) -> str:
+        name = self._usernames.get(uid)
+        if name is None:
+            try:
+                name = self._pwd.getpwuid(uid).pw_name
+            except KeyError:
+                name = str(uid)
+            self._usernames[uid] = name
+        return name
+    
+    def processes(self) -> List[Dict[str, Any]]:
+        """Procesos en ejecución (/proc/<pid>/stat y status), con su uso de CPU desde la lectura anterior."""
+        now = time.monotonic()
+        elapsed = now - self._last_processes_at if self._last_processes_at is not None else 0.0
+        current: Dict[int, Tuple[int, int]] = {}
+        processes = []
+        for entry in os.scandir(self.proc_dir):
+            if not entry.name.isdigit():
+                continue
+            pid = int(entry.name)
+            try:
+                with open(f"{entry.path}/stat", "rb") as f:
+                    stat = f.read()
+                with open(f"{entry.path}/status", "rb") as f:
+                    status = f.read()
+            except OSError:
+                # El proceso terminó mientras se leía
+                continue
+            # El nombre va entre paréntesis y puede contener espacios o paréntesis
+            name_end = stat.rindex(b")")
+            name = stat[stat.index(b"(") + 1:name_end].decode("utf-8", "replace")
+            # fields[0] es el campo 3 (state): utime 14, stime 15, starttime 22, rss 24
+            fields = stat[name_end + 2:].split()
+            ticks = int(fields[11]) + int(fields[12])
+            started = int(fields[19])
+            rss = int(fields[21]) * self.page_size
+            if len(name) >= 15:
+                # El kernel trunca el nombre a 15 caracteres: completarlo desde cmdline, como psutil
+                name = self._full_name(entry.path, name)
+            uid_at = status.find(b"\nUid:")
+            uid = int(status[uid_at + 5:].split(None, 1)[0]) if uid_at >= 0 else None
+            
+            current[pid] = (started, ticks)
+            previous = self._last_processes.get(pid)
+            cpu = 0.0
+            if elapsed > 0 and previous is not None and previous[0] == started:
+                cpu = round((ticks - previous[1]) / self.clock_ticks / elapsed * 100, 1)
+            processes.append({
+                "pid": pid,
+                "name": name,
+                "username": self._username(uid) if uid is not None else None,
+                "memory_percent": round(rss / self._memory_total * 100, 2) if self._memory_total else 0.0,
+                "cpu_percent": cpu
+            })
+        self._last_processes = current
+        self._last_processes_at = now
+        return processes
+    
+    @staticmethod
+    def _full_name(proc_path: str, name: str) -> str:
+        try:
+            with open(f"{proc_path}/cmdline", "rb") as f:
+                first_arg = f.read().split(b"\0", 1)[0].decode("utf-8", "replace")
+        except OSError:
+            return name
+        extended = os.path.basename(first_arg)
+        return extended if extended.startswith(name) else name
+    
+    def users(self) -> List[Dict[str, Any]]:
+        """Usuarios con sesiones abiertas (registros USER_PROCESS de utmp)."""
+        for path in self.UTMP_PATHS:
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+                break
+            except OSError:
+                continue
+        else:
+            return []
+        
+        def text(raw: bytes) -> str:
+            return raw.split(b"\0", 1)[0].decode("utf-8", "replace")
+        
+        users = []
+        size = self.UTMP_RECORD.size
+        for offset in range(0, len(data) - size + 1, size):
+            ut_type, _, line, _, user, host, _, _, _, started, _, _, _ = self.UTMP_RECORD.unpack_from(data, offset)
+            if ut_type != self.USER_PROCESS:
+                continue
+            host = text(host)
+            users.append({
+                "username": text(user),
+                "terminal": text(line) or None,
+                # Igual que psutil: las sesiones gráficas locales se informan como localhost
+                "host": "localhost" if host in (":0", ":0.0") else host,
+                "started": datetime.fromtimestamp(started, tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+            })
+        return users
+
+
+def select_collector(preference: str = "auto") -> Any:
+    """
+    Elegir el motor de recolección.
+    
+    Args:
+        preference: 'proc' (/proc, solo Linux), 'psutil', o 'auto' (/proc si está disponible)
+        
+    Returns:
+        ProcCollector o PsutilCollector
+    """
+    if preference == "proc" or (preference == "auto" and ProcCollector.available()):
+        return ProcCollector()
+    return PsutilCollector()
+
+
+class Spool:
+    """Cola acotada en disco con las instantáneas que no pudieron enviarse."""
+
+    def __init__(self, directory: str, max_items: int = SPOOL_MAX_ITEMS):
+        """
+        Inicializar la cola.
+
+        Args:
+            directory: Directorio donde se guardan las instantáneas pendientes
+            max_items: Máximo de instantáneas guardadas; al superarlo se descartan las más antiguas
+        """
+        self.directory = Path(directory)
+        self.max_items = max_items
+
+    def items(self) -> List[Path]:
+        """Archivos pendientes, del más antiguo al más reciente."""
+        if not self.directory.exists():
+            return []
+        return sorted(self.directory.glob("*.json"))
+
+    def put(self, data: Dict[str, Any]) -> None:
+        """
+        Guardar una instantánea pendiente.
+
+        Args:
+            data: Información del sistema recopilada
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"{time.time_ns()}.json"
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        # Renombrado atómico: nunca queda un archivo a medio escribir en la cola
+        os.replace(tmp_path, path)
+
+        pending = self.items()
+        for old in pending[:max(0, len(pending) - self.max_items)]:
+            old.unlink()
+
+    def load(self, path: Path) -> Optional[Dict[str, Any]]:
+        """Leer una instantánea pendiente (None si el archivo está dañado)."""
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
 
 
 class SystemInfoAgent:
-    def __init__(self, api_url: str):
+    def __init__(self, api_url: str, collector: Optional[Any] = None):
         """
         Inicializar el agente con la URL de la API.
         
         Args:
             api_url: URL del endpoint de la API para enviar datos
+            collector: Motor de recolección (por defecto, el de select_collector())
         """
         self.api_url = api_url
         self.system_ip = self._get_ip_address()
+        self.collector = collector or select_collector()
+        self._session = None
+        # Codificación del cuerpo acordada con la API (None hasta consultarla)
+        self.content_encoding: Optional[str] = None
+        self.columnar_processes = False
+        self.batch_supported = False
+        
+        # Datos estáticos del host: se leen una sola vez
+        self._static_processor = {
+            "architecture": platform.machine(),
+            "processor": platform.processor()
+        }
+        self._os_info = {
+            "system": platform.system(),
+            "release": platform.release(),
+            "version": platform.version(),
+            "platform": platform.platform()
+        }
+        # Los recolectores independientes se ejecutan en paralelo
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="collector")
+        # Consumo propio del agente desde su inicio (tiempo real y CPU del proceso)
+        self._started_at = time.monotonic()
+        self._cpu_started_at = time.process_time()
+        self.last_collection: Dict[str, Any] = {}
+        self.prime_counters()
         
     def _get_ip_address(self) -> str:
         """Obtener la dirección IP principal del sistema."""
@@ -77,76 +571,137 @@ class SystemInfoAgent:
         except Exception:
             return socket.gethostbyname(socket.gethostname())
     
+    @property
+    def session(self) -> Any:
+        """Sesión HTTP reutilizable: mantiene la conexión TCP abierta entre envíos."""
+        if self._session is None:
+            self._session = create_http_session()
+            self._session.headers.update({
+                "Content-Type": "application/json",
+                "Authorization": f"ApiKey {API_SECRET}"
+            })
+        return self._session
+    
+    def prime_counters(self) -> None:
+        """
+        Tomar la primera lectura de los contadores de CPU del sistema y de cada proceso.
+        
+        El uso de CPU se calcula como diferencia entre dos lecturas: después de esta,
+        cada recolección informa el uso desde la anterior sin bloquear.
+        """
+        self.collector.prime()
+        self._primed_at = time.monotonic()
+    
     def get_processor_info(self) -> Dict[str, Any]:
         """Recopilar información del procesador."""
         cpu_info = {
-            "physical_cores": psutil.cpu_count(logical=False),
-            "logical_cores": psutil.cpu_count(logical=True),
-            "cpu_percent": psutil.cpu_percent(interval=1),
-            "cpu_freq": {
-                "current": getattr(psutil.cpu_freq(), "current", 0),
-                "min": getattr(psutil.cpu_freq(), "min", 0),
-                "max": getattr(psutil.cpu_freq(), "max", 0)
-            },
-            "architecture": platform.machine(),
-            "processor": platform.processor()
+            "physical_cores": self.collector.physical_cores,
+            "logical_cores": self.collector.logical_cores,
+            "cpu_percent": self.collector.cpu_percent(),
+            "cpu_freq": self.collector.cpu_freq(),
+            "architecture": self._static_processor["architecture"],
+            "processor": self._static_processor["processor"]
         }
         return cpu_info
     
     def get_running_processes(self) -> List[Dict[str, Any]]:
         """Recopilar información sobre los procesos en ejecución."""
-        processes = []
-        for proc in psutil.process_iter(['pid', 'name', 'username', 'memory_percent', 'cpu_percent']):
-            try:
-                proc_info = proc.info
-                processes.append({
-                    "pid": proc_info["pid"],
-                    "name": proc_info["name"],
-                    "username": proc_info["username"],
-                    "memory_percent": round(proc_info["memory_percent"], 2),
-                    "cpu_percent": proc_info["cpu_percent"]
-                })
-            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                pass
-        return processes
+        return self.collector.processes()
     
     def get_logged_in_users(self) -> List[Dict[str, Any]]:
         """Obtener usuarios con sesiones abiertas."""
-        users = []
-        for user in psutil.users():
-            users.append({
-                "username": user.name,
-                "terminal": user.terminal,
-                "host": user.host,
-                "started": datetime.fromtimestamp(user.started, tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
-            })
-        return users
+        return self.collector.users()
     
     def get_os_info(self) -> Dict[str, str]:
         """Obtener nombre y versión del sistema operativo."""
-        os_info = {
-            "system": platform.system(),
-            "release": platform.release(),
-            "version": platform.version(),
-            "platform": platform.platform()
-        }
-        return os_info
+        return dict(self._os_info)
     
     def collect_all_info(self) -> Dict[str, Any]:
-        """Recopilar toda la información del sistema."""
+        """
+        Recopilar toda la información del sistema.
+        
+        Los recolectores se ejecutan en paralelo. La instantánea incluye en "agent" el
+        costo de la recolección (tiempo real y CPU, en ms) y el porcentaje de un núcleo
+        que el agente consumió desde su inicio.
+        """
+        # Solo la primera recolección puede esperar: el uso de CPU necesita una ventana mínima
+        wait = self._primed_at + CPU_SAMPLE_SECONDS - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
         timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
         
-        all_info = {
-            "ip_address": self.system_ip,
-            "timestamp": timestamp,
-            "processor": self.get_processor_info(),
-            "processes": self.get_running_processes(),
-            "logged_in_users": self.get_logged_in_users(),
-            "os_info": self.get_os_info()
+        collectors = {
+            "processes": self._executor.submit(self.get_running_processes),
+            "logged_in_users": self._executor.submit(self.get_logged_in_users),
+            "os_info": self._executor.submit(self.get_os_info)
         }
+        # El procesador se lee en este hilo mientras tanto: psutil guarda la lectura anterior
+        # de cpu_percent() por hilo, y la de prime_counters() se tomó en este mismo hilo
+        all_info = {"ip_address": self.system_ip, "timestamp": timestamp,
+                    "processor": self.get_processor_info()}
+        for key, future in collectors.items():
+            all_info[key] = future.result()
+        
+        elapsed = time.monotonic() - self._started_at
+        self.last_collection = {
+            "collector": self.collector.name,
+            "collection_ms": round((time.perf_counter() - wall_start) * 1000, 1),
+            "collection_cpu_ms": round((time.process_time() - cpu_start) * 1000, 1),
+            "cpu_share_percent": round((time.process_time() - self._cpu_started_at) / elapsed * 100, 3)
+        }
+        all_info["agent"] = self.last_collection
         
         return all_info
     
+    def negotiate_encoding(self) -> None:
+        """
+        Consultar a la API qué codificaciones acepta y elegir la mejor soportada:
+        zstd > gzip > sin comprimir, y procesos en columnas si la API lo anuncia.
+        Si la consulta falla se envía JSON sin comprimir y se vuelve a intentar en el próximo envío.
+        """
+        try:
+            response = self.session.get(f"{self.api_url}/", timeout=REQUEST_TIMEOUT)
+            info = response.json()
+            ingest = info.get("ingest", {})
+        except HTTP_ERRORS + (ValueError, AttributeError):
+            return
+        
+        self.batch_supported = "/collect/batch" in info.get("endpoints", {})
+        
+        supported = ["gzip", "identity"]
+        if load_zstandard():
+            supported.insert(0, "zstd")
+        offered = ingest.get("content_encodings", ["identity"])
+        self.content_encoding = next((enc for enc in supported if enc in offered), "identity")
+        self.columnar_processes = "columnar" in ingest.get("process_encodings", [])
+    
+    def encode_payload(self, data: Any) -> Tuple[bytes, Dict[str, str]]:
+        """
+        Serializar y comprimir los datos según la codificación acordada.
+        
+        Args:
+            data: Información del sistema recopilada, o una lista de instantáneas
+            
+        Returns:
+            Cuerpo de la solicitud y encabezados adicionales
+        """
+        payload = data
+        if self.columnar_processes:
+            if isinstance(data, list):
+                payload = [to_columnar(item) for item in data]
+            else:
+                payload = to_columnar(data)
+        
+        body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        if self.content_encoding == "zstd":
+            return load_zstandard().ZstdCompressor(level=3).compress(body), {"Content-Encoding": "zstd"}
+        if self.content_encoding == "gzip":
+            return gzip.compress(body, compresslevel=6), {"Content-Encoding": "gzip"}
+        return body, {}
+    
     def send_to_api(self, data: Dict[str, Any]) -> Dict:
         """
         Enviar datos recopilados a la API.
@@ -158,20 +713,260 @@ class SystemInfoAgent:
             Respuesta de la API como diccionario
         """
         try:
-            # Incluir la clave API en los encabezados para autenticación
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"ApiKey {API_SECRET}"
-            }
+            if self.content_encoding is None:
+                self.negotiate_encoding()
             
-            response = requests.post(
+            # La sesión ya incluye la clave API en los encabezados para autenticación
+            body, headers = self.encode_payload(data)
+            response = self.session.post(
                 f"{self.api_url}/collect",
-                json=data,
-                headers=headers
+                data=body,
+                headers=headers,
+                timeout=REQUEST_TIMEOUT
+            )
+            if response.status_code == 415 and (headers or self.columnar_processes):
+                # La API ya no acepta la codificación acordada: volver a JSON sin comprimir
+                self.content_encoding, self.columnar_processes = "identity", False
+                response = self.session.post(
+                    f"{self.api_url}/collect",
+                    data=json.dumps(data).encode("utf-8"),
+                    timeout=REQUEST_TIMEOUT
+                )
+            result = {"status_code": response.status_code, "response": response.json()}
+            if "Retry-After" in response.headers:
+                result["retry_after"] = response.headers["Retry-After"]
+            if "X-Report-Interval" in response.headers:
+                # Segundos sugeridos por la API hasta el próximo reporte (crece si está saturada)
+                result["report_interval"] = response.headers["X-Report-Interval"]
+            return result
+        except HTTP_ERRORS as e:
+            return {"status_code": -1, "error": str(e)}
+    
+    def send_with_retry(self, data: Dict[str, Any], retries: int = MAX_RETRIES) -> Dict:
+        """
+        Enviar datos reintentando con espera exponencial ante errores transitorios
+        (sin conexión, 429 o 5xx). Respeta el encabezado Retry-After si la API lo envía.
+        
+        Args:
+            data: Información del sistema recopilada
+            retries: Número máximo de reintentos
+            
+        Returns:
+            Respuesta del último intento
+        """
+        for attempt in range(retries + 1):
+            response = self.send_to_api(data)
+            if not is_retryable(response) or attempt == retries:
+                return response
+            try:
+                delay = float(response["retry_after"])
+            except (KeyError, ValueError):
+                # Espera exponencial con jitter completo
+                delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE ** (attempt + 1)))
+            time.sleep(delay)
+        return response
+    
+    def send_batch_to_api(self, items: List[Dict[str, Any]]) -> Dict:
+        """
+        Enviar varias instantáneas en una sola solicitud a /collect/batch.
+        
+        Args:
+            items: Lista de instantáneas
+            
+        Returns:
+            Respuesta de la API como diccionario (incluye el estado de cada elemento)
+        """
+        try:
+            body, headers = self.encode_payload(items)
+            response = self.session.post(
+                f"{self.api_url}/collect/batch",
+                data=body,
+                headers=headers,
+                timeout=REQUEST_TIMEOUT
             )
-            return {"status_code": response.status_code, "response": response.json()}
-        except requests.RequestException as e:
+            try:
+                payload = response.json()
+            except ValueError:
+                # Cuerpo que no es JSON (p. ej. un 413 de un proxy): sin estados por elemento
+                payload = {}
+            return {"status_code": response.status_code, "response": payload}
+        except HTTP_ERRORS as e:
             return {"status_code": -1, "error": str(e)}
+    
+    def flush_spool(self, spool: Spool) -> int:
+        """
+        Reenviar las instantáneas pendientes, de la más antigua a la más reciente.
+        Si la API lo soporta se envían en lotes a /collect/batch; si no, una por una.
+        Se detiene en el primer error transitorio para no insistir con la API caída.
+        
+        Args:
+            spool: Cola local de instantáneas
+            
+        Returns:
+            Número de instantáneas reenviadas
+        """
+        if self.content_encoding is None:
+            self.negotiate_encoding()
+        if self.batch_supported:
+            return self._flush_spool_batches(spool)
+        return self._flush_spool_one_by_one(spool, spool.items())[0]
+    
+    def _flush_spool_one_by_one(self, spool: Spool, paths: List[Path]) -> Tuple[int, bool]:
+        """
+        Reenviar instantáneas de la cola local una por una mediante /collect.
+        
+        Returns:
+            Tupla (instantáneas reenviadas, True si se detuvo por un error transitorio o de clave)
+        """
+        sent = 0
+        for path in paths:
+            data = spool.load(path)
+            if data is not None:
+                response = self.send_to_api(data)
+                if is_retryable(response):
+                    return sent, True
+                if response["status_code"] == 401:
+                    # Clave API inválida: conservar los datos hasta que se corrija
+                    return sent, True
+                if response["status_code"] in [200, 201, 202]:
+                    sent += 1
+            # Enviada o rechazada de forma definitiva (p. ej. 400): se elimina
+            path.unlink()
+        return sent, False
+    
+    def _flush_spool_batches(self, spool: Spool) -> int:
+        """Reenviar la cola local en lotes de SPOOL_BATCH_SIZE mediante /collect/batch."""
+        sent = 0
+        pending = spool.items()
+        for start in range(0, len(pending), SPOOL_BATCH_SIZE):
+            paths, items = [], []
+            for path in pending[start:start + SPOOL_BATCH_SIZE]:
+                data = spool.load(path)
+                if data is None:
+                    path.unlink()
+                else:
+                    paths.append(path)
+                    items.append(data)
+            if not items:
+                continue
+            
+            response = self.send_batch_to_api(items)
+            if response["status_code"] in [404, 405]:
+                # La API no tiene /collect/batch: volver al reenvío individual
+                self.batch_supported = False
+                return sent + self.flush_spool(spool)
+            if is_retryable(response) or response["status_code"] == 401:
+                break
+            
+            statuses = response.get("response", {}).get("items", [])
+            if response["status_code"] >= 400 and not statuses:
+                # Rechazo del lote completo sin estados por elemento (p. ej. 400 o 413): cada
+                # instantánea se reenvía sola para descartar únicamente las rechazadas
+                sent_one_by_one, stopped = self._flush_spool_one_by_one(spool, paths)
+                sent += sent_one_by_one
+                if stopped:
+                    break
+                continue
+            for path, status in zip(paths, statuses):
+                if status.get("status") != "error":
+                    sent += 1
+                elif status.get("retryable"):
+                    continue
+                # Enviada o rechazada de forma definitiva: se elimina
+                path.unlink()
+            if any(status.get("retryable") for status in statuses):
+                break
+        return sent
+
+
+def to_columnar(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convertir la lista de procesos a arreglos paralelos: las claves de cada
+    proceso se envían una sola vez.
+    """
+    if not data.get("processes"):
+        return data
+    columns = list(data["processes"][0].keys())
+    return dict(data, processes={
+        column: [proc.get(column) for proc in data["processes"]] for column in columns
+    })
+
+
+def is_retryable(response: Dict) -> bool:
+    """Indica si una respuesta de send_to_api corresponde a un error transitorio."""
+    status_code = response["status_code"]
+    return status_code == -1 or status_code == 429 or status_code >= 500
+
+
+def run_daemon(agent: SystemInfoAgent, interval: float, jitter: float, spool: Spool, quiet: bool) -> int:
+    """
+    Ejecutar el agente de forma continua.
+    
+    Cada ciclo recopila una instantánea, reenvía las pendientes de la cola local,
+    espera un retardo aleatorio (jitter) para no saturar la API cuando toda la flota
+    reporta a la vez y envía la instantánea con reintentos. Si no se puede enviar,
+    se guarda en la cola local. Si la API sugiere un intervalo de reporte mayor
+    (X-Report-Interval), el ciclo siguiente se alarga hasta ese valor.
+    
+    Args:
+        agent: Agente ya inicializado
+        interval: Segundos entre recolecciones
+        jitter: Retardo aleatorio máximo antes de cada envío (segundos)
+        spool: Cola local de instantáneas no enviadas
+        quiet: Modo silencioso
+        
+    Returns:
+        Código de salida
+    """
+    def log(message: str) -> None:
+        if not quiet:
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {message}", flush=True)
+    
+    log(f"Modo daemon: intervalo {interval}s, jitter hasta {jitter}s, cola local en {spool.directory}")
+    next_run = time.monotonic()
+    cycle = interval
+    try:
+        while True:
+            system_data = agent.collect_all_info()
+            
+            time.sleep(random.uniform(0, jitter))
+            
+            if spool.items():
+                flushed = agent.flush_spool(spool)
+                if flushed:
+                    log(f"Reenviadas {flushed} instantáneas pendientes")
+            
+            response = agent.send_with_retry(system_data)
+            if response["status_code"] in [200, 201, 202]:
+                cost = system_data["agent"]
+                log(f"Datos enviados correctamente ({len(system_data['processes'])} procesos, "
+                    f"recolección {cost['collection_ms']} ms / {cost['collection_cpu_ms']} ms de CPU, "
+                    f"agente {cost['cpu_share_percent']}% de un núcleo)")
+            elif is_retryable(response):
+                spool.put(system_data)
+                log(f"API no disponible ({response.get('error', response['status_code'])}); "
+                    f"instantánea guardada en la cola local ({len(spool.items())} pendientes)")
+            else:
+                log(f"Error al enviar datos: {response}")
+            
+            # Nunca por debajo del intervalo configurado; vuelve a él cuando la API deja de sugerir más
+            try:
+                suggested = float(response.get("report_interval", 0))
+            except ValueError:
+                suggested = 0.0
+            if max(interval, suggested) != cycle:
+                cycle = max(interval, suggested)
+                log(f"Intervalo de reporte ajustado a {cycle:.0f}s según la API")
+            
+            # Programar el próximo ciclo sin acumular la deriva del tiempo de envío;
+            # tras una caída larga no se recuperan los ciclos perdidos
+            next_run += cycle
+            if next_run < time.monotonic():
+                next_run = time.monotonic() + cycle
+            time.sleep(max(0.0, next_run - time.monotonic()))
+    except KeyboardInterrupt:
+        log("Agente detenido")
+        return 0
 
 
 def main():
@@ -189,10 +984,45 @@ def main():
             import argparse
             parser = argparse.ArgumentParser(description="Agente Portable de Información del Sistema")
             parser.add_argument(
-                "--api", 
+                "--api", "--url",
+                dest="api",
                 type=str,
                 help="URL del endpoint API (sobrescribe el valor predeterminado)"
             )
+            parser.add_argument(
+                "--daemon",
+                action="store_true",
+                help="Ejecutar de forma continua enviando datos cada --interval segundos"
+            )
+            parser.add_argument(
+                "--interval",
+                type=float,
+                help=f"Intervalo de recolección en segundos (implica --daemon, por defecto {DEFAULT_INTERVAL})"
+            )
+            parser.add_argument(
+                "--jitter",
+                type=float,
+                default=DEFAULT_JITTER,
+                help="Retardo aleatorio máximo antes de cada envío en modo daemon (segundos)"
+            )
+            parser.add_argument(
+                "--spool-dir",
+                type=str,
+                default=SPOOL_DIR,
+                help="Directorio de la cola local de instantáneas no enviadas"
+            )
+            parser.add_argument(
+                "--spool-max",
+                type=int,
+                default=SPOOL_MAX_ITEMS,
+                help="Máximo de instantáneas en la cola local"
+            )
+            parser.add_argument(
+                "--collector",
+                choices=["auto", "proc", "psutil"],
+                default="auto",
+                help="Motor de recolección: /proc (Linux, sin dependencias), psutil, o auto"
+            )
             parser.add_argument(
                 "--quiet",
                 action="store_true",
@@ -205,6 +1035,8 @@ def main():
             if args.quiet:
                 quiet_mode = True
                 args.quiet = True
+            if args.interval:
+                args.daemon = True
         except ImportError:
             # Si argparse no está disponible, ignoramos los argumentos
             pass
@@ -218,7 +1050,14 @@ def main():
         print("-" * 70)
     
     # Inicializar y recopilar datos
-    agent = SystemInfoAgent(api_url)
+    agent = SystemInfoAgent(api_url, select_collector(getattr(args, "collector", "auto")))
+    
+    if getattr(args, "daemon", False):
+        # Las rutas relativas de la cola se resuelven junto al script, no en el directorio actual
+        spool = Spool(Path(__file__).resolve().parent / args.spool_dir, args.spool_max)
+        interval = args.interval or DEFAULT_INTERVAL
+        return run_daemon(agent, interval, min(args.jitter, interval), spool, quiet_mode)
+    
     system_data = agent.collect_all_info()
     
     # Enviar datos a la API
@@ -227,7 +1066,7 @@ def main():
         
     response = agent.send_to_api(system_data)
     
-    if response["status_code"] in [200, 201]:
+    if response["status_code"] in [200, 201, 202]:
         if not quiet_mode:
             print("Datos enviados correctamente a la API")
     else:
@@ -246,6 +1085,8 @@ def main():
         print(f"Procesador: {system_data['processor']['processor']}")
         print(f"Número de Procesos: {len(system_data['processes'])}")
         print(f"Usuarios Conectados: {', '.join([user['username'] for user in system_data['logged_in_users']])}")
+        print(f"Costo de la recolección: {system_data['agent']['collection_ms']} ms "
+              f"({system_data['agent']['collection_cpu_ms']} ms de CPU)")
     
     return 0
 